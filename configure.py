@@ -36,7 +36,7 @@ VERSIONS = [
 parser = argparse.ArgumentParser()
 parser.add_argument(
     "mode",
-    choices=["configure", "progress"],
+    choices=["configure", "progress", "watch", "check-regressions"],
     default="configure",
     help="script mode (default: configure)",
     nargs="?",
@@ -127,12 +127,30 @@ parser.add_argument(
     choices=["all", "off", "error"],
     help="how to handle warnings",
 )
+parser.add_argument(
+    "--no-ctx",
+    dest="ctx",
+    action="store_false",
+    help="omit context file rules for decomp.me scratches",
+)
 parser.add_argument(
     "--no-progress",
     dest="progress",
     action="store_false",
     help="disable progress calculation",
 )
+parser.add_argument(
+    "--range",
+    dest="git_range",
+    metavar="RANGE",
+    help="base commit or range for check-regressions; the working tree is compared against "
+    "the range's base (default: HEAD, i.e. uncommitted changes)",
+)
+parser.add_argument(
+    "--record",
+    action="store_true",
+    help="record progress in the history database (build/progress.db)",
+)
 args = parser.parse_args()
 
 config = ProjectConfig()
@@ -150,6 +168,7 @@ config.non_matching = args.non_matching
 config.sjiswrap_path = args.sjiswrap
 config.ninja_path = args.ninja
 config.progress = args.progress
+config.generate_ctx = args.ctx
 if not is_windows():
     config.wrapper = args.wrapper
 # Don't build asm unless we're --non-matching
@@ -184,6 +203,10 @@ if args.map:
     config.ldflags.append("-mapunused")
     # config.ldflags.append("-listclosure") # For Wii linkers
 
+# Convert UTF-8 sources to Shift JIS once into build/<version>/sjis,
+# instead of running sjiswrap.exe for every compile
+config.shift_jis_mirror = True
+
 # Use for any additional files that should cause a re-configure when modified
 config.reconfig_deps = []
 
@@ -1490,5 +1513,23 @@ if args.mode == "configure":
 elif args.mode == "progress":
     # Print progress information
     calculate_progress(config)
+    if args.record:
+        from tools.history import record_progress
+
+        record_progress(
+            config.out_path() / "report.json",
+            config.build_dir / "progress.db",
+            config.version,
+        )
+elif args.mode == "watch":
+    # Rebuild and re-diff only the units affected by each change
+    from tools.watch import watch
+
+    watch(config)
+elif args.mode == "check-regressions":
+    # Rebuild and diff only the units affected by a git diff range
+    from tools.regressions import check_regressions
+
+    check_regressions(config, args.git_range)
 else:
     sys.exit("Unknown mode: " + args.mode)
@@ -1,71 +1,270 @@
-# Thanks KooShnoo! https://discord.com/channels/727908905392275526/1024871155804426310/1329716224971767891
+#!/usr/bin/env python3
 
-"""
-objdiff allows one to map symbols from the target binary to the source binary.
-this script will take those symbols you have mapped, and write them to `symbols.txt`.
+# Thanks KooShnoo! https://discord.com/channels/727908905392275526/1024871155804426310/1329716224971767891
 
-use case: say you have changed the signature/name of a function.
-now, your source file says `foo_Ful`, but symbols.txt says `bar__Fl`.
-objdiff allows you to map the `foo_Ful` in the target object to `bar__Fl` in the source object.
-this script allows you to replace `foo_Ful` with `bar__Fl` in `symbols.txt`.
-"""
+###
+# Applies objdiff symbol mappings to symbols.txt.
+#
+# objdiff allows one to map symbols from the target binary to the source
+# binary. Say you have changed the signature/name of a function: your source
+# file says `foo_Ful`, but symbols.txt says `bar__Fl`. Mapping `bar__Fl` in
+# the target object to `foo_Ful` in the source object in objdiff, then
+# running this script, renames `bar__Fl` to `foo_Ful` in symbols.txt.
+#
+# Mappings from all units are collected per symbols file (the DOL's or a
+# REL's, for any version in configure.py), and each file is patched in one
+# pass: symbols are looked up through the name index of tools/symbols.py,
+# and only the name at the start of each matched line is replaced, leaving
+# the rest of the line untouched. Names defined more than once are narrowed
+# down to the unit's ranges in splits.txt. Applied mappings are removed from
+# objdiff.json, and all files are replaced atomically.
+#
+# Usage:
+#   python3 tools/apply_objdiff_mappings.py
+#   python3 tools/apply_objdiff_mappings.py --dry-run
+###
 
+import argparse
+import ast
 import json
+import os
 import re
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from .splits import SplitIndex
+    from .symbols import SymbolTable
+except ImportError:
+    from splits import SplitIndex
+    from symbols import SymbolTable
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.abspath(os.path.join(script_dir, ".."))
+
+# build/<version>/obj/... for the DOL, build/<version>/<module>/obj/... for RELs
+target_path_pattern = re.compile(
+    r"^build/(?P<version>[^/]+)/(?:(?P<module>[^/]+)/)?obj/(?P<object>.+)\.o$"
+)
+
+
+class Mapping(NamedTuple):
+    unit: str  # objdiff unit name
+    object: str  # Object path, without extension, as in splits.txt
+    old_name: str  # Name in symbols.txt
+    new_name: str
+
 
-game_id = "GXXE01"
+class Rename(NamedTuple):
+    line: int  # 1-based
+    mapping: Mapping
 
-with open("./objdiff.json") as f:
-    objdiff_config = json.load(f)
 
-main_obj_re = re.compile(f"^build/{game_id}/obj/")
-rel_obj_re = re.compile(f"^build/{game_id}/([A-Za-z_0-9\\-]+)/obj/")
+# Reads VERSIONS from configure.py without running it
+def read_versions(configure_path: str) -> List[str]:
+    with open(configure_path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), configure_path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "VERSIONS" for target in node.targets
+        ):
+            return list(ast.literal_eval(node.value))
+    sys.exit(f"VERSIONS not found in {configure_path}")
 
 
-def module_for_unit(unit):
-    """Finds the REL name, or MAIN for the given unit, so that the
-    correct symbols.txt can be updated"""
-    if main_obj_re.match(unit["target_path"]):
-        return "MAIN"
-    elif match := rel_obj_re.match(unit["target_path"]):
-        return match.group(1)
+def config_dir(version: str, module: Optional[str]) -> str:
+    if module is None:
+        return os.path.join("config", version)
+    return os.path.join("config", version, "rels", module)
 
 
-# lol python has types. it's typython. typescript all over again
-units: list = objdiff_config["units"]
+# Collects the mappings of all units, by symbols.txt directory
+def collect_mappings(
+    objdiff_config: Dict[str, Any], versions: List[str]
+) -> Dict[str, List[Mapping]]:
+    mappings: Dict[str, List[Mapping]] = {}
+    for unit in objdiff_config.get("units", []):
+        symbol_mappings = unit.get("symbol_mappings")
+        if not symbol_mappings:
+            continue
+        target_path = unit.get("target_path") or ""
+        match = target_path_pattern.match(target_path.replace(os.sep, "/"))
+        if match is None:
+            print(f"{unit['name']}: unrecognized target path {target_path!r}, skipping")
+            continue
+        version = match["version"]
+        if version not in versions:
+            print(f"{unit['name']}: unknown version {version}, skipping")
+            continue
+        directory = config_dir(version, match["module"])
+        file_mappings = mappings.setdefault(directory, [])
+        for old_name, new_name in symbol_mappings.items():
+            file_mappings.append(Mapping(unit["name"], match["object"], old_name, new_name))
+    return mappings
+
 
-symbol_mappings_per_file = {}
-for unit in units:
-    module = module_for_unit(unit)
-    symbol_mapping = unit.get("symbol_mappings")
-    if symbol_mapping is None:
-        continue
-    symbol_mappings_per_file.setdefault(module, {}).update(symbol_mapping)
-    del unit["symbol_mappings"]
+# Resolves mappings to symbols.txt lines. Returns the renames, and the
+# mappings that could not be applied, with the reason.
+def resolve_renames(
+    symbols: SymbolTable, splits: Optional[SplitIndex], mappings: List[Mapping]
+) -> Tuple[List[Rename], List[Tuple[Mapping, str]]]:
+    renames: List[Rename] = []
+    failed: List[Tuple[Mapping, str]] = []
+    renamed_lines: Dict[int, Mapping] = {}
+    for mapping in mappings:
+        if mapping.old_name == mapping.new_name:
+            continue
+        candidates = symbols.find_all(mapping.old_name)
+        if len(candidates) > 1 and splits is not None:
+            # Keep only the definitions in the unit's own ranges
+            ranges = [
+                split
+                for split in splits.ranges
+                if os.path.splitext(split.unit)[0] == mapping.object
+            ]
+            candidates = [
+                i
+                for i in candidates
+                if any(
+                    split.section == symbols.section_name(i)
+                    and split.start <= symbols.symbol(i).address < split.end
+                    for split in ranges
+                )
+            ]
+        if not candidates:
+            failed.append((mapping, "not found"))
+            continue
+        if len(candidates) > 1:
+            failed.append((mapping, f"defined {len(candidates)} times"))
+            continue
+        line = symbols.symbol(candidates[0]).line
+        previous = renamed_lines.get(line)
+        if previous is not None:
+            if previous.new_name != mapping.new_name:
+                failed.append((mapping, f"also mapped to {previous.new_name} by {previous.unit}"))
+            continue
+        renamed_lines[line] = mapping
+        renames.append(Rename(line, mapping))
+    return renames, failed
 
-for module, symbol_mappings in symbol_mappings_per_file.items():
-    symbols_file = (
-        f"./config/{game_id}/symbols.txt"
-        if module == "MAIN"
-        else f"./config/{game_id}/rels/{module}/symbols.txt"
+
+# Replaces the names at the start of the renamed lines, leaving the rest as is
+def patch_lines(lines: List[str], renames: List[Rename]) -> List[Rename]:
+    applied: List[Rename] = []
+    for rename in renames:
+        text = lines[rename.line - 1]
+        stripped = text.lstrip()
+        indent = text[: len(text) - len(stripped)]
+        old_name = rename.mapping.old_name
+        rest = stripped[len(old_name) :]
+        if not stripped.startswith(old_name) or rest[:1] not in (" ", "\t", "="):
+            continue
+        lines[rename.line - 1] = indent + rename.mapping.new_name + rest
+        applied.append(rename)
+    return applied
+
+
+def write_atomic(path: str, data: str) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Apply objdiff symbol mappings to symbols.txt"""
+    )
+    parser.add_argument(
+        "--objdiff",
+        default="objdiff.json",
+        help="""Path to objdiff.json (default: objdiff.json)""",
+    )
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="""Print the renames without changing any files""",
     )
-    with open(symbols_file) as f:
-        symbols = f.readlines()
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="""Don't use the symbols.txt index cache""",
+    )
+    args = parser.parse_args()
+
+    objdiff_path = os.path.abspath(args.objdiff)
+    os.chdir(root_dir)
+    versions = read_versions("configure.py")
+    if not os.path.isfile(objdiff_path):
+        sys.exit(f"{args.objdiff} not found, run configure.py first")
+    with open(objdiff_path, "r", encoding="utf-8") as f:
+        objdiff_config = json.load(f)
 
-    for i, line in enumerate(symbols):
-        tokens = line.split()
-        old_symbol = tokens[0]
+    mappings = collect_mappings(objdiff_config, versions)
+    if not mappings:
+        print("No symbol mappings found")
+        return
+
+    applied_names: Dict[str, set] = {}  # unit -> applied old names
+    total_applied = total_failed = 0
+    pending: List[Tuple[str, str]] = []  # (path, data) to write
+    for directory, file_mappings in sorted(mappings.items()):
+        symbols_path = os.path.join(directory, "symbols.txt")
+        if not os.path.isfile(symbols_path):
+            print(f"{symbols_path} not found, skipping {len(file_mappings)} mapping(s)")
+            total_failed += len(file_mappings)
+            continue
+        splits_path = os.path.join(directory, "splits.txt")
+        splits = SplitIndex.parse(splits_path) if os.path.isfile(splits_path) else None
+        symbols = SymbolTable.load(symbols_path, None if args.no_cache else "build/symcache")
+        try:
+            renames, failed = resolve_renames(symbols, splits, file_mappings)
+        finally:
+            symbols.close()
 
-        new_symbol = symbol_mappings.get(old_symbol)
+        with open(symbols_path, "r", encoding="utf-8", newline="") as f:
+            lines = f.read().splitlines(keepends=True)
+        applied = patch_lines(lines, renames)
+        applied_lines = set(rename.line for rename in applied)
+        failed += [(r.mapping, "line changed") for r in renames if r.line not in applied_lines]
+
+        for rename in sorted(applied):
+            print(
+                f"{symbols_path}:{rename.line}: "
+                f"{rename.mapping.old_name} -> {rename.mapping.new_name}"
+            )
+            applied_names.setdefault(rename.mapping.unit, set()).add(rename.mapping.old_name)
+        for mapping, reason in failed:
+            print(f"{symbols_path}: {mapping.unit}: {mapping.old_name}: {reason}")
+        total_applied += len(applied)
+        total_failed += len(failed)
+        if applied:
+            pending.append((symbols_path, "".join(lines)))
+
+    print(
+        f"{total_applied} symbol(s) renamed in {len(pending)} file(s), "
+        f"{total_failed} mapping(s) not applied"
+    )
+    if args.dry_run or not pending:
+        return
 
-        if new_symbol is None:
+    # Keep only the mappings that weren't applied, so they aren't lost
+    for unit in objdiff_config.get("units", []):
+        names = applied_names.get(unit["name"])
+        symbol_mappings = unit.get("symbol_mappings")
+        if not names or not symbol_mappings:
             continue
+        remaining = {k: v for k, v in symbol_mappings.items() if k not in names}
+        if remaining:
+            unit["symbol_mappings"] = remaining
+        else:
+            del unit["symbol_mappings"]
 
-        tokens[0] = new_symbol
-        symbols[i] = " ".join(tokens) + "\n"
+    for path, data in pending:
+        write_atomic(path, data)
+    write_atomic(objdiff_path, json.dumps(objdiff_config, indent=2))
 
-    with open(symbols_file, "w") as f:
-        f.writelines(symbols)
 
-with open("./objdiff.json", "w") as f:
-    json.dump(objdiff_config, f)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+###
+# Per-function assembly cache for split target objects.
+#
+# Disassembly is stored per target object under build/<version>/asmcache,
+# in a file named by the hash of the object's contents, with one entry
+# per function keyed by its section, offset and size. A function's key
+# can be computed from symbols.txt and splits.txt alone (its address less
+# the start of the unit's split range), so lookups only hash the object
+# and read one cache file. Objects a re-split leaves unchanged keep their
+# hash and stay cached; changed objects are disassembled again on the
+# next lookup, and --prune removes the files no current object uses.
+#
+# Usage:
+#   python3 tools/asmcache.py fooFunc__Fv
+#   python3 tools/asmcache.py -v NXXJ01 --all
+#   python3 tools/asmcache.py --prune
+###
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from .funcdiff import format_asm, read_functions
+    from .splits import SplitIndex
+    from .symbols import SymbolTable
+except ImportError:
+    from funcdiff import format_asm, read_functions
+    from splits import SplitIndex
+    from symbols import SymbolTable
+
+# Bump when the asm format or cache layout changes
+CACHE_VERSION = 2
+
+
+class Location(NamedTuple):
+    object_path: str
+    section: str
+    offset: int
+    size: int
+
+
+def function_key(section: str, offset: int, size: int) -> str:
+    return f"{section}:{offset:X}:{size:X}"
+
+
+class AsmCache:
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = cache_dir
+        # Object path -> (mtime_ns, size, hash), for repeated lookups
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+        # Object hash -> entries
+        self._entries: Dict[str, Dict[str, Dict[str, str]]] = {}
+
+    @staticmethod
+    def for_version(version: str, build_dir: str = "build") -> "AsmCache":
+        return AsmCache(os.path.join(build_dir, version, "asmcache"))
+
+    def object_hash(self, path: str) -> str:
+        st = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        h = hashlib.sha1()
+        h.update(str(CACHE_VERSION).encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+        digest = h.hexdigest()
+        self._hashes[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+
+    # Returns the entries of an object ({"name", "asm"} by function key),
+    # disassembling it if it isn't cached
+    def entries(self, object_path: str) -> Dict[str, Dict[str, str]]:
+        digest = self.object_hash(object_path)
+        entries = self._entries.get(digest)
+        if entries is not None:
+            return entries
+        cache_path = self._path(digest)
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {
+                function_key(function.section, function.offset, len(function.instructions) * 4): {
+                    "name": function.name,
+                    "asm": format_asm(function),
+                }
+                for function in read_functions(object_path).values()
+            }
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # Written atomically, as other processes may read it
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, cache_path)
+        self._entries[digest] = entries
+        return entries
+
+    def get(self, location: Location) -> Optional[str]:
+        entry = self.entries(location.object_path).get(
+            function_key(location.section, location.offset, location.size)
+        )
+        return entry["asm"] if entry is not None else None
+
+    # Returns the assembly of every function in an object, by name
+    def function_asm(self, object_path: str) -> Dict[str, str]:
+        return {entry["name"]: entry["asm"] for entry in self.entries(object_path).values()}
+
+
+# Target object of a splits.txt unit: game/foo.cpp -> build/<version>/obj/game/foo.o
+def object_path(version: str, unit: str, build_dir: str = "build") -> str:
+    return os.path.join(build_dir, version, "obj", os.path.splitext(unit)[0] + ".o")
+
+
+# Finds the object, section offset and size of a function from symbols.txt
+# and splits.txt
+def locate(
+    name: str, version: str, symbols: SymbolTable, splits: SplitIndex, build_dir: str = "build"
+) -> Optional[Location]:
+    i = symbols.find(name)
+    if i is None:
+        return None
+    symbol = symbols.symbol(i)
+    ranges = splits.at(symbol.address, symbol.section)
+    if not ranges or symbol.size == 0:
+        return None
+    split = ranges[0]
+    return Location(
+        object_path(version, split.unit, build_dir),
+        symbol.section,
+        symbol.address - split.start,
+        symbol.size,
+    )
+
+
+def _warm(cache_dir: str, path: str) -> int:
+    return len(AsmCache(cache_dir).entries(path))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Print and cache the assembly of target functions"""
+    )
+    parser.add_argument(
+        "functions",
+        nargs="*",
+        help="""Function names to print""",
+    )
+    parser.add_argument(
+        "-v",
+        "--version",
+        default="GXXE01",
+        help="""Version whose config and objects to read (default: GXXE01)""",
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="""Cache every target object""",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="""Remove cache files of objects that no longer exist""",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="""Parallel jobs for --all (default: CPU count)""",
+    )
+    args = parser.parse_args()
+
+    config_dir = os.path.join("config", args.version)
+    splits_path = os.path.join(config_dir, "splits.txt")
+    if not os.path.isfile(splits_path):
+        sys.exit(f"{splits_path} not found")
+    splits = SplitIndex.parse(splits_path)
+    cache = AsmCache.for_version(args.version)
+    objects = sorted(
+        path
+        for path in {object_path(args.version, unit) for unit in splits.units}
+        if os.path.isfile(path)
+    )
+
+    if args.all:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            counts = list(pool.map(_warm, [cache.cache_dir] * len(objects), objects, chunksize=16))
+        print(f"Cached {sum(counts)} functions from {len(objects)} objects in {cache.cache_dir}")
+
+    if args.prune:
+        used = {os.path.basename(cache._path(cache.object_hash(path))) for path in objects}
+        removed = 0
+        for root, _, files in os.walk(cache.cache_dir):
+            for file in files:
+                if file not in used:
+                    os.remove(os.path.join(root, file))
+                    removed += 1
+        print(f"Removed {removed} cache files")
+
+    if args.functions:
+        symbols = SymbolTable.load(os.path.join(config_dir, "symbols.txt"))
+        missing: List[str] = []
+        for name in args.functions:
+            location = locate(name, args.version, symbols, splits)
+            if location is None or not os.path.isfile(location.object_path):
+                missing.append(name)
+                continue
+            asm = cache.get(location)
+            if asm is None:
+                missing.append(name)
+                continue
+            print(asm, end="")
+        if missing:
+            sys.exit(f"Not found: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+###
+# Memory-mapped readers for DOL and big-endian ELF32 files.
+#
+# Files are mapped read-only, and section contents are returned as
+# memoryview slices of the mapping, so nothing is copied until a caller
+# asks for it. ELF section headers are parsed on open; symbols and
+# relocations are decoded lazily as they are iterated.
+#
+# Views returned by a reader are only valid until it is closed, which
+# releases the ones still referenced; views a caller drops are freed with
+# them, so long-lived readers don't accumulate them. Use the readers as
+# context managers:
+#
+#   with Dol("orig/GXXE01/sys/main.dol") as dol:
+#       code = dol.read(0x80005940, 0x40)
+#
+#   with Elf("build/GXXE01/obj/game/foo.o") as elf:
+#       for reloc in elf.relocations(elf.section(".text")):
+#           ...
+###
+
+import mmap
+import struct
+import weakref
+from bisect import bisect_right
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+# PowerPC relocation types used by the toolchain
+R_PPC_ADDR32 = 1
+R_PPC_ADDR24 = 2
+R_PPC_ADDR16 = 3
+R_PPC_ADDR16_LO = 4
+R_PPC_ADDR16_HI = 5
+R_PPC_ADDR16_HA = 6
+R_PPC_ADDR14 = 7
+R_PPC_REL24 = 10
+R_PPC_REL14 = 11
+R_PPC_REL32 = 26
+R_PPC_EMB_SDA21 = 109
+
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHT_RELA = 4
+SHT_NOBITS = 8
+
+STT_OBJECT = 1
+STT_FUNC = 2
+STT_SECTION = 3
+
+SHN_UNDEF = 0
+SHN_ABS = 0xFFF1
+
+
+class MappedFile:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            self._file.close()
+            raise ValueError(f"{path}: empty file")
+        self.data = memoryview(self._mmap)
+        # Views still referenced by callers, by id, to release before
+        # unmapping. Entries remove themselves when a view is freed.
+        self._views: Dict[int, "weakref.ref[memoryview]"] = {}
+
+    # Returns a view of the file, released on close if still referenced
+    def view(self, offset: int, size: int) -> memoryview:
+        if offset < 0 or size < 0 or offset + size > len(self.data):
+            raise ValueError(f"{self.path}: range 0x{offset:X}+0x{size:X} out of bounds")
+        view = self.data[offset : offset + size]
+        views, key = self._views, id(view)
+        views[key] = weakref.ref(view, lambda _: views.pop(key, None))
+        return view
+
+    def close(self) -> None:
+        if self._mmap is None:
+            return
+        # Views into the mapping must be released before closing it
+        for ref in list(self._views.values()):
+            view = ref()
+            if view is not None:
+                view.release()
+        self._views.clear()
+        self.data.release()
+        self._mmap.close()
+        self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+class DolSection(NamedTuple):
+    name: str  # ".text0"-".text6", ".data0"-".data10"
+    offset: int
+    address: int
+    size: int
+
+
+class Dol(MappedFile):
+    # 7 text and 11 data sections: offsets, addresses and sizes,
+    # then the bss address and size, and the entry point
+    HEADER = struct.Struct(">57I")
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        if len(self.data) < 0x100:
+            self.close()
+            raise ValueError(f"{path}: not a DOL")
+        fields = Dol.HEADER.unpack_from(self.data, 0)
+        sections: List[DolSection] = []
+        for i in range(18):
+            offset, address, size = fields[i], fields[18 + i], fields[36 + i]
+            if size == 0 or offset == 0:
+                continue
+            name = f".text{i}" if i < 7 else f".data{i - 7}"
+            sections.append(DolSection(name, offset, address, size))
+        # Sorted by address for lookups
+        sections.sort(key=lambda s: s.address)
+        self.sections = sections
+        self.bss_address, self.bss_size, self.entry = fields[54:57]
+        self._addresses = [s.address for s in sections]
+
+    def section_at(self, address: int) -> Optional[DolSection]:
+        i = bisect_right(self._addresses, address) - 1
+        if i < 0:
+            return None
+        section = self.sections[i]
+        if address >= section.address + section.size:
+            return None
+        return section
+
+    # Returns the contents at a virtual address, if they lie in one section
+    def read(self, address: int, size: int) -> Optional[memoryview]:
+        section = self.section_at(address)
+        if section is None or address + size > section.address + section.size:
+            return None
+        return self.view(section.offset + address - section.address, size)
+
+
+class ElfSection(NamedTuple):
+    index: int
+    name: str
+    type: int
+    flags: int
+    address: int
+    offset: int
+    size: int
+    link: int
+    info: int
+    align: int
+    entsize: int
+
+
+class ElfSymbol(NamedTuple):
+    index: int
+    name: str
+    value: int
+    size: int
+    bind: int
+    type: int
+    other: int
+    shndx: int
+
+
+class ElfRelocation(NamedTuple):
+    offset: int
+    type: int
+    symbol: int  # Index into the linked symbol table
+    addend: int
+
+
+class Elf(MappedFile):
+    IDENT = struct.Struct(">4sBBB9x")
+    HEADER = struct.Struct(">HHIIIIIHHHHHH")
+    SECTION = struct.Struct(">10I")
+    SYMBOL = struct.Struct(">IIIBBH")
+    RELA = struct.Struct(">IIi")
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        if len(self.data) < Elf.IDENT.size + Elf.HEADER.size:
+            self.close()
+            raise ValueError(f"{path}: not an ELF file")
+        magic, elf_class, encoding, _ = Elf.IDENT.unpack_from(self.data, 0)
+        if magic != b"\x7fELF" or elf_class != 1 or encoding != 2:
+            self.close()
+            raise ValueError(f"{path}: not a big-endian ELF32 file")
+        (
+            self.type,
+            self.machine,
+            _,
+            self.entry,
+            _,
+            shoff,
+            self.flags,
+            _,
+            _,
+            _,
+            shentsize,
+            shnum,
+            shstrndx,
+        ) = Elf.HEADER.unpack_from(self.data, Elf.IDENT.size)
+
+        headers = [
+            Elf.SECTION.unpack_from(self.data, shoff + i * shentsize) for i in range(shnum)
+        ]
+        names = headers[shstrndx] if shstrndx < shnum else None
+        self.sections: List[ElfSection] = []
+        for i, (name, *fields) in enumerate(headers):
+            section_name = self._string(names[4], names[5], name) if names else ""
+            self.sections.append(ElfSection(i, section_name, *fields))
+        self._by_name: Dict[str, ElfSection] = {}
+        for section in self.sections:
+            self._by_name.setdefault(section.name, section)
+
+    def _string(self, offset: int, size: int, index: int) -> str:
+        if index >= size:
+            return ""
+        start = offset + index
+        end = self._mmap.find(b"\0", start, offset + size)
+        if end < 0:
+            end = offset + size
+        return str(self.data[start:end], "utf-8", "replace")
+
+    def section(self, name: str) -> Optional[ElfSection]:
+        return self._by_name.get(name)
+
+    # Returns a section's contents (empty for .bss-like sections)
+    def data_of(self, section: ElfSection) -> memoryview:
+        if section.type == SHT_NOBITS:
+            return self.view(0, 0)
+        return self.view(section.offset, section.size)
+
+    # Iterates a symbol table, the first one if none is given
+    def symbols(self, symtab: Optional[ElfSection] = None) -> Iterator[ElfSymbol]:
+        if symtab is None:
+            symtab = next((s for s in self.sections if s.type == SHT_SYMTAB), None)
+            if symtab is None:
+                return
+        strtab = self.sections[symtab.link]
+        entsize = symtab.entsize or Elf.SYMBOL.size
+        for i in range(symtab.size // entsize):
+            name, value, size, info, other, shndx = Elf.SYMBOL.unpack_from(
+                self.data, symtab.offset + i * entsize
+            )
+            yield ElfSymbol(
+                i,
+                self._string(strtab.offset, strtab.size, name),
+                value,
+                size,
+                info >> 4,
+                info & 0xF,
+                other,
+                shndx,
+            )
+
+    # Iterates the relocations applying to a section, in file order
+    def relocations(self, section: ElfSection) -> Iterator[ElfRelocation]:
+        for rela in self.sections:
+            if rela.type != SHT_RELA or rela.info != section.index:
+                continue
+            view = self.data[rela.offset : rela.offset + rela.size]
+            try:
+                for offset, info, addend in Elf.RELA.iter_unpack(view):
+                    yield ElfRelocation(offset, info & 0xFF, info >> 8, addend)
+            finally:
+                view.release()
+
+
+# Opens a DOL or ELF file, by its contents
+def open_binary(path: str) -> MappedFile:
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic == b"\x7fELF":
+        return Elf(path)
+    return Dol(path)
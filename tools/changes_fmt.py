@@ -4,7 +4,7 @@ from argparse import ArgumentParser
 import os
 import json
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import NamedTuple, Optional, Tuple
 
 script_dir = os.path.dirname(os.path.realpath(__file__))
 root_dir = os.path.abspath(os.path.join(script_dir, ".."))
@@ -22,7 +22,32 @@ FUNCTION_KEYS_TO_DIFF = [
     "fuzzy_match_percent",
 ]
 
-Change = Tuple[str, str, float, float]
+# Measure each unit key is a percentage of, for byte impact
+UNIT_KEY_SIZES = {
+    "fuzzy_match_percent": "total_code",
+    "matched_code_percent": "total_code",
+    "matched_data_percent": "total_data",
+    "complete_code_percent": "total_code",
+    "complete_data_percent": "total_data",
+}
+
+# Default number of individual changes listed
+DEFAULT_TOP = 50
+# Default unit path depth used to group units into libraries
+DEFAULT_LIB_DEPTH = 2
+
+
+class Change(NamedTuple):
+    name: Optional[str]  # Unit or function name, None for the total
+    key: str
+    from_value: float
+    to_value: float
+    unit: Optional[str] = None  # Unit containing the change
+    size: int = 0  # Size in bytes the percentage applies to
+
+    # Approximate number of bytes gained or lost
+    def impact(self) -> float:
+        return abs(self.to_value - self.from_value) * self.size / 100.0
 
 
 def format_float(value: float) -> str:
@@ -35,49 +60,131 @@ def get_changes(changes_file: str) -> Tuple[list[Change], list[Change]]:
     changes_file = os.path.relpath(changes_file, root_dir)
     with open(changes_file, "r") as f:
         changes_json = json.load(f)
+    return collect_changes(changes_json)
+
 
+def collect_changes(changes_json: dict) -> Tuple[list[Change], list[Change]]:
     regressions = []
     progressions = []
 
-    def diff_key(object_name: Optional[str], object: dict, key: str):
+    def diff_key(
+        object_name: Optional[str],
+        object: dict,
+        key: str,
+        unit_name: Optional[str],
+        size: int,
+    ):
         from_value = object.get("from", {}).get(key, 0.0)
         to_value = object.get("to", {}).get(key, 0.0)
-        key = key.removesuffix("_percent")
-        change = (object_name, key, from_value, to_value)
+        short_key = key.removesuffix("_percent")
+        change = Change(object_name, short_key, from_value, to_value, unit_name, size)
         if from_value > to_value:
             regressions.append(change)
         elif to_value > from_value:
             progressions.append(change)
 
+    def get_size(object: dict, key: str) -> int:
+        # u64 values are written as strings, and zero values omitted
+        return max(
+            int(object.get("from", {}).get(key, 0)),
+            int(object.get("to", {}).get(key, 0)),
+        )
+
     for key in UNIT_KEYS_TO_DIFF:
-        diff_key(None, changes_json, key)
+        diff_key(None, changes_json, key, None, get_size(changes_json, UNIT_KEY_SIZES[key]))
 
     for unit in changes_json.get("units", []):
         unit_name = unit["name"]
         for key in UNIT_KEYS_TO_DIFF:
-            diff_key(unit_name, unit, key)
+            diff_key(unit_name, unit, key, unit_name, get_size(unit, UNIT_KEY_SIZES[key]))
         # Ignore sections
         for func in unit.get("functions", []):
             func_name = func["name"]
             for key in FUNCTION_KEYS_TO_DIFF:
-                diff_key(func_name, func, key)
+                diff_key(func_name, func, key, unit_name, get_size(func, "size"))
 
     return regressions, progressions
 
 
-def generate_changes_plaintext(changes: list[Change]) -> str:
+# Groups units by the leading directories of their name, below the module
+def get_lib(unit_name: Optional[str], depth: int) -> str:
+    if unit_name is None:
+        return "Total"
+    parts = unit_name.split("/")
+    dirs = parts[1:-1] if len(parts) > 2 else parts[:-1]
+    return "/".join(dirs[:depth]) or parts[0]
+
+
+class LibSummary(NamedTuple):
+    lib: str
+    units: int
+    functions: int
+    bytes: int
+
+
+# Sorts changes by byte impact, keeping the total first
+def sort_changes(changes: list[Change]) -> list[Change]:
+    return sorted(changes, key=lambda c: (c.name is not None, -c.impact()))
+
+
+# Aggregates changes by library, sorted by byte impact. A unit's byte
+# impact is the sum of its function changes, or its fuzzy match change
+# if no functions changed, so that the same code isn't counted twice.
+def summarize_libs(changes: list[Change], depth: int) -> list[LibSummary]:
+    function_counts: dict[str, int] = {}
+    function_impact: dict[str, float] = {}
+    unit_impact: dict[str, float] = {}
+    for change in changes:
+        if change.unit is None:
+            continue
+        function_counts.setdefault(change.unit, 0)
+        if change.name != change.unit:
+            function_counts[change.unit] += 1
+            function_impact[change.unit] = function_impact.get(change.unit, 0.0) + change.impact()
+        elif change.key == "fuzzy_match":
+            unit_impact[change.unit] = change.impact()
+
+    libs: dict[str, list[float]] = {}
+    for unit, count in function_counts.items():
+        totals = libs.setdefault(get_lib(unit, depth), [0, 0, 0.0])
+        totals[0] += 1
+        totals[1] += count
+        if count:
+            totals[2] += function_impact[unit]
+        else:
+            totals[2] += unit_impact.get(unit, 0.0)
+    summaries = [
+        LibSummary(lib, int(units), int(functions), round(impact))
+        for lib, (units, functions, impact) in libs.items()
+    ]
+    summaries.sort(key=lambda s: (-s.bytes, -s.units, s.lib))
+    return summaries
+
+
+def count_summary(changes: list[Change]) -> Tuple[int, int]:
+    units = set(c.unit for c in changes if c.unit is not None)
+    functions = sum(1 for c in changes if c.unit is not None and c.name != c.unit)
+    return len(units), functions
+
+
+def generate_changes_plaintext(
+    changes: list[Change], top: int = DEFAULT_TOP, depth: int = DEFAULT_LIB_DEPTH
+) -> str:
     if len(changes) == 0:
         return ""
 
+    changes = sort_changes(changes)
+    shown = changes[:top] if top > 0 else changes
+
     table_total_width = 136
     percents_max_len = 7 + 4 + 7
-    key_max_len = max(len(key) for _, key, _, _ in changes)
-    name_max_len = max(len(name or "Total") for name, _, _, _ in changes)
+    key_max_len = max(len(c.key) for c in shown)
+    name_max_len = max(len(c.name or "Total") for c in shown)
     max_width_for_name_col = table_total_width - 3 - key_max_len - 3 - percents_max_len
     name_max_len = min(max_width_for_name_col, name_max_len)
 
     out_lines = []
-    for name, key, from_value, to_value in changes:
+    for name, key, from_value, to_value, _, _ in shown:
         if name is None:
             name = "Total"
         if len(name) > name_max_len:
@@ -86,25 +193,59 @@ def generate_changes_plaintext(changes: list[Change]) -> str:
             f"{name:>{name_max_len}} | {key:<{key_max_len}} | {format_float(from_value)}% -> {format_float(to_value)}%"
         )
 
+    if len(shown) < len(changes):
+        units, functions = count_summary(changes)
+        out_lines.append(
+            f"... and {len(changes) - len(shown)} more ({len(changes)} changes in {units} units, {functions} functions)"
+        )
+        libs = summarize_libs(changes, depth)
+        lib_max_len = max((len(s.lib) for s in libs), default=0)
+        if libs:
+            out_lines.append("")
+        for summary in libs:
+            out_lines.append(
+                f"{summary.lib:>{lib_max_len}} | {summary.units:5} units | {summary.functions:5} functions | {summary.bytes:8} bytes"
+            )
+
     return "\n".join(out_lines)
 
 
-def generate_changes_markdown(changes: list[Change], description: str) -> str:
+def generate_changes_markdown(
+    changes: list[Change],
+    description: str,
+    top: int = DEFAULT_TOP,
+    depth: int = DEFAULT_LIB_DEPTH,
+) -> str:
     if len(changes) == 0:
         return ""
 
+    changes = sort_changes(changes)
+    shown = changes[:top] if top > 0 else changes
+    units, functions = count_summary(changes)
+
     out_lines = []
     name_max_len = 100
 
     out_lines.append("<details>")
     out_lines.append(
-        f"<summary>Detected {len(changes)} {description} compared to the base:</summary>"
+        f"<summary>Detected {len(changes)} {description} compared to the base "
+        f"({units} units, {functions} functions):</summary>"
     )
     out_lines.append("")  # Must include a blank line before a table
+
+    if len(shown) < len(changes):
+        out_lines.append("| Library | Units | Functions | Bytes |")
+        out_lines.append("| ------- | ----- | --------- | ----- |")
+        for summary in summarize_libs(changes, depth):
+            out_lines.append(
+                f"| `{summary.lib}` | {summary.units} | {summary.functions} | {summary.bytes} |"
+            )
+        out_lines.append("")
+
     out_lines.append("| Name | Type | Before | After |")
     out_lines.append("| ---- | ---- | ------ | ----- |")
 
-    for name, key, from_value, to_value in changes:
+    for name, key, from_value, to_value, _, _ in shown:
         if name is None:
             name = "Total"
         else:
@@ -116,11 +257,41 @@ def generate_changes_markdown(changes: list[Change], description: str) -> str:
             f"| {name} | {key} | {format_float(from_value)}% | {format_float(to_value)}% |"
         )
 
+    if len(shown) < len(changes):
+        out_lines.append("")
+        out_lines.append(
+            f"Showing the {len(shown)} largest of {len(changes)} {description}."
+        )
     out_lines.append("</details>")
 
     return "\n".join(out_lines)
 
 
+def generate_changes_summary(
+    changes: list[Change], top: int = DEFAULT_TOP, depth: int = DEFAULT_LIB_DEPTH
+) -> dict:
+    changes = sort_changes(changes)
+    shown = changes[:top] if top > 0 else changes
+    units, functions = count_summary(changes)
+    return {
+        "count": len(changes),
+        "units": units,
+        "functions": functions,
+        "libs": [summary._asdict() for summary in summarize_libs(changes, depth)],
+        "top": [
+            {
+                "name": c.name or "Total",
+                "unit": c.unit,
+                "key": c.key,
+                "from": c.from_value,
+                "to": c.to_value,
+                "bytes": round(c.impact()),
+            }
+            for c in shown
+        ],
+    }
+
+
 def main():
     parser = ArgumentParser(description="Format objdiff-cli report changes.")
     parser.add_argument(
@@ -139,14 +310,44 @@ def main():
         action="store_true",
         help="""Includes progressions as well.""",
     )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=DEFAULT_TOP,
+        help=f"""Number of changes to list, largest byte impact first (0 for all, default {DEFAULT_TOP})""",
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=DEFAULT_LIB_DEPTH,
+        help=f"""Unit path depth used to group units into libraries (default {DEFAULT_LIB_DEPTH})""",
+    )
+    parser.add_argument(
+        "--json",
+        type=Path,
+        help="""Also write a compact JSON summary to this file""",
+    )
     args = parser.parse_args()
 
     regressions, progressions = get_changes(args.report_changes_file)
 
+    if args.json:
+        summary = {"regressions": generate_changes_summary(regressions, args.top, args.depth)}
+        if args.all:
+            summary["progressions"] = generate_changes_summary(
+                progressions, args.top, args.depth
+            )
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, separators=(",", ":"))
+
     if args.output:
-        markdown_output = generate_changes_markdown(regressions, "regressions")
+        markdown_output = generate_changes_markdown(
+            regressions, "regressions", args.top, args.depth
+        )
         if args.all:
-            markdown_output += generate_changes_markdown(progressions, "progressions")
+            markdown_output += generate_changes_markdown(
+                progressions, "progressions", args.top, args.depth
+            )
         with open(args.output, "w", encoding="utf-8") as f:
             f.write(markdown_output)
     else:
@@ -154,7 +355,7 @@ def main():
             changes = progressions + regressions
         else:
             changes = regressions
-        text_output = generate_changes_plaintext(changes)
+        text_output = generate_changes_plaintext(changes, args.top, args.depth)
         print(text_output)
 
 
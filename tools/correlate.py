@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+###
+# Cross-version function correlation.
+#
+# Reads the DOL of two versions from orig/ and the functions in their
+# symbols.txt, and hashes each function's instructions with the bits that
+# relocations fill in masked out (branch targets, and the immediates of
+# lis/addi/ori and the loads and stores, paired singles included, that
+# address symbols). Functions are matched through the hash buckets: unique
+# hashes first, then ties broken by the neighbouring functions' matches,
+# then runs of unmatched functions of similar sizes between two matches,
+# in order.
+#
+# Matched functions whose names differ are proposed as renames for the
+# target version's symbols.txt.
+#
+# Usage:
+#   python3 tools/correlate.py
+#   python3 tools/correlate.py --from NXXJ01 --to GXXE01 --all -o renames.json
+###
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from .binfile import Dol
+    from .symbols import SYMBOL_TYPES, SymbolTable
+except ImportError:
+    from binfile import Dol
+    from symbols import SYMBOL_TYPES, SymbolTable
+
+# Names generated by decomp-toolkit for unknown symbols
+auto_name_pattern = re.compile(r"^(?:fn|func|lbl)_[0-9A-Fa-f]{8}$")
+config_pattern = re.compile(r"^(?P<key>object_base|object):\s*(?P<value>\S+)\s*$", re.MULTILINE)
+
+CODE_SECTIONS = (".init", ".text")
+# Largest relative size difference for functions matched by order alone
+ORDER_SIZE_TOLERANCE = 0.125
+
+
+# Masks the fields of a function's instructions that relocations fill in,
+# in place. A DOL has no relocations left, so registers holding symbol
+# addresses are tracked instead: set by lis, carried through addi, ori and
+# mr, and cleared by loads and li. Displacements and immediates based on
+# them, r2 or r13 are masked, including the 12-bit displacements of the
+# paired-single loads and stores.
+def mask_relocations(words: array) -> None:
+    address_regs = 0
+    for i, word in enumerate(words):
+        opcode = word >> 26
+        rd = (word >> 21) & 31
+        ra = (word >> 16) & 31
+        if opcode == 18:  # b, bl
+            words[i] = word & 0xFC000003
+            continue
+        if opcode == 15 and ra == 0:  # lis
+            words[i] = word & 0xFFFF0000
+            address_regs |= 1 << rd
+            continue
+        if opcode == 24:  # ori rA, rS, UIMM
+            if address_regs >> rd & 1:
+                words[i] = word & 0xFFFF0000
+                address_regs |= 1 << ra
+            else:
+                address_regs &= ~(1 << ra)
+            continue
+        if opcode == 31 and (word >> 1) & 0x3FF == 444:  # or rA, rS, rB (mr)
+            if address_regs >> rd & 1 and (word >> 11) & 31 == rd:
+                address_regs |= 1 << ra
+            else:
+                address_regs &= ~(1 << ra)
+            continue
+        if opcode in (56, 57, 60, 61):  # psq_l, psq_lu, psq_st, psq_stu
+            if ra == 2 or ra == 13 or address_regs >> ra & 1:
+                words[i] = word & 0xFFFFF000
+            continue
+        if opcode == 14 or opcode == 15 or 32 <= opcode <= 55:
+            based = ra == 2 or ra == 13 or address_regs >> ra & 1
+            if based:
+                words[i] = word & 0xFFFF0000
+            # addi and addis keep the address; li and integer loads replace it
+            if opcode == 14 or opcode == 15:
+                if based:
+                    address_regs |= 1 << rd
+                else:
+                    address_regs &= ~(1 << rd)
+            elif 32 <= opcode <= 35 or 40 <= opcode <= 43 or opcode == 46:
+                address_regs &= ~(1 << rd)
+
+
+def function_hash(code: memoryview) -> int:
+    words = array("I")
+    words.frombytes(code)
+    if sys.byteorder == "little":
+        words.byteswap()
+    mask_relocations(words)
+    return int.from_bytes(hashlib.blake2b(words.tobytes(), digest_size=8).digest(), "little")
+
+
+class FunctionSet:
+    def __init__(self, symbols: SymbolTable, dol: Dol) -> None:
+        self.symbols = symbols
+        # Symbol table index, address, size and masked hash of each function,
+        # in (section, address) order
+        self.index = array("I")
+        self.address = array("I")
+        self.size = array("I")
+        self.hash = array("Q")
+        code_sections = set(
+            section_id
+            for section_id in map(symbols.section_id, CODE_SECTIONS)
+            if section_id is not None
+        )
+        function_type = SYMBOL_TYPES.index("function")
+        for i in symbols.by_address:
+            if symbols.type[i] != function_type or symbols.section[i] not in code_sections:
+                continue
+            address, size = symbols.address[i], symbols.size[i]
+            code = dol.read(address, size) if size else None
+            if code is None:
+                continue
+            self.index.append(i)
+            self.address.append(address)
+            self.size.append(size)
+            self.hash.append(function_hash(code))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def name(self, i: int) -> str:
+        return self.symbols.name(self.index[i])
+
+
+class Match(NamedTuple):
+    source: int  # Function index in the source set
+    target: int  # Function index in the target set
+    method: str  # "hash", "neighbor" or "order"
+
+
+def _sizes_close(a: int, b: int) -> bool:
+    return abs(a - b) <= max(a, b) * ORDER_SIZE_TOLERANCE
+
+
+def correlate(source: FunctionSet, target: FunctionSet) -> List[Match]:
+    match_source = array("i", [-1]) * len(source)
+    match_target = array("i", [-1]) * len(target)
+    methods: Dict[int, str] = {}
+
+    def pair(i: int, j: int, method: str) -> None:
+        match_source[i] = j
+        match_target[j] = i
+        methods[i] = method
+
+    buckets: Dict[int, Tuple[List[int], List[int]]] = {}
+    for i, h in enumerate(source.hash):
+        buckets.setdefault(h, ([], []))[0].append(i)
+    for j, h in enumerate(target.hash):
+        buckets.setdefault(h, ([], []))[1].append(j)
+
+    # Unique hashes
+    tied: List[Tuple[List[int], List[int]]] = []
+    for source_list, target_list in buckets.values():
+        if len(source_list) == 1 and len(target_list) == 1:
+            pair(source_list[0], target_list[0], "hash")
+        elif source_list and target_list:
+            tied.append((source_list, target_list))
+
+    # Ties, by the matches of the neighbouring functions: the candidate
+    # following the previous function's match, or preceding the next one's.
+    # Each pass can anchor more neighbours, so repeat until stable.
+    progress = True
+    while progress and tied:
+        progress = False
+        remaining: List[Tuple[List[int], List[int]]] = []
+        for source_list, target_list in tied:
+            source_list = [i for i in source_list if match_source[i] < 0]
+            target_list = [j for j in target_list if match_target[j] < 0]
+            if not source_list or not target_list:
+                continue
+            target_set = set(target_list)
+            for i in source_list:
+                candidates = set()
+                if i > 0 and match_source[i - 1] >= 0:
+                    candidates.add(match_source[i - 1] + 1)
+                if i + 1 < len(source) and match_source[i + 1] >= 0:
+                    candidates.add(match_source[i + 1] - 1)
+                candidates = set(j for j in candidates if j in target_set and match_target[j] < 0)
+                if len(candidates) == 1:
+                    pair(i, candidates.pop(), "neighbor")
+                    progress = True
+            remaining.append((source_list, target_list))
+        tied = remaining
+
+    # Runs of unmatched functions between two matches, paired in order
+    # when both runs are the same length and the sizes are close
+    previous: Optional[Tuple[int, int]] = None
+    for i in range(len(source)):
+        j = match_source[i]
+        if j < 0:
+            continue
+        if previous is not None and j > previous[1]:
+            gap_source = range(previous[0] + 1, i)
+            gap_target = range(previous[1] + 1, j)
+            if (
+                len(gap_source) == len(gap_target)
+                and len(gap_source) > 0
+                and all(match_target[t] < 0 for t in gap_target)
+                and all(
+                    _sizes_close(source.size[s], target.size[t])
+                    for s, t in zip(gap_source, gap_target)
+                )
+            ):
+                for s, t in zip(gap_source, gap_target):
+                    pair(s, t, "order")
+        previous = (i, j)
+
+    return [Match(i, match_source[i], methods[i]) for i in range(len(source)) if match_source[i] >= 0]
+
+
+# Reads the DOL path of a version from its config.yml
+def dol_path(version: str) -> str:
+    config_path = os.path.join("config", version, "config.yml")
+    with open(config_path, "r", encoding="utf-8") as f:
+        values = {m["key"]: m["value"] for m in config_pattern.finditer(f.read())}
+    if "object" not in values:
+        sys.exit(f"object not found in {config_path}")
+    return os.path.join(values.get("object_base", ""), values["object"])
+
+
+def load_version(version: str, cache_dir: Optional[str]) -> Tuple[SymbolTable, Dol]:
+    symbols_path = os.path.join("config", version, "symbols.txt")
+    path = dol_path(version)
+    if not os.path.isfile(path):
+        sys.exit(f"{path} not found, extract the {version} disc to orig/{version} first")
+    return SymbolTable.load(symbols_path, cache_dir), Dol(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Match functions across versions and propose symbol renames"""
+    )
+    parser.add_argument(
+        "-f",
+        "--from",
+        dest="source",
+        default="GXXE01",
+        type=str.upper,
+        help="""Version to take names from (default: GXXE01)""",
+    )
+    parser.add_argument(
+        "-t",
+        "--to",
+        dest="target",
+        default="NXXJ01",
+        type=str.upper,
+        help="""Version to propose renames for (default: NXXJ01)""",
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="""Propose every differing name, not only for auto-generated names""",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="""Write the proposed renames to a JSON file""",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="""Don't use the symbols.txt index cache""",
+    )
+    args = parser.parse_args()
+
+    if args.source == args.target:
+        sys.exit("--from and --to must be different versions")
+    cache_dir = None if args.no_cache else os.path.join("build", "symcache")
+    source_symbols, source_dol = load_version(args.source, cache_dir)
+    target_symbols, target_dol = load_version(args.target, cache_dir)
+    source = FunctionSet(source_symbols, source_dol)
+    target = FunctionSet(target_symbols, target_dol)
+    matches = correlate(source, target)
+
+    renames = []
+    for match in matches:
+        old_name = target.name(match.target)
+        new_name = source.name(match.source)
+        if old_name == new_name or auto_name_pattern.match(new_name):
+            continue
+        if not args.all and not auto_name_pattern.match(old_name):
+            continue
+        address = target.address[match.target]
+        existing = target_symbols.find(new_name)
+        if existing is not None and target_symbols.symbol(existing).address != address:
+            print(f"0x{address:08X} {old_name}: {new_name} is already defined, skipping")
+            continue
+        renames.append(
+            {
+                "address": f"0x{address:08X}",
+                "old_name": old_name,
+                "new_name": new_name,
+                "source_address": f"0x{source.address[match.source]:08X}",
+                "method": match.method,
+            }
+        )
+        print(f"0x{address:08X} {old_name} -> {new_name} ({match.method})")
+
+    counts: Dict[str, int] = {}
+    for match in matches:
+        counts[match.method] = counts.get(match.method, 0) + 1
+    print(
+        f"{len(matches)} of {len(source)} {args.source} / {len(target)} {args.target} functions matched "
+        f"({', '.join(f'{count} by {method}' for method, count in counts.items()) or 'none'}), "
+        f"{len(renames)} rename(s) proposed"
+    )
+
+    if args.output:
+        with open(args.output + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(renames, f, indent=2)
+        os.replace(args.output + ".tmp", args.output)
+
+    source_symbols.close()
+    target_symbols.close()
+    source_dol.close()
+    target_dol.close()
+
+
+if __name__ == "__main__":
+    main()
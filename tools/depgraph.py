@@ -0,0 +1,346 @@
+###
+# Readers for ninja's build graph.
+#
+# mwcc depfiles are consumed by ninja (deps = gcc) and only persist in the
+# .ninja_deps log, so tooling that needs per-object header dependencies
+# reads the log directly. build.ninja is parsed for per-edge variables
+# such as cflags and mw_version.
+###
+
+import json
+import os
+import struct
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+NINJA_DEPS_SIGNATURE = b"# ninjadeps\n"
+
+
+class BuildEdge(NamedTuple):
+    rule: str
+    outputs: List[str]
+    implicit_outputs: List[str]
+    inputs: List[str]
+    implicit: List[str]
+    order_only: List[str]
+    variables: Dict[str, str]
+
+
+# Reads the ninja deps log, returning each output's most recent dependency list.
+# Dependencies are in the order reported by the compiler (first inclusion order).
+def read_ninja_deps(path: str = ".ninja_deps") -> Dict[str, List[str]]:
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(NINJA_DEPS_SIGNATURE):
+        raise ValueError(f"{path}: not a ninja deps log")
+    offset = len(NINJA_DEPS_SIGNATURE)
+    (version,) = struct.unpack_from("<i", data, offset)
+    if version not in (3, 4):
+        raise ValueError(f"{path}: unsupported deps log version {version}")
+    offset += 4
+    mtime_size = 8 if version == 4 else 4
+
+    nodes: List[str] = []
+    deps: Dict[int, List[int]] = {}
+    end = len(data)
+    while offset + 4 <= end:
+        (header,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        is_deps = header & 0x80000000
+        size = header & 0x7FFFFFFF
+        if offset + size > end:
+            # Truncated record from an interrupted build
+            break
+        if is_deps:
+            (out_id,) = struct.unpack_from("<i", data, offset)
+            count = (size - 4 - mtime_size) // 4
+            deps[out_id] = list(
+                struct.unpack_from(f"<{count}i", data, offset + 4 + mtime_size)
+            )
+        else:
+            name = data[offset : offset + size - 4].rstrip(b"\0")
+            nodes.append(name.decode("utf-8", errors="surrogateescape"))
+        offset += size
+
+    return {
+        nodes[out_id]: [nodes[i] for i in inputs if i < len(nodes)]
+        for out_id, inputs in deps.items()
+        if out_id < len(nodes)
+    }
+
+
+# Reads .ninja_log, returning the most recent build duration (ms) of each output
+def read_ninja_log(path: str = ".ninja_log") -> Dict[str, int]:
+    durations: Dict[str, int] = {}
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 4:
+                continue
+            try:
+                durations[parts[3]] = int(parts[1]) - int(parts[0])
+            except ValueError:
+                continue
+    return durations
+
+
+def _split_tokens(line: str) -> List[str]:
+    # Splits on unescaped spaces and unescapes $-sequences
+    tokens: List[str] = []
+    current: List[str] = []
+    i = 0
+    while i < len(line):
+        c = line[i]
+        if c == "$" and i + 1 < len(line):
+            current.append(line[i + 1])
+            i += 2
+            continue
+        if c == " ":
+            if current:
+                tokens.append("".join(current))
+                current = []
+        else:
+            current.append(c)
+        i += 1
+    if current:
+        tokens.append("".join(current))
+    return tokens
+
+
+def _logical_lines(path: str) -> Iterator[Tuple[int, str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        pending = ""
+        for raw in f:
+            line = raw.rstrip("\n")
+            if pending:
+                line = pending + line.lstrip()
+                pending = ""
+            # A trailing unescaped $ continues the line
+            stripped = line.rstrip("$")
+            if (len(line) - len(stripped)) % 2 == 1:
+                pending = line[:-1]
+                continue
+            indent = len(line) - len(line.lstrip(" "))
+            yield indent, line.strip()
+
+
+def _split_build_line(text: str) -> Tuple[List[str], str, List[str]]:
+    # Finds the unescaped ':' separating outputs from the rule
+    i = 0
+    while i < len(text):
+        if text[i] == "$":
+            i += 2
+            continue
+        if text[i] == ":":
+            break
+        i += 1
+    outputs = _split_tokens(text[:i])
+    rest = _split_tokens(text[i + 1 :])
+    return outputs, rest[0] if rest else "", rest[1:]
+
+
+def _partition(tokens: List[str], separators: Tuple[str, ...]) -> List[List[str]]:
+    groups: List[List[str]] = [[] for _ in range(len(separators) + 1)]
+    index = 0
+    for token in tokens:
+        if token in separators[index:]:
+            index = separators.index(token, index) + 1
+            continue
+        groups[index].append(token)
+    return groups
+
+
+# Parses the build edges of a generated build.ninja.
+# Only the subset of ninja syntax emitted by ninja_syntax.py is supported.
+def read_build_edges(path: str = "build.ninja") -> List[BuildEdge]:
+    edges: List[BuildEdge] = []
+    current: Optional[BuildEdge] = None
+    for indent, line in _logical_lines(path):
+        if not line or line.startswith("#"):
+            continue
+        if indent > 0:
+            if current is not None and "=" in line:
+                key, value = line.split("=", 1)
+                current.variables[key.strip()] = value.strip().replace("$$", "$")
+            continue
+        current = None
+        if not line.startswith("build "):
+            continue
+        outputs, rule, tokens = _split_build_line(line[len("build ") :])
+        explicit_outputs, implicit_outputs = _partition(outputs, ("|",))
+        inputs, implicit, order_only = _partition(tokens, ("|", "||"))
+        current = BuildEdge(
+            rule=rule,
+            outputs=explicit_outputs,
+            implicit_outputs=implicit_outputs,
+            inputs=inputs,
+            implicit=implicit,
+            order_only=order_only,
+            variables={},
+        )
+        edges.append(current)
+    return edges
+
+
+# Normalizes a dependency path from the deps log to a path relative to root
+def normalize_path(path: str, root: Optional[str] = None) -> str:
+    if root is None:
+        root = os.getcwd()
+    if os.path.isabs(path):
+        try:
+            path = os.path.relpath(path, root)
+        except ValueError:
+            # Different drive on Windows
+            return path.replace("\\", "/")
+    return os.path.normpath(path).replace("\\", "/")
+
+
+# Reverse dependency index from source files and headers to the objects
+# that include them, and from objects to the link and REL outputs built
+# from them. Cached as JSON keyed by build.ninja and .ninja_deps stats.
+class ReverseIndex:
+    # Rules whose outputs are reported as downstream of an object
+    LINK_RULES = ("link", "elf2dol", "makerel")
+
+    def __init__(
+        self,
+        objects: List[str],
+        dependents: Dict[str, List[int]],
+        outputs: List[str],
+        downstream: List[List[int]],
+    ) -> None:
+        self.objects = objects
+        self.dependents = dependents
+        self.outputs = outputs
+        self.downstream = downstream
+
+    # Returns the objects rebuilt when any of the given files change.
+    # Directories match every file below them.
+    def affected_objects(self, paths: Iterable[str]) -> List[str]:
+        ids: Set[int] = set()
+        for path in paths:
+            path = normalize_path(path)
+            found = self.dependents.get(path)
+            if found is not None:
+                ids.update(found)
+                continue
+            prefix = path.rstrip("/") + "/"
+            for dep, dep_ids in self.dependents.items():
+                if dep.startswith(prefix):
+                    ids.update(dep_ids)
+        return [self.objects[i] for i in sorted(ids)]
+
+    # Returns the link steps, DOLs and RELs rebuilt from the given objects
+    def affected_outputs(self, objects: Iterable[str]) -> List[str]:
+        object_ids = {o: i for i, o in enumerate(self.objects)}
+        ids: Set[int] = set()
+        for obj in objects:
+            obj_id = object_ids.get(obj)
+            if obj_id is not None:
+                ids.update(self.downstream[obj_id])
+        return [self.outputs[i] for i in sorted(ids)]
+
+    # Returns all indexed dependencies, with their number of dependent objects
+    def fan_out(self) -> List[Tuple[str, int]]:
+        return sorted(
+            ((dep, len(ids)) for dep, ids in self.dependents.items()),
+            key=lambda item: (-item[1], item[0]),
+        )
+
+    @staticmethod
+    def build(build_ninja: str, deps_log: str) -> "ReverseIndex":
+        edges = read_build_edges(build_ninja)
+        deps = read_ninja_deps(deps_log) if os.path.exists(deps_log) else {}
+
+        objects: List[str] = []
+        dependents: Dict[str, List[int]] = {}
+
+        def add_dependent(path: str, obj_id: int) -> None:
+            ids = dependents.setdefault(normalize_path(path), [])
+            if not ids or ids[-1] != obj_id:
+                ids.append(obj_id)
+
+        consumers: Dict[str, List[BuildEdge]] = {}
+        for edge in edges:
+            for path in edge.inputs + edge.implicit:
+                consumers.setdefault(path, []).append(edge)
+            if not (edge.rule.startswith("mwcc") or edge.rule == "as"):
+                continue
+            obj_id = len(objects)
+            objects.append(edge.outputs[0])
+            # Assembly has no depfile, so always index the explicit inputs
+            for path in edge.inputs:
+                add_dependent(path, obj_id)
+            for path in deps.get(edge.outputs[0], []):
+                add_dependent(path, obj_id)
+
+        outputs: List[str] = []
+        output_ids: Dict[str, int] = {}
+        downstream: List[List[int]] = []
+        for obj in objects:
+            found: Set[int] = set()
+            visited: Set[str] = {obj}
+            queue = [obj]
+            while queue:
+                path = queue.pop()
+                for edge in consumers.get(path, []):
+                    if edge.rule not in ReverseIndex.LINK_RULES:
+                        continue
+                    for out in edge.outputs + edge.implicit_outputs:
+                        if out in visited:
+                            continue
+                        visited.add(out)
+                        queue.append(out)
+                        if out not in output_ids:
+                            output_ids[out] = len(outputs)
+                            outputs.append(out)
+                        found.add(output_ids[out])
+            downstream.append(sorted(found))
+
+        return ReverseIndex(objects, dependents, outputs, downstream)
+
+    @staticmethod
+    def load(
+        build_ninja: str = "build.ninja",
+        deps_log: str = ".ninja_deps",
+        cache_path: Optional[str] = None,
+    ) -> "ReverseIndex":
+        def stat_key(path: str) -> List[int]:
+            try:
+                st = os.stat(path)
+                return [st.st_mtime_ns, st.st_size]
+            except OSError:
+                return [0, 0]
+
+        key = [*stat_key(build_ninja), *stat_key(deps_log)]
+        if cache_path is not None:
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+                if cached.get("key") == key:
+                    return ReverseIndex(
+                        cached["objects"],
+                        cached["dependents"],
+                        cached["outputs"],
+                        cached["downstream"],
+                    )
+            except (OSError, ValueError, KeyError):
+                pass
+
+        index = ReverseIndex.build(build_ninja, deps_log)
+        if cache_path is not None:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "key": key,
+                        "objects": index.objects,
+                        "dependents": index.dependents,
+                        "outputs": index.outputs,
+                        "downstream": index.downstream,
+                    },
+                    f,
+                )
+            os.replace(cache_path + ".tmp", cache_path)
+        return index
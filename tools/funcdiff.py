@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+
+###
+# Function differ for PowerPC ELF objects.
+#
+# Functions are decoded with tools/ppcdis.py and aligned by mnemonic with
+# difflib. Relocated operands are replaced by their target symbol (sym@ha,
+# sym@l(r3), sym@sda21, bl sym), so objects linked at different addresses
+# compare equal. Compiler-generated local symbols (@123, lbl_...) are
+# numbered differently by each build, so they compare by their section,
+# size and contents instead of by name. Relative branches compare by the
+# aligned row of their target rather than by displacement.
+#
+# The score follows objdiff's: the percentage of aligned rows that are
+# identical, where any insertion, deletion, opcode or argument mismatch
+# counts as one differing row.
+#
+# Usage:
+#   python3 tools/funcdiff.py build/GXXE01/obj/game/foo.o build/GXXE01/src/game/foo.o
+#   python3 tools/funcdiff.py -u main/game/foo fooFunc__Fv -v
+#   python3 tools/funcdiff.py -u main/game/foo --check
+###
+
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from .binfile import (
+        R_PPC_ADDR16_HA,
+        R_PPC_ADDR16_HI,
+        R_PPC_ADDR16_LO,
+        R_PPC_EMB_SDA21,
+        R_PPC_REL14,
+        R_PPC_REL24,
+        SHN_ABS,
+        SHT_NOBITS,
+        STT_FUNC,
+        STT_SECTION,
+        Elf,
+        ElfSymbol,
+    )
+    from .ppcdis import Ins, decode_code, format_ins
+except ImportError:
+    from binfile import (
+        R_PPC_ADDR16_HA,
+        R_PPC_ADDR16_HI,
+        R_PPC_ADDR16_LO,
+        R_PPC_EMB_SDA21,
+        R_PPC_REL14,
+        R_PPC_REL24,
+        SHN_ABS,
+        SHT_NOBITS,
+        STT_FUNC,
+        STT_SECTION,
+        Elf,
+        ElfSymbol,
+    )
+    from ppcdis import Ins, decode_code, format_ins
+
+RELOCATION_SUFFIXES = {
+    R_PPC_ADDR16_LO: "@l",
+    R_PPC_ADDR16_HI: "@h",
+    R_PPC_ADDR16_HA: "@ha",
+    R_PPC_EMB_SDA21: "@sda21",
+}
+# Compiler-generated names, compared by the contents they name rather
+# than by name
+local_name_pattern = re.compile(r"^(?:@\d+|@stringBase\d+|lbl_[0-9A-Fa-f]+|\.\.\..*)$")
+
+
+class Function(NamedTuple):
+    name: str
+    instructions: List[Ins]
+    # Instruction index -> (relocation type, target name, addend)
+    relocations: Dict[int, Tuple[int, str, int]]
+    section: str = ""
+    offset: int = 0  # Within the section
+    # Compiler-generated symbol name -> section, size and contents hash
+    local_keys: Optional[Dict[str, str]] = None
+
+
+class Row(NamedTuple):
+    kind: str  # "match", "arg", "op", "insert" or "delete"
+    left: Optional[int]  # Instruction index in the target
+    right: Optional[int]  # Instruction index in the base
+
+
+class FunctionDiff(NamedTuple):
+    name: str
+    rows: List[Row]
+    percent: float
+    left: Optional[Function]
+    right: Optional[Function]
+
+
+# Reads the code and relocations of every function in an object
+def read_functions(path: str) -> Dict[str, Function]:
+    functions: Dict[str, Function] = {}
+    with Elf(path) as elf:
+        symbols: List[ElfSymbol] = list(elf.symbols())
+        local_keys: Dict[str, str] = {}
+        for symbol in symbols:
+            if symbol.shndx == 0 or symbol.shndx >= SHN_ABS or symbol.shndx >= len(elf.sections):
+                continue
+            if not local_name_pattern.match(symbol.name):
+                continue
+            section = elf.sections[symbol.shndx]
+            key = f"{section.name}:{symbol.size:X}"
+            if section.type != SHT_NOBITS and symbol.size > 0:
+                data = elf.data_of(section)[symbol.value : symbol.value + symbol.size]
+                key += ":" + hashlib.blake2b(data, digest_size=8).hexdigest()
+            local_keys[symbol.name] = key
+        by_section: Dict[int, List[ElfSymbol]] = {}
+        for symbol in symbols:
+            if symbol.type == STT_FUNC and symbol.size > 0 and 0 < symbol.shndx < len(elf.sections):
+                by_section.setdefault(symbol.shndx, []).append(symbol)
+        for shndx, section_functions in by_section.items():
+            section = elf.sections[shndx]
+            data = elf.data_of(section)
+            relocations: Dict[int, Tuple[int, str, int]] = {}
+            for reloc in elf.relocations(section):
+                target = symbols[reloc.symbol] if reloc.symbol < len(symbols) else None
+                if target is None:
+                    name = "?"
+                elif target.type == STT_SECTION:
+                    name = elf.sections[target.shndx].name
+                else:
+                    name = target.name
+                # 16-bit fields are addressed by their halfword
+                relocations[reloc.offset & ~3] = (reloc.type, name, reloc.addend)
+            for symbol in section_functions:
+                start, end = symbol.value, symbol.value + symbol.size
+                instructions = decode_code(data[start:end])
+                functions[symbol.name] = Function(
+                    symbol.name,
+                    instructions,
+                    {
+                        (offset - start) >> 2: reloc
+                        for offset, reloc in relocations.items()
+                        if start <= offset < end
+                    },
+                    section.name,
+                    start,
+                    local_keys,
+                )
+    return functions
+
+
+def _symbol_key(function: Function, name: str) -> str:
+    if not local_name_pattern.match(name):
+        return name
+    return "@local:" + (function.local_keys or {}).get(name, "?")
+
+
+# Returns an instruction's arguments with relocated operands made symbolic
+def symbolic_args(function: Function, index: int, normalize: bool = False) -> Tuple[str, ...]:
+    ins = function.instructions[index]
+    reloc = function.relocations.get(index)
+    if reloc is None:
+        return ins.args
+    reloc_type, name, addend = reloc
+    if normalize:
+        name = _symbol_key(function, name)
+    if addend:
+        name += f"{'+' if addend > 0 else '-'}0x{abs(addend):X}"
+    target = name
+    args = list(ins.args)
+    if reloc_type in (R_PPC_REL24, R_PPC_REL14):
+        if args:
+            args[-1] = target
+        return tuple(args)
+    suffix = RELOCATION_SUFFIXES.get(reloc_type)
+    if suffix is None or ins.imm < 0:
+        return ins.args
+    if reloc_type == R_PPC_EMB_SDA21 or ins.base is None:
+        args[ins.imm] = target + suffix
+    else:
+        args[ins.imm] = f"{target}{suffix}({ins.base})"
+    return tuple(args)
+
+
+def _align(left: Function, right: Function) -> List[Row]:
+    matcher = difflib.SequenceMatcher(
+        None,
+        [ins.mnemonic for ins in left.instructions],
+        [ins.mnemonic for ins in right.instructions],
+        autojunk=False,
+    )
+    rows: List[Row] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            rows.extend(Row("match", i1 + k, j1 + k) for k in range(i2 - i1))
+            continue
+        # Replaced runs are paired row by row, the longer side's rest
+        # becoming insertions or deletions
+        paired = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+        rows.extend(Row("op", i1 + k, j1 + k) for k in range(paired))
+        rows.extend(Row("delete", i, None) for i in range(i1 + paired, i2))
+        rows.extend(Row("insert", None, j) for j in range(j1 + paired, j2))
+    return rows
+
+
+def _compare_args(
+    left: Function,
+    right: Function,
+    row: Row,
+    rows_by_index: Tuple[Dict[int, int], Dict[int, int]],
+) -> bool:
+    i, j = row.left, row.right
+    left_ins, right_ins = left.instructions[i], right.instructions[j]
+    left_args = symbolic_args(left, i, True)
+    right_args = symbolic_args(right, j, True)
+    # Relative branches within the function compare by target row
+    if (
+        left_ins.branch is not None
+        and right_ins.branch is not None
+        and i not in left.relocations
+        and j not in right.relocations
+    ):
+        left_target = rows_by_index[0].get(i + (left_ins.branch >> 2))
+        right_target = rows_by_index[1].get(j + (right_ins.branch >> 2))
+        return left_args[:-1] == right_args[:-1] and left_target == right_target
+    return left_args == right_args
+
+
+def diff_function(name: str, left: Optional[Function], right: Optional[Function]) -> FunctionDiff:
+    if left is None or right is None:
+        present = left or right
+        kind = "delete" if right is None else "insert"
+        rows = [
+            Row(kind, i if right is None else None, i if left is None else None)
+            for i in range(len(present.instructions) if present else 0)
+        ]
+        return FunctionDiff(name, rows, 0.0, left, right)
+
+    rows = _align(left, right)
+    rows_by_index: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+    for n, row in enumerate(rows):
+        if row.left is not None:
+            rows_by_index[0][row.left] = n
+        if row.right is not None:
+            rows_by_index[1][row.right] = n
+    for n, row in enumerate(rows):
+        if row.kind == "match" and not _compare_args(left, right, row, rows_by_index):
+            rows[n] = row._replace(kind="arg")
+
+    total = len(rows)
+    different = sum(1 for row in rows if row.kind != "match")
+    percent = 100.0 if total == 0 else (total - different) / total * 100.0
+    return FunctionDiff(name, rows, percent, left, right)
+
+
+# Diffs the functions of two objects. Functions only in the base object
+# (the source-built one) are ignored, as objdiff does for progress.
+def diff_objects(
+    target_path: str, base_path: str, names: Optional[List[str]] = None
+) -> List[FunctionDiff]:
+    left = read_functions(target_path)
+    right = read_functions(base_path) if os.path.isfile(base_path) else {}
+    return [diff_function(name, left.get(name), right.get(name)) for name in (names or list(left))]
+
+
+def format_rows(diff: FunctionDiff, width: int = 48) -> str:
+    markers = {"match": " ", "arg": "|", "op": "|", "insert": ">", "delete": "<"}
+    lines = []
+    for row in diff.rows:
+        left = right = ""
+        if row.left is not None and diff.left is not None:
+            ins = diff.left.instructions[row.left]
+            left = format_ins(Ins(ins.mnemonic, symbolic_args(diff.left, row.left)))
+        if row.right is not None and diff.right is not None:
+            ins = diff.right.instructions[row.right]
+            right = format_ins(Ins(ins.mnemonic, symbolic_args(diff.right, row.right)))
+        lines.append(f"{left[:width]:<{width}} {markers[row.kind]} {right}".rstrip())
+    return "\n".join(lines)
+
+
+# Formats a function as assembly for decomp.me or an asm_dir override, with
+# relocated operands as symbols and local branches to .L_ labels
+def format_asm(function: Function) -> str:
+    labels = set()
+    for i, ins in enumerate(function.instructions):
+        if ins.branch is not None and i not in function.relocations:
+            target = i + (ins.branch >> 2)
+            if 0 <= target < len(function.instructions):
+                labels.add(target)
+    lines = [f".fn {function.name}"]
+    for i, ins in enumerate(function.instructions):
+        if i in labels:
+            lines.append(f".L_{i * 4:08X}:")
+        args = symbolic_args(function, i)
+        target = i + (ins.branch >> 2) if ins.branch is not None else -1
+        if i not in function.relocations and target in labels:
+            args = args[:-1] + (f".L_{target * 4:08X}",)
+        lines.append(f"/* {i * 4:08X} */\t{format_ins(Ins(ins.mnemonic, args))}")
+    lines.append(f".endfn {function.name}")
+    return "\n".join(lines) + "\n"
+
+
+def unit_paths(unit_name: str, objdiff_path: str = "objdiff.json") -> Tuple[str, str]:
+    if not os.path.isfile(objdiff_path):
+        sys.exit(f"{objdiff_path} not found, run configure.py first")
+    with open(objdiff_path, "r", encoding="utf-8") as f:
+        objdiff_config = json.load(f)
+    for unit in objdiff_config.get("units", []):
+        if unit["name"] == unit_name:
+            if not unit.get("target_path") or not unit.get("base_path"):
+                sys.exit(f"{unit_name} has no target or base object")
+            return unit["target_path"], unit["base_path"]
+    sys.exit(f"{unit_name} not found in {objdiff_path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Diff the functions of a target and a base object"""
+    )
+    parser.add_argument(
+        "objects",
+        nargs="*",
+        help="""Target and base object, then function names (all functions if none)""",
+    )
+    parser.add_argument(
+        "-u",
+        "--unit",
+        help="""Read the target and base objects of an objdiff.json unit""",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="""Print the aligned instructions of non-matching functions""",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="""Print the scores as JSON""",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="""Exit with an error if any function doesn't match""",
+    )
+    args = parser.parse_args()
+
+    if args.unit:
+        target_path, base_path = unit_paths(args.unit)
+        names = args.objects
+    elif len(args.objects) >= 2:
+        target_path, base_path = args.objects[:2]
+        names = args.objects[2:]
+    else:
+        parser.error("either a unit or a target and base object are required")
+    if not os.path.isfile(target_path):
+        sys.exit(f"{target_path} not found")
+
+    diffs = diff_objects(target_path, base_path, names)
+    for diff in diffs:
+        if diff.left is None and diff.right is None:
+            sys.exit(f"{diff.name} not found in {target_path} or {base_path}")
+    if args.json:
+        scores: List[Dict[str, Any]] = [
+            {"name": diff.name, "fuzzy_match_percent": diff.percent} for diff in diffs
+        ]
+        print(json.dumps(scores, indent=2))
+    else:
+        for diff in diffs:
+            print(f"{diff.percent:6.2f}% {diff.name}")
+            if args.verbose and diff.percent < 100.0:
+                print(format_rows(diff))
+                print()
+    if args.check and any(diff.percent < 100.0 for diff in diffs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
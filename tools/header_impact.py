@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+###
+# Shows what rebuilds when a header (or any source file) changes.
+#
+# Builds a reverse index from .ninja_deps and build.ninja, cached in the
+# build directory, so queries after the first are instant.
+#
+# Usage:
+#   python3 tools/header_impact.py include/dolphin/os.h
+#   python3 tools/header_impact.py include/game --list
+#   python3 tools/header_impact.py --top 20
+###
+
+import argparse
+import os
+import sys
+from typing import Dict
+
+try:
+    from .depgraph import ReverseIndex, read_ninja_log
+except ImportError:
+    from depgraph import ReverseIndex, read_ninja_log
+
+
+def format_seconds(ms: int) -> str:
+    return f"{ms / 1000:.1f}s"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Show the objects, link steps and RELs affected by changing a file"""
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="""Headers, sources or directories to query""",
+    )
+    parser.add_argument(
+        "--build-dir",
+        default="build",
+        help="""Base build directory (for the index cache)""",
+    )
+    parser.add_argument(
+        "-l",
+        "--list",
+        action="store_true",
+        help="""List every affected object""",
+    )
+    parser.add_argument(
+        "--top",
+        metavar="N",
+        type=int,
+        help="""Rank the N headers with the highest fan-out""",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists("build.ninja"):
+        sys.exit("build.ninja not found, run configure.py first")
+    if not os.path.exists(".ninja_deps"):
+        print("Warning: .ninja_deps not found, only direct sources are indexed")
+    if not args.paths and args.top is None:
+        parser.error("no paths given")
+
+    index = ReverseIndex.load(
+        "build.ninja",
+        ".ninja_deps",
+        os.path.join(args.build_dir, "depindex.json"),
+    )
+    durations: Dict[str, int] = {}
+    if os.path.exists(".ninja_log"):
+        durations = read_ninja_log(".ninja_log")
+    total_objects = len(index.objects)
+
+    if args.paths:
+        objects = index.affected_objects(args.paths)
+        outputs = index.affected_outputs(objects)
+        cost = sum(durations.get(o, 0) for o in objects)
+        print(
+            f"{len(objects)} / {total_objects} objects rebuild"
+            + (f" (~{format_seconds(cost)} of compile time)" if cost else "")
+        )
+        if args.list:
+            for obj in objects:
+                print(f"  {obj}")
+        if outputs:
+            print(f"{len(outputs)} link outputs:")
+            for output in outputs:
+                print(f"  {output}")
+
+    if args.top is not None:
+        # Sources only affect their own object, rank headers
+        ranked = [
+            (dep, count)
+            for dep, count in index.fan_out()
+            if os.path.splitext(dep)[1].lower() not in (".c", ".cpp", ".cp", ".s")
+        ][: args.top]
+        if args.paths:
+            print()
+        print(f"Top {len(ranked)} headers by fan-out:")
+        width = max((len(dep) for dep, _ in ranked), default=0)
+        for dep, count in ranked:
+            objects = index.affected_objects([dep])
+            cost = sum(durations.get(o, 0) for o in objects)
+            line = f"  {dep:<{width}}  {count:5} objects ({count / max(total_objects, 1):6.1%})"
+            if cost:
+                line += f"  ~{format_seconds(cost)}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+
+###
+# Progress history database.
+#
+# `configure.py progress --record` appends the per-unit and per-function
+# measures of report.json to a SQLite database, keyed by git commit and
+# game version. Reports are ordered by commit time, so time series and
+# regressions can be queried without regenerating old reports.
+#
+# Usage:
+#   python3 tools/history.py reports
+#   python3 tools/history.py unit main/dolphin/gx/GXInit
+#   python3 tools/history.py function GXInit
+#   python3 tools/history.py trend main/dolphin/gx
+###
+
+import argparse
+import json
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_DB = Path("build") / "progress.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    git_commit TEXT NOT NULL,
+    version TEXT NOT NULL,
+    commit_time INTEGER NOT NULL,
+    recorded_at INTEGER NOT NULL,
+    UNIQUE (git_commit, version)
+);
+CREATE TABLE IF NOT EXISTS units (
+    report_id INTEGER NOT NULL REFERENCES reports (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    fuzzy_match_percent REAL NOT NULL,
+    total_code INTEGER NOT NULL,
+    matched_code INTEGER NOT NULL,
+    total_data INTEGER NOT NULL,
+    matched_data INTEGER NOT NULL,
+    total_functions INTEGER NOT NULL,
+    matched_functions INTEGER NOT NULL,
+    complete INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS units_name ON units (name, report_id);
+CREATE INDEX IF NOT EXISTS units_report ON units (report_id);
+CREATE TABLE IF NOT EXISTS functions (
+    report_id INTEGER NOT NULL REFERENCES reports (id) ON DELETE CASCADE,
+    unit TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fuzzy_match_percent REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS functions_name ON functions (name, report_id);
+CREATE INDEX IF NOT EXISTS functions_report ON functions (report_id);
+"""
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def git_head() -> Tuple[str, int]:
+    try:
+        out = subprocess.run(
+            ["git", "show", "-s", "--format=%H %ct", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+        return out[0], int(out[1])
+    except (OSError, subprocess.CalledProcessError, IndexError, ValueError):
+        sys.exit("Failed to determine the current git commit")
+
+
+def _int(measures: Dict[str, Any], key: str) -> int:
+    # objdiff omits zero values, and writes u64 values as strings
+    return int(measures.get(key, 0))
+
+
+# Records a report, replacing any earlier record for the same commit and version
+def record_report(
+    conn: sqlite3.Connection,
+    report: Dict[str, Any],
+    version: str,
+    commit: str,
+    commit_time: int,
+) -> int:
+    with conn:
+        conn.execute(
+            "DELETE FROM reports WHERE git_commit = ? AND version = ?",
+            (commit, version),
+        )
+        report_id = conn.execute(
+            "INSERT INTO reports (git_commit, version, commit_time, recorded_at) VALUES (?, ?, ?, ?)",
+            (commit, version, commit_time, int(time.time())),
+        ).lastrowid
+        assert report_id is not None
+        unit_rows: List[Tuple[Any, ...]] = []
+        function_rows: List[Tuple[Any, ...]] = []
+        for unit in report.get("units", []):
+            measures = unit.get("measures", {})
+            unit_rows.append(
+                (
+                    report_id,
+                    unit["name"],
+                    float(measures.get("fuzzy_match_percent", 0.0)),
+                    _int(measures, "total_code"),
+                    _int(measures, "matched_code"),
+                    _int(measures, "total_data"),
+                    _int(measures, "matched_data"),
+                    _int(measures, "total_functions"),
+                    _int(measures, "matched_functions"),
+                    _int(measures, "complete_units"),
+                )
+            )
+            for function in unit.get("functions", []):
+                function_rows.append(
+                    (
+                        report_id,
+                        unit["name"],
+                        function["name"],
+                        int(function.get("size", 0)),
+                        float(function.get("fuzzy_match_percent", 0.0)),
+                    )
+                )
+        conn.executemany(
+            "INSERT INTO units VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", unit_rows
+        )
+        conn.executemany("INSERT INTO functions VALUES (?, ?, ?, ?, ?)", function_rows)
+    return report_id
+
+
+# Records report.json for the current git commit
+def record_progress(report_path: Path, db_path: Path, version: str) -> None:
+    if not report_path.is_file():
+        sys.exit(f"Report file {report_path} does not exist")
+    with open(report_path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    commit, commit_time = git_head()
+    conn = connect(db_path)
+    try:
+        record_report(conn, report, version, commit, commit_time)
+    finally:
+        conn.close()
+    print(f"Recorded {version} progress for {commit[:10]} in {db_path}")
+
+
+def print_rows(headers: List[str], rows: Iterable[Tuple[Any, ...]]) -> None:
+    lines = [[str(v) for v in row] for row in rows]
+    if not lines:
+        print("No results")
+        return
+    widths = [max(len(h), *(len(line[i]) for line in lines)) for i, h in enumerate(headers)]
+    for line in [headers, *lines]:
+        print("  ".join(v.ljust(w) for v, w in zip(line, widths)).rstrip())
+
+
+def percent(numerator: int, denominator: int) -> str:
+    return f"{numerator / denominator * 100.0 if denominator else 100.0:.2f}%"
+
+
+def query_reports(conn: sqlite3.Connection, version: str) -> None:
+    rows = conn.execute(
+        """
+        SELECT r.git_commit, datetime(r.commit_time, 'unixepoch'),
+               SUM(u.matched_code), SUM(u.total_code)
+        FROM reports r JOIN units u ON u.report_id = r.id
+        WHERE r.version = ?
+        GROUP BY r.id
+        ORDER BY r.commit_time, r.recorded_at
+        """,
+        (version,),
+    )
+    print_rows(
+        ["commit", "date", "code"],
+        ((c[:10], d, percent(m, t)) for c, d, m, t in rows),
+    )
+
+
+def query_unit(conn: sqlite3.Connection, version: str, name: str) -> None:
+    rows = conn.execute(
+        """
+        SELECT r.git_commit, datetime(r.commit_time, 'unixepoch'), u.fuzzy_match_percent,
+               u.matched_code, u.total_code, u.matched_functions, u.total_functions
+        FROM units u JOIN reports r ON r.id = u.report_id
+        WHERE u.name = ? AND r.version = ?
+        ORDER BY r.commit_time, r.recorded_at
+        """,
+        (name, version),
+    )
+    print_rows(
+        ["commit", "date", "fuzzy", "code", "functions"],
+        (
+            (c[:10], d, f"{fuzzy:.2f}%", percent(m, t), f"{mf} / {tf}")
+            for c, d, fuzzy, m, t, mf, tf in rows
+        ),
+    )
+
+
+def query_function(
+    conn: sqlite3.Connection, version: str, name: str, unit: Optional[str]
+) -> None:
+    rows = conn.execute(
+        """
+        SELECT r.git_commit, datetime(r.commit_time, 'unixepoch'), f.unit, f.size,
+               f.fuzzy_match_percent,
+               LAG(f.fuzzy_match_percent) OVER (
+                   PARTITION BY f.unit ORDER BY r.commit_time, r.recorded_at
+               )
+        FROM functions f JOIN reports r ON r.id = f.report_id
+        WHERE f.name = ? AND r.version = ? AND (? IS NULL OR f.unit = ?)
+        ORDER BY r.commit_time, r.recorded_at
+        """,
+        (name, version, unit, unit),
+    ).fetchall()
+    print_rows(
+        ["commit", "date", "unit", "size", "fuzzy"],
+        ((c[:10], d, u, size, f"{fuzzy:.2f}%") for c, d, u, size, fuzzy, _ in rows),
+    )
+    regressions = [row for row in rows if row[5] is not None and row[4] < row[5]]
+    if regressions:
+        c, d, u, _, fuzzy, before = regressions[-1]
+        print(f"Last regressed in {c[:10]} ({d}): {before:.2f}% -> {fuzzy:.2f}% in {u}")
+    elif rows:
+        print("Never regressed")
+
+
+# Aggregates units whose name is, or is below, the given path
+def query_trend(conn: sqlite3.Connection, version: str, prefix: str) -> None:
+    prefix = prefix.rstrip("/")
+    like = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "/%"
+    rows = conn.execute(
+        """
+        SELECT r.git_commit, datetime(r.commit_time, 'unixepoch'),
+               SUM(u.matched_code), SUM(u.total_code),
+               SUM(u.matched_data), SUM(u.total_data),
+               SUM(u.matched_functions), SUM(u.total_functions)
+        FROM units u JOIN reports r ON r.id = u.report_id
+        WHERE r.version = ? AND (u.name = ? OR u.name LIKE ? ESCAPE '\\')
+        GROUP BY r.id
+        ORDER BY r.commit_time, r.recorded_at
+        """,
+        (version, prefix, like),
+    )
+    print_rows(
+        ["commit", "date", "code", "data", "functions"],
+        (
+            (c[:10], d, percent(mc, tc), percent(md, td), f"{mf} / {tf}")
+            for c, d, mc, tc, md, td, mf, tf in rows
+        ),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Query the progress history recorded by `configure.py progress --record`"""
+    )
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=DEFAULT_DB,
+        help="""History database (default: build/progress.db)""",
+    )
+    parser.add_argument(
+        "-v",
+        "--version",
+        default="GXXE01",
+        help="""Game version to query""",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("reports", help="""List recorded reports""")
+    unit_parser = subparsers.add_parser("unit", help="""Show a unit's history""")
+    unit_parser.add_argument("name", help="""Unit name, e.g. main/dolphin/gx/GXInit""")
+    function_parser = subparsers.add_parser(
+        "function", help="""Show a function's history and its last regression"""
+    )
+    function_parser.add_argument("name", help="""Function name""")
+    function_parser.add_argument("--unit", help="""Only match the function in this unit""")
+    trend_parser = subparsers.add_parser(
+        "trend", help="""Show progress over time for all units below a path"""
+    )
+    trend_parser.add_argument("prefix", help="""Unit path prefix, e.g. main/dolphin/gx""")
+    args = parser.parse_args()
+
+    if not args.db.is_file():
+        sys.exit(f"{args.db} not found, record progress with `configure.py progress --record`")
+    conn = connect(args.db)
+    version = args.version.upper()
+    if args.command == "reports":
+        query_reports(conn, version)
+    elif args.command == "unit":
+        query_unit(conn, version, args.name)
+    elif args.command == "function":
+        query_function(conn, version, args.name, args.unit)
+    elif args.command == "trend":
+        query_trend(conn, version, args.prefix)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
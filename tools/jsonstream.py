@@ -0,0 +1,140 @@
+###
+# Incremental reader for selected keys of a large top-level JSON object.
+#
+# The file is read in chunks. Values of the requested keys are decoded,
+# all other values are skipped by scanning for brackets and strings without
+# being materialized, and reading stops once every requested key is found.
+###
+
+import json
+import re
+from typing import IO, Any, Dict, Iterable
+
+CHUNK_SIZE = 64 * 1024
+
+_whitespace = re.compile(r"[ \t\n\r]*")
+# Characters that affect nesting while skipping a value
+_structure = re.compile(r'[\[\]{}"]')
+# Remainder of a string after its opening quote
+_string_tail = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+# Scalars (numbers, true, false, null) end at a delimiter
+_scalar = re.compile(r"[^,}\]\s]*")
+
+
+class JSONStreamReader:
+    def __init__(self, f: IO[str], chunk_size: int = CHUNK_SIZE) -> None:
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    # Reads another chunk, discarding consumed input. Returns False at EOF.
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ValueError("unexpected end of JSON input")
+
+    def expect(self, c: str) -> None:
+        found = self.peek()
+        if found != c:
+            raise ValueError(f"expected '{c}', found '{found}'")
+        self.pos += 1
+
+    # Buffers a whole scalar, which may otherwise decode as a prefix of itself
+    def buffer_scalar(self) -> int:
+        while True:
+            end = _scalar.match(self.buffer, self.pos).end()
+            if end < len(self.buffer) or not self.fill():
+                return end
+
+    def read_value(self) -> Any:
+        if self.peek() not in '"[{':
+            self.buffer_scalar()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            self.pos = end
+            return value
+
+    def skip_string(self) -> None:
+        # Positioned after the opening quote
+        while True:
+            match = _string_tail.match(self.buffer, self.pos)
+            if match is not None:
+                self.pos = match.end()
+                return
+            if not self.fill():
+                raise ValueError("unterminated JSON string")
+
+    def skip_value(self) -> None:
+        c = self.peek()
+        if c == '"':
+            self.pos += 1
+            self.skip_string()
+            return
+        if c not in "[{":
+            self.pos = self.buffer_scalar()
+            return
+        depth = 0
+        while True:
+            match = _structure.search(self.buffer, self.pos)
+            if match is None:
+                # Nothing left of interest in the buffer
+                self.pos = len(self.buffer)
+                if not self.fill():
+                    raise ValueError("unexpected end of JSON input")
+                continue
+            self.pos = match.end()
+            c = match.group()
+            if c == '"':
+                self.skip_string()
+            elif c in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+
+# Reads the values of the given keys from a top-level JSON object,
+# stopping as soon as all of them have been read. Missing keys are omitted.
+def read_object_keys(f: IO[str], keys: Iterable[str]) -> Dict[str, Any]:
+    wanted = set(keys)
+    out: Dict[str, Any] = {}
+    reader = JSONStreamReader(f)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return out
+    while True:
+        key = reader.read_value()
+        reader.expect(":")
+        if key in wanted:
+            out[key] = reader.read_value()
+            wanted.discard(key)
+            if not wanted:
+                return out
+        else:
+            reader.skip_value()
+        if reader.peek() == "}":
+            return out
+        reader.expect(",")
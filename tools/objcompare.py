@@ -0,0 +1,151 @@
+###
+# Section-level comparison of a built object against its split target.
+#
+# Two objects are identical when they have the same allocated sections
+# with the same contents, outside of the fields that relocations fill in,
+# the same relocations (by offset, type, target symbol and addend), and
+# the same defined symbols. objdiff reports such a unit the same way
+# whichever of the identical objects it's given, so report generation can
+# reuse the unit's previous report when only its built object changed.
+###
+
+from typing import Dict, List, Tuple
+
+try:
+    from .binfile import (
+        R_PPC_ADDR14,
+        R_PPC_ADDR16,
+        R_PPC_ADDR16_HA,
+        R_PPC_ADDR16_HI,
+        R_PPC_ADDR16_LO,
+        R_PPC_ADDR24,
+        R_PPC_ADDR32,
+        R_PPC_EMB_SDA21,
+        R_PPC_REL14,
+        R_PPC_REL24,
+        R_PPC_REL32,
+        SHT_NOBITS,
+        STT_SECTION,
+        Elf,
+        ElfSection,
+        ElfSymbol,
+    )
+except ImportError:
+    from binfile import (
+        R_PPC_ADDR14,
+        R_PPC_ADDR16,
+        R_PPC_ADDR16_HA,
+        R_PPC_ADDR16_HI,
+        R_PPC_ADDR16_LO,
+        R_PPC_ADDR24,
+        R_PPC_ADDR32,
+        R_PPC_EMB_SDA21,
+        R_PPC_REL14,
+        R_PPC_REL24,
+        R_PPC_REL32,
+        SHT_NOBITS,
+        STT_SECTION,
+        Elf,
+        ElfSection,
+        ElfSymbol,
+    )
+
+SHF_ALLOC = 0x2
+STT_FILE = 4
+
+# Relocation type -> mask of the field in the word at the relocation's offset
+RELOCATION_MASKS = {
+    R_PPC_ADDR32: 0xFFFFFFFF,
+    R_PPC_REL32: 0xFFFFFFFF,
+    R_PPC_ADDR24: 0x03FFFFFC,
+    R_PPC_REL24: 0x03FFFFFC,
+    R_PPC_ADDR14: 0x0000FFFC,
+    R_PPC_REL14: 0x0000FFFC,
+    R_PPC_EMB_SDA21: 0x001FFFFF,
+}
+# 16-bit fields are relative to the halfword the relocation points at
+HALF_RELOCATIONS = (R_PPC_ADDR16, R_PPC_ADDR16_LO, R_PPC_ADDR16_HI, R_PPC_ADDR16_HA)
+
+
+def _allocated_sections(elf: Elf) -> Dict[str, ElfSection]:
+    return {
+        section.name: section
+        for section in elf.sections
+        if section.flags & SHF_ALLOC and section.size > 0
+    }
+
+
+# Returns the section contents with relocated fields zeroed, and the
+# relocations as (offset, type, target, addend), where target is the
+# symbol's name, or its section's name for section symbols
+def _section_signature(
+    elf: Elf, section: ElfSection, symbols: List[ElfSymbol]
+) -> Tuple[bytes, List[Tuple[int, int, str, int]]]:
+    relocations = []
+    if section.type == SHT_NOBITS:
+        data = bytearray()
+    else:
+        data = bytearray(elf.data_of(section))
+    for reloc in elf.relocations(section):
+        symbol = symbols[reloc.symbol] if reloc.symbol < len(symbols) else None
+        if symbol is None:
+            target = ""
+        elif symbol.type == STT_SECTION:
+            target = elf.sections[symbol.shndx].name if symbol.shndx < len(elf.sections) else ""
+        else:
+            target = symbol.name
+        relocations.append((reloc.offset, reloc.type, target, reloc.addend))
+        if not data:
+            continue
+        if reloc.type in HALF_RELOCATIONS:
+            data[reloc.offset : reloc.offset + 2] = b"\0\0"
+            continue
+        mask = RELOCATION_MASKS.get(reloc.type)
+        if mask is None or reloc.offset + 4 > len(data):
+            continue
+        word = int.from_bytes(data[reloc.offset : reloc.offset + 4], "big") & ~mask
+        data[reloc.offset : reloc.offset + 4] = word.to_bytes(4, "big")
+    relocations.sort()
+    return bytes(data), relocations
+
+
+# Defined symbols as (name, section name, value, size, type)
+def _defined_symbols(elf: Elf, symbols: List[ElfSymbol]) -> List[Tuple[str, str, int, int, int]]:
+    out = []
+    for symbol in symbols:
+        if symbol.index == 0 or symbol.type in (STT_SECTION, STT_FILE):
+            continue
+        if symbol.shndx == 0 or symbol.shndx >= len(elf.sections):
+            continue
+        section = elf.sections[symbol.shndx].name
+        out.append((symbol.name, section, symbol.value, symbol.size, symbol.type))
+    out.sort()
+    return out
+
+
+def objects_identical(target_path: str, base_path: str) -> bool:
+    try:
+        with Elf(target_path) as target, Elf(base_path) as base:
+            target_sections = _allocated_sections(target)
+            base_sections = _allocated_sections(base)
+            if target_sections.keys() != base_sections.keys():
+                return False
+            for name, section in target_sections.items():
+                other = base_sections[name]
+                if section.size != other.size or (section.type == SHT_NOBITS) != (
+                    other.type == SHT_NOBITS
+                ):
+                    return False
+            target_symbols = list(target.symbols())
+            base_symbols = list(base.symbols())
+            if _defined_symbols(target, target_symbols) != _defined_symbols(base, base_symbols):
+                return False
+            for name, section in target_sections.items():
+                if _section_signature(target, section, target_symbols) != _section_signature(
+                    base, base_sections[name], base_symbols
+                ):
+                    return False
+            return True
+    except (OSError, ValueError, IndexError):
+        return False
+
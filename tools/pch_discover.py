@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+###
+# Proposes precompiled headers from the build's include graph.
+#
+# Units are grouped by mw_version and cflags. Within a group, the leading
+# #include directives of each source are arranged in a trie, and the prefix
+# shared by the most units (weighted by the size of the headers it pulls in,
+# as recorded in .ninja_deps) is proposed as a PCH. Compile times from
+# .ninja_log are used to estimate the time saved: the per-byte cost of the
+# headers each unit no longer parses, less the cost of building the PCH.
+#
+# Usage:
+#   python3 tools/pch_discover.py
+#   python3 tools/pch_discover.py --write include/pch
+###
+
+import argparse
+import os
+import re
+import shlex
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from .depgraph import normalize_path, read_build_edges, read_ninja_deps, read_ninja_log
+except ImportError:
+    from depgraph import normalize_path, read_build_edges, read_ninja_deps, read_ninja_log
+
+include_pattern = re.compile(r'^#\s*include\s*([<"].+?[>"])')
+comment_pattern = re.compile(r"/\*.*?\*/|//[^\n]*", re.DOTALL)
+
+
+# Compile time (ms) = base + rate * parsed bytes
+class CompileFit(NamedTuple):
+    base: float  # Fixed per-unit cost (ms)
+    rate: float  # Cost per parsed byte (ms)
+
+
+class Unit(NamedTuple):
+    obj_path: str
+    src_path: str
+    mw_version: str
+    cflags: str
+    includes: Tuple[str, ...]  # Leading #include directives
+    deps: Tuple[str, ...]  # Headers from the deps log, in inclusion order
+
+
+class Proposal(NamedTuple):
+    name: str
+    mw_version: str
+    cflags: str
+    includes: Tuple[str, ...]
+    headers: Tuple[str, ...]
+    header_bytes: int
+    units: List[Unit]
+
+
+# Returns the #include directives at the start of a source file,
+# stopping at the first line of anything else
+def leading_includes(src_path: str) -> Tuple[str, ...]:
+    try:
+        with open(src_path, "r", encoding="utf-8", errors="replace") as f:
+            text = comment_pattern.sub("", f.read())
+    except OSError:
+        return ()
+    includes: List[str] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = include_pattern.match(line)
+        if match is None:
+            break
+        includes.append(match[1])
+    return tuple(includes)
+
+
+def load_units(build_ninja: str, deps_log: str) -> List[Unit]:
+    deps = read_ninja_deps(deps_log) if os.path.exists(deps_log) else {}
+    units: List[Unit] = []
+    for edge in read_build_edges(build_ninja):
+        if not edge.rule.startswith("mwcc") or edge.rule.startswith("mwcc_pch"):
+            continue
+        obj_path = edge.outputs[0]
+        src_path = edge.inputs[0]
+        obj_deps = [normalize_path(p) for p in deps.get(obj_path, [])]
+        headers = tuple(p for p in obj_deps if p != normalize_path(src_path))
+        units.append(
+            Unit(
+                obj_path=obj_path,
+                src_path=src_path,
+                mw_version=edge.variables.get("mw_version", ""),
+                cflags=edge.variables.get("cflags", ""),
+                includes=leading_includes(src_path),
+                deps=headers,
+            )
+        )
+    return units
+
+
+def common_prefix(sequences: List[Tuple[str, ...]]) -> Tuple[str, ...]:
+    if not sequences:
+        return ()
+    first = min(sequences)
+    last = max(sequences)
+    for i, item in enumerate(first):
+        if i >= len(last) or last[i] != item:
+            return first[:i]
+    return first
+
+
+_size_cache: Dict[str, int] = {}
+
+
+def file_size(path: str) -> int:
+    size = _size_cache.get(path)
+    if size is None:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        _size_cache[path] = size
+    return size
+
+
+def group_name(units: List[Unit]) -> str:
+    common = os.path.commonpath([os.path.dirname(u.src_path) for u in units])
+    parts = [p for p in common.replace("\\", "/").split("/") if p]
+    # Drop the leading source directory
+    if len(parts) > 1:
+        parts = parts[1:]
+    return "_".join(parts) or "common"
+
+
+# Finds the include prefix shared by at least min_units units
+# that saves the most header bytes from being reparsed
+def best_prefix(units: List[Unit], min_units: int) -> Optional[Tuple[Tuple[str, ...], List[Unit], Tuple[str, ...]]]:
+    best: Optional[Tuple[Tuple[str, ...], List[Unit], Tuple[str, ...]]] = None
+    best_saved = 0
+    prefixes: Dict[Tuple[str, ...], List[Unit]] = {}
+    for unit in units:
+        for depth in range(1, len(unit.includes) + 1):
+            prefixes.setdefault(unit.includes[:depth], []).append(unit)
+    for prefix, members in prefixes.items():
+        if len(members) < min_units:
+            continue
+        headers = common_prefix([u.deps for u in members])
+        saved = (len(members) - 1) * sum(file_size(h) for h in headers)
+        if saved > best_saved or (saved == best_saved and best and len(prefix) > len(best[0])):
+            best = (prefix, members, headers)
+            best_saved = saved
+    return best
+
+
+def discover(units: List[Unit], min_units: int, min_bytes: int) -> List[Proposal]:
+    groups: Dict[Tuple[str, str], List[Unit]] = {}
+    for unit in units:
+        groups.setdefault((unit.mw_version, unit.cflags), []).append(unit)
+
+    proposals: List[Proposal] = []
+    names: Dict[str, int] = {}
+    for (mw_version, cflags), members in groups.items():
+        remaining = [u for u in members if u.includes]
+        while len(remaining) >= min_units:
+            result = best_prefix(remaining, min_units)
+            if result is None:
+                break
+            prefix, chosen, headers = result
+            header_bytes = sum(file_size(h) for h in headers)
+            if header_bytes < min_bytes:
+                break
+            name = group_name(chosen)
+            names[name] = names.get(name, 0) + 1
+            if names[name] > 1:
+                name = f"{name}_{names[name]}"
+            proposals.append(
+                Proposal(
+                    name=name,
+                    mw_version=mw_version,
+                    cflags=cflags,
+                    includes=prefix,
+                    headers=headers,
+                    header_bytes=header_bytes,
+                    units=chosen,
+                )
+            )
+            chosen_set = set(u.obj_path for u in chosen)
+            remaining = [u for u in remaining if u.obj_path not in chosen_set]
+
+    proposals.sort(key=lambda p: (len(p.units) - 1) * p.header_bytes, reverse=True)
+    return proposals
+
+
+# Fits compile time (ms) = base + rate * parsed bytes over the units in .ninja_log
+def fit_compile_rate(units: List[Unit], log_path: str) -> Optional[CompileFit]:
+    if not os.path.exists(log_path):
+        return None
+    durations = read_ninja_log(log_path)
+    points: List[Tuple[float, float]] = []
+    for unit in units:
+        duration = durations.get(unit.obj_path)
+        if duration is None:
+            continue
+        parsed = file_size(unit.src_path) + sum(file_size(h) for h in unit.deps)
+        points.append((float(parsed), float(duration)))
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return None
+    rate = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+    rate = max(rate, 0.0)
+    return CompileFit(base=mean_y - rate * mean_x, rate=rate)
+
+
+def split_flags(cflags: str, mirror_prefix: str) -> List[str]:
+    flags: List[str] = []
+    for token in shlex.split(cflags, posix=False):
+        if token.startswith("-") or not flags:
+            flags.append(token)
+        else:
+            flags[-1] += " " + token
+    # Point include directories back at the original sources
+    return [flag.replace(mirror_prefix, "") for flag in flags]
+
+
+# Estimated compile time (ms) a proposal saves. Units using the PCH skip
+# parsing its headers, but keep their fixed cost; building the PCH parses
+# them once and adds a compile of its own.
+def estimated_saving(proposal: Proposal, fit: CompileFit) -> float:
+    parse_time = fit.rate * proposal.header_bytes
+    return parse_time * len(proposal.units) - (max(fit.base, 0.0) + parse_time)
+
+
+def print_proposals(proposals: List[Proposal], fit: Optional[CompileFit]) -> None:
+    if not proposals:
+        print("No shared header prefixes found")
+        return
+    if fit is not None:
+        print(f"Compile time fit: {fit.base:.1f}ms + {fit.rate * 1024:.3f}ms/KiB parsed")
+        proposals = sorted(proposals, key=lambda p: estimated_saving(p, fit), reverse=True)
+    for proposal in proposals:
+        count = len(proposal.units)
+        print(f"{proposal.name}: {count} units, {proposal.mw_version}")
+        for include in proposal.includes:
+            print(f"    #include {include}")
+        reparsed = (count - 1) * proposal.header_bytes
+        print(
+            f"  {len(proposal.headers)} headers, {proposal.header_bytes} bytes per unit, "
+            f"{reparsed} bytes no longer reparsed"
+        )
+        if fit is not None:
+            saving = estimated_saving(proposal, fit)
+            print(f"  Estimated compile time saved: {saving / 1000:.2f}s")
+
+
+def write_proposals(proposals: List[Proposal], out_dir: str, mirror_prefix: str) -> None:
+    include_root = "include"
+    os.makedirs(out_dir, exist_ok=True)
+    entries: List[str] = []
+    for proposal in proposals:
+        pch_path = os.path.join(out_dir, f"{proposal.name}.pch")
+        with open(pch_path, "w", encoding="utf-8") as f:
+            f.write("/* Generated by tools/pch_discover.py */\n")
+            for include in proposal.includes:
+                f.write(f"#include {include}\n")
+        print(f"Wrote {pch_path}")
+        source = os.path.relpath(pch_path, include_root).replace(os.sep, "/")
+        flags = split_flags(proposal.cflags, mirror_prefix)
+        flags = [flag for flag in flags if not flag.startswith("-lang")]
+        entries.append(
+            "    {\n"
+            f'        "source": "{source}",\n'
+            f'        "mw_version": "{proposal.mw_version}",\n'
+            f'        "cflags": {flags!r},\n'
+            "    },\n"
+        )
+
+    print("\n# Add to configure.py, and use `-prefix <name>.mch` in the units' extra_cflags")
+    print("config.precompiled_headers = [")
+    print("".join(entries), end="")
+    print("]")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Propose precompiled headers from shared include prefixes"""
+    )
+    parser.add_argument(
+        "-v",
+        "--version",
+        default="GXXE01",
+        help="""Version the build graph was configured for""",
+    )
+    parser.add_argument(
+        "--build-dir",
+        default="build",
+        help="""Base build directory""",
+    )
+    parser.add_argument(
+        "--min-units",
+        type=int,
+        default=4,
+        help="""Minimum number of units sharing a prefix""",
+    )
+    parser.add_argument(
+        "--min-bytes",
+        type=int,
+        default=4096,
+        help="""Minimum size of the headers covered by a prefix""",
+    )
+    parser.add_argument(
+        "--write",
+        metavar="DIR",
+        help="""Write .pch files to this directory (under include/) and print config entries""",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists("build.ninja"):
+        sys.exit("build.ninja not found, run configure.py first")
+    if not os.path.exists(".ninja_deps"):
+        print("Warning: .ninja_deps not found, build first for header sizes")
+
+    units = load_units("build.ninja", ".ninja_deps")
+    proposals = discover(units, args.min_units, args.min_bytes)
+    fit = fit_compile_rate(units, ".ninja_log")
+    print_proposals(proposals, fit)
+
+    if args.write:
+        mirror_prefix = f"{args.build_dir}/{args.version}/sjis/"
+        write_proposals(proposals, args.write, mirror_prefix)
+
+
+if __name__ == "__main__":
+    main()
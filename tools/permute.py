@@ -0,0 +1,600 @@
+#!/usr/bin/env python3
+
+###
+# Randomized source permuter for a single function.
+#
+# Variants of the function's body are generated by swapping adjacent
+# statements, moving an assigned expression into a temporary, and adding
+# casts to assigned or returned expressions. Each variant is compiled with
+# the unit's own command from build.ninja (`ninja -t commands`, with the
+# ninja configure.py was given), so cflags and the compiler version match
+# the real build, and the function is scored against the split target
+# object with tools/funcdiff.py.
+#
+# Variants are compiled in a process pool. Results are cached by a hash of
+# the variant and the compile command, and new variants are derived from
+# the best ones found so far until the time budget runs out or the
+# function matches. The best variants are written to the output directory.
+#
+# Usage:
+#   python3 tools/permute.py main/game/pxdvs/app/pokemon/pokemon someFunc__Fv
+#   python3 tools/permute.py main/game/pxdvs/app/pokemon/pokemon someFunc__Fv -t 600 -j 8
+###
+
+import argparse
+import concurrent.futures
+import difflib
+import hashlib
+import json
+import os
+import random
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from .funcdiff import Function, diff_function, read_functions
+    from .sjis_mirror import to_shift_jis
+except ImportError:
+    from funcdiff import Function, diff_function, read_functions
+    from sjis_mirror import to_shift_jis
+
+# Casts tried on assigned and returned expressions
+CASTS = ("(s32)", "(u32)", "(s16)", "(u16)", "(s8)", "(u8)", "(f32)", "(int)", "(unsigned int)")
+TEMP_NAME = "_ptmp"
+
+# Statements that can't be moved or rewritten
+fixed_statement_pattern = re.compile(
+    r"^\s*(?:if|else|for|while|do|switch|case|default|return|break|continue|goto)\b"
+)
+declaration_pattern = re.compile(
+    r"^\s*(?:(?:const|static|volatile|register|unsigned|signed|struct|enum)\s+)*"
+    r"[A-Za-z_]\w*(?:\s*\*+\s*|\s+)[A-Za-z_]\w*\s*(?:=|;|\[)"
+)
+assignment_pattern = re.compile(r"^(\s*)([^;]*?[^=!<>+\-*/%&|^\s])\s*=\s*(?!=)([^;]+?)\s*;$", re.DOTALL)
+return_pattern = re.compile(r"^(\s*return\s+)([^;]+?)\s*;$", re.DOTALL)
+
+
+# Comments, strings and character literals
+literal_pattern = re.compile(
+    r"//[^\n]*|/\*.*?(?:\*/|\Z)|\"(?:\\.|[^\"\\\n])*\"?|'(?:\\.|[^'\\\n])*'?", re.DOTALL
+)
+
+
+# Blanks out comments, strings and character literals, keeping offsets
+def mask_source(text: str) -> str:
+    return literal_pattern.sub(lambda m: re.sub(r"[^\n]", " ", m[0]), text)
+
+
+def _matching(masked: str, start: int, open_char: str, close_char: str) -> int:
+    depth = 0
+    for i in range(start, len(masked)):
+        if masked[i] == open_char:
+            depth += 1
+        elif masked[i] == close_char:
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+# Mangled operator names (__as__3FooFRC3Foo -> operator=)
+OPERATOR_NAMES = {
+    "nw": "operator new",
+    "dl": "operator delete",
+    "nwa": "operator new[]",
+    "dla": "operator delete[]",
+    "pl": "operator+",
+    "mi": "operator-",
+    "ml": "operator*",
+    "dv": "operator/",
+    "md": "operator%",
+    "er": "operator^",
+    "ad": "operator&",
+    "or": "operator|",
+    "co": "operator~",
+    "nt": "operator!",
+    "as": "operator=",
+    "lt": "operator<",
+    "gt": "operator>",
+    "apl": "operator+=",
+    "ami": "operator-=",
+    "amu": "operator*=",
+    "adv": "operator/=",
+    "amd": "operator%=",
+    "aer": "operator^=",
+    "aad": "operator&=",
+    "aor": "operator|=",
+    "ls": "operator<<",
+    "rs": "operator>>",
+    "als": "operator<<=",
+    "ars": "operator>>=",
+    "eq": "operator==",
+    "ne": "operator!=",
+    "le": "operator<=",
+    "ge": "operator>=",
+    "aa": "operator&&",
+    "oo": "operator||",
+    "pp": "operator++",
+    "mm": "operator--",
+    "cm": "operator,",
+    "rm": "operator->*",
+    "rf": "operator->",
+    "cl": "operator()",
+    "vc": "operator[]",
+}
+
+
+# Last class name of a mangled qualifier: "3Foo..." or "Q23Bar3Foo..." -> "Foo"
+def _class_name(mangled: str) -> Optional[str]:
+    count, pos = 1, 0
+    if mangled.startswith("Q") and mangled[1:2].isdigit():
+        count, pos = int(mangled[1]), 2
+    name = None
+    for _ in range(count):
+        match = re.match(r"\d+", mangled[pos:])
+        if match is None:
+            return None
+        pos += len(match[0])
+        name = mangled[pos : pos + int(match[0])]
+        pos += int(match[0])
+    # Template arguments aren't part of constructor names
+    return name.split("<")[0] if name else None
+
+
+# Source-level name of a symbol: "foo__3BarFv" -> "foo", "__ct__3BarFv" ->
+# "Bar", "__dt__3BarFv" -> "~Bar", "__as__3BarFRC3Bar" -> "operator="
+def source_name(symbol: str) -> str:
+    end = symbol.find("__", 1)
+    if end < 0:
+        return symbol
+    name = symbol[:end]
+    if not name.startswith("__"):
+        return name
+    special = name[2:]
+    if special in ("ct", "dt"):
+        class_name = _class_name(symbol[end + 2 :])
+        if class_name:
+            return class_name if special == "ct" else "~" + class_name
+    return OPERATOR_NAMES.get(special, name)
+
+
+def _name_pattern(name: str) -> str:
+    if name.startswith("~"):
+        return r"~\s*" + re.escape(name[1:])
+    if name.startswith("operator"):
+        return r"\boperator\s*" + re.escape(name[len("operator") :].strip())
+    return re.escape(name)
+
+
+# Finds a function's definitions, as the offsets of its name and of the end
+# of the declaration part (before the body or a constructor initializer
+# list), and the offsets between the body's braces
+def find_function_definitions(
+    text: str, name: str, masked: Optional[str] = None
+) -> List[Tuple[int, int, int, int]]:
+    if masked is None:
+        masked = mask_source(text)
+    definitions = []
+    for match in re.finditer(rf"(?<![\w.>~]){_name_pattern(name)}\s*\(", masked):
+        close = _matching(masked, match.end() - 1, "(", ")")
+        if close < 0:
+            continue
+        # Constructors may have an initializer list before the body
+        rest = re.match(
+            r"\s*(?:const\s*)?(?P<init>:[^;{}]*)?\{", masked[close + 1 : close + 1024]
+        )
+        if rest is None:
+            continue
+        open_brace = close + rest.end()
+        end = _matching(masked, open_brace, "{", "}")
+        if end > 0:
+            head_end = close + 1 + (rest.start("init") if rest["init"] else rest.end() - 1)
+            definitions.append((match.start(), head_end, open_brace + 1, end))
+    return definitions
+
+
+# Finds the bodies of a function's definitions, as offsets between their braces
+def find_function_bodies(
+    text: str, name: str, masked: Optional[str] = None
+) -> List[Tuple[int, int]]:
+    return [(start, end) for _, _, start, end in find_function_definitions(text, name, masked)]
+
+
+def find_function_body(text: str, name: str) -> Optional[Tuple[int, int]]:
+    bodies = find_function_bodies(text, name)
+    return bodies[0] if bodies else None
+
+
+class Statement(NamedTuple):
+    start: int
+    end: int
+    block: int  # Offset of the enclosing block
+    movable: bool
+
+
+# Splits a function body into statements ending in ";", by enclosing block
+def parse_statements(text: str, body: Tuple[int, int]) -> List[Statement]:
+    masked = mask_source(text)
+    statements: List[Statement] = []
+    blocks = [body[0]]
+    parens = 0
+    start = body[0]
+    for i in range(body[0], body[1]):
+        c = masked[i]
+        if c == "(":
+            parens += 1
+        elif c == ")":
+            parens -= 1
+        elif parens > 0:
+            continue
+        elif c == "{":
+            blocks.append(i + 1)
+            start = i + 1
+        elif c == "}":
+            if len(blocks) > 1:
+                blocks.pop()
+            start = i + 1
+        elif c == ";":
+            statement = masked[start : i + 1]
+            # Skip leading whitespace, so statements begin at their first token
+            lead = len(statement) - len(statement.lstrip())
+            movable = not fixed_statement_pattern.match(statement) and not declaration_pattern.match(
+                statement
+            ) and ":" not in statement.split("?")[0]
+            statements.append(Statement(start + lead, i + 1, blocks[-1], movable))
+            start = i + 1
+    return statements
+
+
+# Applies one random transformation to a function, or returns None
+def mutate(text: str, name: str, rng: random.Random) -> Optional[str]:
+    body = find_function_body(text, name)
+    if body is None:
+        return None
+    statements = parse_statements(text, body)
+    if not statements:
+        return None
+    kind = rng.choice(("reorder", "temp", "cast"))
+
+    if kind == "reorder":
+        pairs = [
+            (a, b)
+            for a, b in zip(statements, statements[1:])
+            if a.movable and b.movable and a.block == b.block and not text[a.end : b.start].strip()
+        ]
+        if not pairs:
+            return None
+        a, b = rng.choice(pairs)
+        between = text[a.end : b.start]
+        return text[: a.start] + text[b.start : b.end] + between + text[a.start : a.end] + text[b.end :]
+
+    candidates = []
+    for statement in statements:
+        source = text[statement.start : statement.end]
+        if statement.movable:
+            match = assignment_pattern.match(source)
+            if match is not None:
+                candidates.append((statement, match, "assign"))
+        match = return_pattern.match(source)
+        if match is not None:
+            candidates.append((statement, match, "return"))
+    if not candidates:
+        return None
+    statement, match, form = rng.choice(candidates)
+
+    if kind == "temp":
+        if form != "assign" or TEMP_NAME in match[3]:
+            return None
+        lhs, rhs = match[2], match[3]
+        replacement = f"{{ __typeof__({rhs}) {TEMP_NAME} = {rhs}; {lhs} = {TEMP_NAME}; }}"
+    else:
+        cast = rng.choice(CASTS)
+        if form == "assign":
+            replacement = f"{match[2]} = {cast}({match[3]});"
+        else:
+            replacement = f"{match[1].lstrip()}{cast}({match[2]});"
+    return text[: statement.start] + replacement + text[statement.end :]
+
+
+class CompileCommand(NamedTuple):
+    steps: List[List[str]]  # argv of each step
+    source: str  # Source path as passed to the compiler
+    output: str  # Object path
+    shift_jis: bool  # Whether the source is read from the Shift JIS mirror
+
+
+# Ninja binary configure.py was given (--ninja), as recorded in objdiff.json
+def default_ninja(objdiff_path: str = "objdiff.json") -> str:
+    try:
+        with open(objdiff_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("custom_make") or "ninja"
+    except (OSError, ValueError):
+        return "ninja"
+
+
+# Reads the command that builds an object from build.ninja
+def compile_command(base_path: str, source_path: str, ninja: str = "ninja") -> CompileCommand:
+    try:
+        result = subprocess.run(
+            [ninja, "-t", "commands", "-s", base_path],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        stderr = getattr(e, "stderr", None) or str(e)
+        sys.exit(f"ninja -t commands {base_path} failed: {stderr.strip()}")
+    command = result.stdout.strip().splitlines()[-1]
+    if command.startswith("cmd /c "):
+        command = command[len("cmd /c ") :]
+
+    source_path = source_path.replace(os.sep, "/")
+    steps: List[List[str]] = []
+    source: Optional[str] = None
+    for part in command.split(" && "):
+        argv = shlex.split(part, posix=os.name != "nt")
+        # Depfiles aren't needed for variants
+        if any("transform_dep" in arg for arg in argv):
+            continue
+        for arg in argv:
+            if arg.replace(os.sep, "/").endswith(source_path):
+                source = arg
+        steps.append(argv)
+    if source is None:
+        sys.exit(f"{source_path} not found in the command for {base_path}")
+    return CompileCommand(steps, source, base_path, source.replace(os.sep, "/") != source_path)
+
+
+# Per-process state of pool workers
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(command: CompileCommand, target: Function, function: str, temp_dir: str) -> None:
+    _worker["command"] = command
+    _worker["target"] = target
+    _worker["function"] = function
+    _worker["dir"] = tempfile.mkdtemp(dir=temp_dir)
+
+
+# Compiles a variant and scores the function. Returns None if it didn't compile.
+def evaluate(text: str) -> Optional[float]:
+    command: CompileCommand = _worker["command"]
+    work_dir: str = _worker["dir"]
+    source_dir = os.path.dirname(command.source)
+    variant_path = os.path.join(work_dir, os.path.basename(command.source))
+    object_path = os.path.join(
+        work_dir, os.path.splitext(os.path.basename(command.source))[0] + ".o"
+    )
+    data = text.encode("utf-8")
+    with open(variant_path, "wb") as f:
+        f.write(to_shift_jis(data, command.source) if command.shift_jis else data)
+    if os.path.exists(object_path):
+        os.remove(object_path)
+
+    for argv in command.steps:
+        args: List[str] = []
+        for i, arg in enumerate(argv):
+            if arg == command.source:
+                args.append(variant_path)
+            elif arg == command.output:
+                args.append(object_path)
+            elif i > 0 and argv[i - 1] == "-o":
+                # mwcc writes <stem>.o into the -o directory
+                args.append(work_dir)
+            elif arg == "-c":
+                # Quoted includes are relative to the original source
+                args.extend(["-i", source_dir or ".", arg])
+            else:
+                args.append(arg)
+        result = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            return None
+    if not os.path.isfile(object_path):
+        return None
+    try:
+        functions = read_functions(object_path)
+    except (OSError, ValueError):
+        return None
+    name = _worker["function"]
+    return diff_function(name, _worker["target"], functions.get(name)).percent
+
+
+def load_unit(unit_name: str, objdiff_path: str = "objdiff.json") -> Dict[str, Any]:
+    if not os.path.isfile(objdiff_path):
+        sys.exit(f"{objdiff_path} not found, run configure.py first")
+    with open(objdiff_path, "r", encoding="utf-8") as f:
+        objdiff_config = json.load(f)
+    for unit in objdiff_config.get("units", []):
+        if unit["name"] == unit_name:
+            return unit
+    sys.exit(f"{unit_name} not found in {objdiff_path}")
+
+
+def variant_hash(text: str, command: CompileCommand) -> str:
+    h = hashlib.sha1()
+    h.update(json.dumps(command.steps).encode("utf-8"))
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Search for source permutations that match a function"""
+    )
+    parser.add_argument(
+        "unit",
+        help="""objdiff.json unit name""",
+    )
+    parser.add_argument(
+        "function",
+        help="""Function symbol name""",
+    )
+    parser.add_argument(
+        "-n",
+        "--name",
+        help="""Name of the function in the source (default: from the symbol name)""",
+    )
+    parser.add_argument(
+        "-t",
+        "--time",
+        type=float,
+        default=300.0,
+        help="""Time budget in seconds (default: 300)""",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="""Parallel compiles (default: CPU count)""",
+    )
+    parser.add_argument(
+        "-b",
+        "--best",
+        type=int,
+        default=5,
+        help="""Number of best variants to keep (default: 5)""",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="""Output directory (default: build/permute/<function>)""",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="""Random seed""",
+    )
+    parser.add_argument(
+        "--ninja",
+        metavar="BINARY",
+        help="""Path to ninja (default: the one configure.py was given)""",
+    )
+    args = parser.parse_args()
+
+    unit = load_unit(args.unit)
+    source_path = unit.get("metadata", {}).get("source_path")
+    target_path, base_path = unit.get("target_path"), unit.get("base_path")
+    if not source_path or not target_path or not base_path:
+        sys.exit(f"{args.unit} has no source, target or base object")
+    if not os.path.isfile(target_path):
+        sys.exit(f"{target_path} not found, run ninja first")
+    target = read_functions(target_path).get(args.function)
+    if target is None:
+        sys.exit(f"{args.function} not found in {target_path}")
+
+    with open(source_path, "r", encoding="utf-8") as f:
+        original = f.read()
+    name = args.name or source_name(args.function)
+    if find_function_body(original, name) is None:
+        sys.exit(f"Definition of {name} not found in {source_path}")
+
+    command = compile_command(base_path, source_path, args.ninja or default_ninja())
+    out_dir = args.output or os.path.join("build", "permute", args.function)
+    os.makedirs(out_dir, exist_ok=True)
+    cache_path = os.path.join(out_dir, "cache.json")
+    cache: Dict[str, Optional[float]] = {}
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    rng = random.Random(args.seed)
+    # (percent, hash, text), best first
+    best: List[Tuple[float, str, str]] = []
+    seen = set()
+    start_time = time.monotonic()
+
+    def record(text: str, key: str, percent: Optional[float]) -> None:
+        cache[key] = percent
+        if percent is None:
+            return
+        if not best or percent > best[0][0]:
+            elapsed = time.monotonic() - start_time
+            print(f"[{elapsed:7.1f}s] {percent:6.2f}% {key[:8]}")
+        best.append((percent, key, text))
+        best.sort(key=lambda b: -b[0])
+        del best[args.best :]
+
+    def new_variant() -> Optional[Tuple[str, str]]:
+        for _ in range(100):
+            # Prefer deriving from the best variants
+            parent = best[min(int(rng.expovariate(1.0)), len(best) - 1)][2] if best else original
+            text = parent
+            for _ in range(rng.randint(1, 2)):
+                text = mutate(text, name, rng) or text
+            key = variant_hash(text, command)
+            if key not in seen:
+                seen.add(key)
+                return text, key
+        return None
+
+    with tempfile.TemporaryDirectory(prefix="permute-") as temp_dir, concurrent.futures.ProcessPoolExecutor(
+        max_workers=max(1, args.jobs),
+        initializer=_init_worker,
+        initargs=(command, target, args.function, temp_dir),
+    ) as pool:
+        pending: Dict[concurrent.futures.Future, Tuple[str, str]] = {}
+        base_key = variant_hash(original, command)
+        seen.add(base_key)
+        # The original's score seeds the search
+        if base_key in cache:
+            record(original, base_key, cache[base_key])
+        else:
+            record(original, base_key, pool.submit(evaluate, original).result())
+        if not best:
+            sys.exit(f"{source_path} doesn't compile")
+
+        exhausted = False
+        while time.monotonic() - start_time < args.time and best[0][0] < 100.0:
+            while not exhausted and len(pending) < args.jobs * 2:
+                variant = new_variant()
+                if variant is None:
+                    exhausted = True
+                    break
+                text, key = variant
+                if key in cache:
+                    record(text, key, cache[key])
+                    continue
+                pending[pool.submit(evaluate, text)] = variant
+            if not pending:
+                break
+            done, _ = concurrent.futures.wait(
+                pending,
+                timeout=max(0.1, args.time - (time.monotonic() - start_time)),
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                text, key = pending.pop(future)
+                record(text, key, future.result())
+        for future in pending:
+            future.cancel()
+
+    with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(cache_path + ".tmp", cache_path)
+
+    extension = os.path.splitext(source_path)[1]
+    for rank, (percent, key, text) in enumerate(best):
+        path = os.path.join(out_dir, f"best{rank}_{percent:.2f}_{key[:8]}{extension}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(f"{len(cache)} variants scored, best {best[0][0]:.2f}%, written to {out_dir}")
+    if best[0][2] != original:
+        diff = difflib.unified_diff(
+            original.splitlines(keepends=True),
+            best[0][2].splitlines(keepends=True),
+            source_path,
+            f"best ({best[0][0]:.2f}%)",
+        )
+        sys.stdout.writelines(diff)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+###
+# Table-driven Gekko (PowerPC 750CL) instruction decoder.
+#
+# Instructions are looked up by primary opcode, then by extended opcode
+# for the 4 (paired-single), 19, 31, 59 and 63 groups. Each table entry
+# names the mnemonic and its operand fields, so adding an instruction is
+# one line. Decoding is memoized by instruction word: a function's code
+# repeats few distinct words, so decoding a whole unit is mostly lookups.
+#
+# Only what diffing needs is decoded: the mnemonic with the usual
+# simplified forms (li, lis, mr, nop, blr, beq, ...), formatted operands,
+# which operand holds a 16-bit immediate or displacement (the field that
+# relocations fill in), and relative branch displacements.
+###
+
+from array import array
+import sys
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+class Ins(NamedTuple):
+    mnemonic: str
+    args: Tuple[str, ...]
+    # Index of the argument holding a 16-bit immediate or displacement
+    imm: int = -1
+    # Base register of a displacement argument, "d(rA)"
+    base: Optional[str] = None
+    # Displacement of a relative branch, whose target is the last argument
+    branch: Optional[int] = None
+
+
+def _signed(value: int, bits: int) -> int:
+    return value - (1 << bits) if value & (1 << (bits - 1)) else value
+
+
+def _hex(value: int) -> str:
+    return f"-0x{-value:X}" if value < 0 else f"0x{value:X}"
+
+
+def _field(word: int, start: int, width: int) -> int:
+    # start is the big-endian bit number of the field's first bit
+    return (word >> (32 - start - width)) & ((1 << width) - 1)
+
+
+# Operand formatters by field name
+def _operand(word: int, name: str) -> str:
+    if name == "rD" or name == "rS":
+        return f"r{_field(word, 6, 5)}"
+    if name == "rA":
+        return f"r{_field(word, 11, 5)}"
+    if name == "rB":
+        return f"r{_field(word, 16, 5)}"
+    if name == "frD" or name == "frS":
+        return f"f{_field(word, 6, 5)}"
+    if name == "frA":
+        return f"f{_field(word, 11, 5)}"
+    if name == "frB":
+        return f"f{_field(word, 16, 5)}"
+    if name == "frC":
+        return f"f{_field(word, 21, 5)}"
+    if name == "crfD":
+        return f"cr{_field(word, 6, 3)}"
+    if name == "crfS":
+        return f"cr{_field(word, 11, 3)}"
+    if name == "crbD":
+        return str(_field(word, 6, 5))
+    if name == "crbA":
+        return str(_field(word, 11, 5))
+    if name == "crbB":
+        return str(_field(word, 16, 5))
+    if name == "SIMM":
+        return _hex(_signed(word & 0xFFFF, 16))
+    if name == "UIMM":
+        return _hex(word & 0xFFFF)
+    if name == "SH" or name == "NB":
+        return str(_field(word, 16, 5))
+    if name == "MB":
+        return str(_field(word, 21, 5))
+    if name == "ME":
+        return str(_field(word, 26, 5))
+    if name == "TO":
+        return str(_field(word, 6, 5))
+    if name == "SR":
+        return str(_field(word, 12, 4))
+    if name == "spr":
+        return str(_field(word, 16, 5) << 5 | _field(word, 11, 5))
+    if name == "CRM":
+        return _hex(_field(word, 12, 8))
+    if name == "FM":
+        return _hex(_field(word, 7, 8))
+    if name == "IMM":
+        return str(_field(word, 16, 4))
+    if name == "W":
+        return str(_field(word, 16, 1))
+    if name == "I":
+        return f"qr{_field(word, 17, 3)}"
+    if name == "Wx":
+        return str(_field(word, 21, 1))
+    if name == "Ix":
+        return f"qr{_field(word, 22, 3)}"
+    if name == "BO":
+        return str(_field(word, 6, 5))
+    if name == "BI":
+        return str(_field(word, 11, 5))
+    raise ValueError(f"unknown operand {name}")
+
+
+# Formats, by the fields they take. "d" is a 16-bit displacement and "qd"
+# a 12-bit paired-single displacement, both formatted with their base
+# register as "d(rA)".
+Format = Tuple[str, ...]
+
+PRIMARY: Dict[int, Tuple[str, Format]] = {
+    3: ("twi", ("TO", "rA", "SIMM")),
+    7: ("mulli", ("rD", "rA", "SIMM")),
+    8: ("subfic", ("rD", "rA", "SIMM")),
+    10: ("cmplwi", ("crfD", "rA", "UIMM")),
+    11: ("cmpwi", ("crfD", "rA", "SIMM")),
+    12: ("addic", ("rD", "rA", "SIMM")),
+    13: ("addic.", ("rD", "rA", "SIMM")),
+    14: ("addi", ("rD", "rA", "SIMM")),
+    15: ("addis", ("rD", "rA", "UIMM")),
+    17: ("sc", ()),
+    20: ("rlwimi", ("rA", "rS", "SH", "MB", "ME")),
+    21: ("rlwinm", ("rA", "rS", "SH", "MB", "ME")),
+    23: ("rlwnm", ("rA", "rS", "rB", "MB", "ME")),
+    24: ("ori", ("rA", "rS", "UIMM")),
+    25: ("oris", ("rA", "rS", "UIMM")),
+    26: ("xori", ("rA", "rS", "UIMM")),
+    27: ("xoris", ("rA", "rS", "UIMM")),
+    28: ("andi.", ("rA", "rS", "UIMM")),
+    29: ("andis.", ("rA", "rS", "UIMM")),
+    32: ("lwz", ("rD", "d")),
+    33: ("lwzu", ("rD", "d")),
+    34: ("lbz", ("rD", "d")),
+    35: ("lbzu", ("rD", "d")),
+    36: ("stw", ("rS", "d")),
+    37: ("stwu", ("rS", "d")),
+    38: ("stb", ("rS", "d")),
+    39: ("stbu", ("rS", "d")),
+    40: ("lhz", ("rD", "d")),
+    41: ("lhzu", ("rD", "d")),
+    42: ("lha", ("rD", "d")),
+    43: ("lhau", ("rD", "d")),
+    44: ("sth", ("rS", "d")),
+    45: ("sthu", ("rS", "d")),
+    46: ("lmw", ("rD", "d")),
+    47: ("stmw", ("rS", "d")),
+    48: ("lfs", ("frD", "d")),
+    49: ("lfsu", ("frD", "d")),
+    50: ("lfd", ("frD", "d")),
+    51: ("lfdu", ("frD", "d")),
+    52: ("stfs", ("frS", "d")),
+    53: ("stfsu", ("frS", "d")),
+    54: ("stfd", ("frS", "d")),
+    55: ("stfdu", ("frS", "d")),
+    56: ("psq_l", ("frD", "qd", "W", "I")),
+    57: ("psq_lu", ("frD", "qd", "W", "I")),
+    60: ("psq_st", ("frS", "qd", "W", "I")),
+    61: ("psq_stu", ("frS", "qd", "W", "I")),
+}
+
+# Opcode 19, by 10-bit extended opcode
+GROUP19: Dict[int, Tuple[str, Format]] = {
+    0: ("mcrf", ("crfD", "crfS")),
+    33: ("crnor", ("crbD", "crbA", "crbB")),
+    50: ("rfi", ()),
+    129: ("crandc", ("crbD", "crbA", "crbB")),
+    150: ("isync", ()),
+    193: ("crxor", ("crbD", "crbA", "crbB")),
+    225: ("crnand", ("crbD", "crbA", "crbB")),
+    257: ("crand", ("crbD", "crbA", "crbB")),
+    289: ("creqv", ("crbD", "crbA", "crbB")),
+    417: ("crorc", ("crbD", "crbA", "crbB")),
+    449: ("cror", ("crbD", "crbA", "crbB")),
+}
+
+# Opcode 31, by 10-bit extended opcode. XO-form arithmetic also has an
+# OE bit above its 9-bit opcode, listed in GROUP31_OE.
+GROUP31: Dict[int, Tuple[str, Format]] = {
+    0: ("cmpw", ("crfD", "rA", "rB")),
+    4: ("tw", ("TO", "rA", "rB")),
+    8: ("subfc", ("rD", "rA", "rB")),
+    10: ("addc", ("rD", "rA", "rB")),
+    11: ("mulhwu", ("rD", "rA", "rB")),
+    19: ("mfcr", ("rD",)),
+    20: ("lwarx", ("rD", "rA", "rB")),
+    23: ("lwzx", ("rD", "rA", "rB")),
+    24: ("slw", ("rA", "rS", "rB")),
+    26: ("cntlzw", ("rA", "rS")),
+    28: ("and", ("rA", "rS", "rB")),
+    32: ("cmplw", ("crfD", "rA", "rB")),
+    40: ("subf", ("rD", "rA", "rB")),
+    54: ("dcbst", ("rA", "rB")),
+    55: ("lwzux", ("rD", "rA", "rB")),
+    60: ("andc", ("rA", "rS", "rB")),
+    75: ("mulhw", ("rD", "rA", "rB")),
+    83: ("mfmsr", ("rD",)),
+    86: ("dcbf", ("rA", "rB")),
+    87: ("lbzx", ("rD", "rA", "rB")),
+    104: ("neg", ("rD", "rA")),
+    119: ("lbzux", ("rD", "rA", "rB")),
+    124: ("nor", ("rA", "rS", "rB")),
+    136: ("subfe", ("rD", "rA", "rB")),
+    138: ("adde", ("rD", "rA", "rB")),
+    144: ("mtcrf", ("CRM", "rS")),
+    146: ("mtmsr", ("rS",)),
+    150: ("stwcx.", ("rS", "rA", "rB")),
+    151: ("stwx", ("rS", "rA", "rB")),
+    183: ("stwux", ("rS", "rA", "rB")),
+    200: ("subfze", ("rD", "rA")),
+    202: ("addze", ("rD", "rA")),
+    210: ("mtsr", ("SR", "rS")),
+    215: ("stbx", ("rS", "rA", "rB")),
+    232: ("subfme", ("rD", "rA")),
+    234: ("addme", ("rD", "rA")),
+    235: ("mullw", ("rD", "rA", "rB")),
+    242: ("mtsrin", ("rS", "rB")),
+    246: ("dcbtst", ("rA", "rB")),
+    247: ("stbux", ("rS", "rA", "rB")),
+    266: ("add", ("rD", "rA", "rB")),
+    278: ("dcbt", ("rA", "rB")),
+    279: ("lhzx", ("rD", "rA", "rB")),
+    284: ("eqv", ("rA", "rS", "rB")),
+    306: ("tlbie", ("rB",)),
+    310: ("eciwx", ("rD", "rA", "rB")),
+    311: ("lhzux", ("rD", "rA", "rB")),
+    316: ("xor", ("rA", "rS", "rB")),
+    339: ("mfspr", ("rD", "spr")),
+    343: ("lhax", ("rD", "rA", "rB")),
+    371: ("mftb", ("rD", "spr")),
+    375: ("lhaux", ("rD", "rA", "rB")),
+    407: ("sthx", ("rS", "rA", "rB")),
+    412: ("orc", ("rA", "rS", "rB")),
+    438: ("ecowx", ("rS", "rA", "rB")),
+    439: ("sthux", ("rS", "rA", "rB")),
+    444: ("or", ("rA", "rS", "rB")),
+    459: ("divwu", ("rD", "rA", "rB")),
+    467: ("mtspr", ("spr", "rS")),
+    470: ("dcbi", ("rA", "rB")),
+    476: ("nand", ("rA", "rS", "rB")),
+    491: ("divw", ("rD", "rA", "rB")),
+    512: ("mcrxr", ("crfD",)),
+    533: ("lswx", ("rD", "rA", "rB")),
+    534: ("lwbrx", ("rD", "rA", "rB")),
+    535: ("lfsx", ("frD", "rA", "rB")),
+    536: ("srw", ("rA", "rS", "rB")),
+    566: ("tlbsync", ()),
+    567: ("lfsux", ("frD", "rA", "rB")),
+    595: ("mfsr", ("rD", "SR")),
+    597: ("lswi", ("rD", "rA", "NB")),
+    598: ("sync", ()),
+    599: ("lfdx", ("frD", "rA", "rB")),
+    631: ("lfdux", ("frD", "rA", "rB")),
+    659: ("mfsrin", ("rD", "rB")),
+    661: ("stswx", ("rS", "rA", "rB")),
+    662: ("stwbrx", ("rS", "rA", "rB")),
+    663: ("stfsx", ("frS", "rA", "rB")),
+    695: ("stfsux", ("frS", "rA", "rB")),
+    725: ("stswi", ("rS", "rA", "NB")),
+    727: ("stfdx", ("frS", "rA", "rB")),
+    759: ("stfdux", ("frS", "rA", "rB")),
+    790: ("lhbrx", ("rD", "rA", "rB")),
+    792: ("sraw", ("rA", "rS", "rB")),
+    824: ("srawi", ("rA", "rS", "SH")),
+    854: ("eieio", ()),
+    918: ("sthbrx", ("rS", "rA", "rB")),
+    922: ("extsh", ("rA", "rS")),
+    954: ("extsb", ("rA", "rS")),
+    982: ("icbi", ("rA", "rB")),
+    983: ("stfiwx", ("frS", "rA", "rB")),
+    1014: ("dcbz", ("rA", "rB")),
+}
+GROUP31_OE = {8, 10, 40, 104, 136, 138, 200, 202, 232, 234, 235, 266, 459, 491}
+
+# Opcodes 59 and 63, A-form by 5-bit extended opcode
+GROUP59: Dict[int, Tuple[str, Format]] = {
+    18: ("fdivs", ("frD", "frA", "frB")),
+    20: ("fsubs", ("frD", "frA", "frB")),
+    21: ("fadds", ("frD", "frA", "frB")),
+    24: ("fres", ("frD", "frB")),
+    25: ("fmuls", ("frD", "frA", "frC")),
+    28: ("fmsubs", ("frD", "frA", "frC", "frB")),
+    29: ("fmadds", ("frD", "frA", "frC", "frB")),
+    30: ("fnmsubs", ("frD", "frA", "frC", "frB")),
+    31: ("fnmadds", ("frD", "frA", "frC", "frB")),
+}
+GROUP63_A: Dict[int, Tuple[str, Format]] = {
+    18: ("fdiv", ("frD", "frA", "frB")),
+    20: ("fsub", ("frD", "frA", "frB")),
+    21: ("fadd", ("frD", "frA", "frB")),
+    23: ("fsel", ("frD", "frA", "frC", "frB")),
+    25: ("fmul", ("frD", "frA", "frC")),
+    26: ("frsqrte", ("frD", "frB")),
+    28: ("fmsub", ("frD", "frA", "frC", "frB")),
+    29: ("fmadd", ("frD", "frA", "frC", "frB")),
+    30: ("fnmsub", ("frD", "frA", "frC", "frB")),
+    31: ("fnmadd", ("frD", "frA", "frC", "frB")),
+}
+# Opcode 63, X-form by 10-bit extended opcode
+GROUP63_X: Dict[int, Tuple[str, Format]] = {
+    0: ("fcmpu", ("crfD", "frA", "frB")),
+    12: ("frsp", ("frD", "frB")),
+    14: ("fctiw", ("frD", "frB")),
+    15: ("fctiwz", ("frD", "frB")),
+    32: ("fcmpo", ("crfD", "frA", "frB")),
+    38: ("mtfsb1", ("crbD",)),
+    40: ("fneg", ("frD", "frB")),
+    64: ("mcrfs", ("crfD", "crfS")),
+    70: ("mtfsb0", ("crbD",)),
+    72: ("fmr", ("frD", "frB")),
+    134: ("mtfsfi", ("crfD", "IMM")),
+    136: ("fnabs", ("frD", "frB")),
+    264: ("fabs", ("frD", "frB")),
+    583: ("mffs", ("frD",)),
+    711: ("mtfsf", ("FM", "frB")),
+}
+
+# Opcode 4 (paired singles): indexed loads/stores by 6-bit extended opcode,
+# A-form by 5-bit, and the rest by 10-bit
+GROUP4_Q: Dict[int, Tuple[str, Format]] = {
+    6: ("psq_lx", ("frD", "rA", "rB", "Wx", "Ix")),
+    7: ("psq_stx", ("frS", "rA", "rB", "Wx", "Ix")),
+    38: ("psq_lux", ("frD", "rA", "rB", "Wx", "Ix")),
+    39: ("psq_stux", ("frS", "rA", "rB", "Wx", "Ix")),
+}
+GROUP4_A: Dict[int, Tuple[str, Format]] = {
+    10: ("ps_sum0", ("frD", "frA", "frC", "frB")),
+    11: ("ps_sum1", ("frD", "frA", "frC", "frB")),
+    12: ("ps_muls0", ("frD", "frA", "frC")),
+    13: ("ps_muls1", ("frD", "frA", "frC")),
+    14: ("ps_madds0", ("frD", "frA", "frC", "frB")),
+    15: ("ps_madds1", ("frD", "frA", "frC", "frB")),
+    18: ("ps_div", ("frD", "frA", "frB")),
+    20: ("ps_sub", ("frD", "frA", "frB")),
+    21: ("ps_add", ("frD", "frA", "frB")),
+    23: ("ps_sel", ("frD", "frA", "frC", "frB")),
+    24: ("ps_res", ("frD", "frB")),
+    25: ("ps_mul", ("frD", "frA", "frC")),
+    26: ("ps_rsqrte", ("frD", "frB")),
+    28: ("ps_msub", ("frD", "frA", "frC", "frB")),
+    29: ("ps_madd", ("frD", "frA", "frC", "frB")),
+    30: ("ps_nmsub", ("frD", "frA", "frC", "frB")),
+    31: ("ps_nmadd", ("frD", "frA", "frC", "frB")),
+}
+GROUP4_X: Dict[int, Tuple[str, Format]] = {
+    0: ("ps_cmpu0", ("crfD", "frA", "frB")),
+    32: ("ps_cmpo0", ("crfD", "frA", "frB")),
+    40: ("ps_neg", ("frD", "frB")),
+    64: ("ps_cmpu1", ("crfD", "frA", "frB")),
+    72: ("ps_mr", ("frD", "frB")),
+    96: ("ps_cmpo1", ("crfD", "frA", "frB")),
+    136: ("ps_nabs", ("frD", "frB")),
+    264: ("ps_abs", ("frD", "frB")),
+    528: ("ps_merge00", ("frD", "frA", "frB")),
+    560: ("ps_merge01", ("frD", "frA", "frB")),
+    592: ("ps_merge10", ("frD", "frA", "frB")),
+    624: ("ps_merge11", ("frD", "frA", "frB")),
+    1014: ("dcbz_l", ("rA", "rB")),
+}
+
+# Condition names by CR bit, when the branch is taken if it is set / clear
+BRANCH_TRUE = ("lt", "gt", "eq", "so")
+BRANCH_FALSE = ("ge", "le", "ne", "ns")
+# SPRs with simplified mfspr/mtspr mnemonics
+SPR_NAMES = {1: "xer", 8: "lr", 9: "ctr"}
+
+
+def _lookup(word: int) -> Optional[Tuple[str, Format]]:
+    opcode = word >> 26
+    if opcode == 31:
+        xo = (word >> 1) & 0x3FF
+        entry = GROUP31.get(xo)
+        if entry is None and xo & 0x1FF in GROUP31_OE:
+            name, fmt = GROUP31[xo & 0x1FF]
+            return name + "o", fmt
+        return entry
+    if opcode == 19:
+        return GROUP19.get((word >> 1) & 0x3FF)
+    if opcode == 59:
+        return GROUP59.get((word >> 1) & 0x1F)
+    if opcode == 63:
+        return GROUP63_A.get((word >> 1) & 0x1F) or GROUP63_X.get((word >> 1) & 0x3FF)
+    if opcode == 4:
+        return (
+            GROUP4_Q.get((word >> 1) & 0x3F)
+            or GROUP4_A.get((word >> 1) & 0x1F)
+            or GROUP4_X.get((word >> 1) & 0x3FF)
+        )
+    return PRIMARY.get(opcode)
+
+
+# Opcodes whose low bit is Rc (record to cr0), shown as a "." suffix
+_RC_OPCODES = {4, 20, 21, 23, 31, 59, 63}
+
+
+def _decode_branch(word: int) -> Ins:
+    opcode = word >> 26
+    link = "l" if word & 1 else ""
+    if opcode == 18:
+        absolute = "a" if word & 2 else ""
+        disp = _signed(word & 0x03FFFFFC, 26)
+        return Ins(f"b{link}{absolute}", (_hex(disp),), branch=None if absolute else disp)
+
+    bo, bi = _field(word, 6, 5), _field(word, 11, 5)
+    cr = f"cr{bi >> 2}, " if bi >> 2 else ""
+    if bo & 0x14 == 0x14:
+        cond = ""
+    elif bo & 0x1C == 0x0C:
+        cond = BRANCH_TRUE[bi & 3]
+    elif bo & 0x1C == 0x04:
+        cond = BRANCH_FALSE[bi & 3]
+    elif bo & 0x16 == 0x10:
+        cond, cr = "dnz", ""
+    elif bo & 0x16 == 0x12:
+        cond, cr = "dz", ""
+    else:
+        cond = None
+    # Branch prediction hint
+    hint = "+" if cond and bo & 1 and bo & 0x14 != 0x14 else ""
+
+    if opcode == 16:
+        absolute = "a" if word & 2 else ""
+        disp = _signed(word & 0xFFFC, 16)
+        if cond is None:
+            return Ins(f"bc{link}{absolute}", (str(bo), str(bi), _hex(disp)), branch=None if absolute else disp)
+        args = (cr.rstrip(", "), _hex(disp)) if cr else (_hex(disp),)
+        return Ins(f"b{cond or ''}{link}{absolute}{hint}", args, branch=None if absolute else disp)
+
+    xo = (word >> 1) & 0x3FF
+    target = {16: "lr", 528: "ctr"}.get(xo)
+    if target is None:
+        return Ins(".word", (_hex(word),))
+    if cond is None:
+        return Ins(f"bc{target}{link}", (str(bo), str(bi)))
+    args = (cr.rstrip(", "),) if cr else ()
+    return Ins(f"b{cond or ''}{target}{link}{hint}", args)
+
+
+def _decode(word: int) -> Ins:
+    opcode = word >> 26
+    if opcode in (16, 18) or (opcode == 19 and (word >> 1) & 0x3FF in (16, 528)):
+        return _decode_branch(word)
+
+    entry = _lookup(word)
+    if entry is None:
+        return Ins(".word", (_hex(word),))
+    mnemonic, fmt = entry
+    if opcode in _RC_OPCODES and word & 1 and not mnemonic.endswith("."):
+        mnemonic += "."
+
+    args: List[str] = []
+    imm = -1
+    base: Optional[str] = None
+    for name in fmt:
+        if name == "d":
+            base = _operand(word, "rA")
+            imm = len(args)
+            args.append(f"{_hex(_signed(word & 0xFFFF, 16))}({base})")
+        elif name == "qd":
+            base = _operand(word, "rA")
+            args.append(f"{_hex(_signed(word & 0xFFF, 12))}({base})")
+        else:
+            if name in ("SIMM", "UIMM"):
+                imm = len(args)
+            args.append(_operand(word, name))
+
+    # Simplified mnemonics
+    if mnemonic == "addi" and args[1] == "r0":
+        return Ins("li", (args[0], args[2]), imm=1)
+    if mnemonic == "addis" and args[1] == "r0":
+        return Ins("lis", (args[0], args[2]), imm=1)
+    if mnemonic == "ori" and word == 0x60000000:
+        return Ins("nop", ())
+    if mnemonic in ("or", "or.") and args[1] == args[2]:
+        return Ins("mr" + mnemonic[2:], (args[0], args[1]))
+    if mnemonic in ("cmpw", "cmplw", "cmpwi", "cmplwi") and args[0] == "cr0":
+        return Ins(mnemonic, tuple(args[1:]), imm=imm - 1 if imm > 0 else -1)
+    if mnemonic in ("mfspr", "mtspr"):
+        spr_index = 1 if mnemonic == "mfspr" else 0
+        spr_name = SPR_NAMES.get(int(args[spr_index]))
+        if spr_name is not None:
+            return Ins(mnemonic[:2] + spr_name, (args[1 - spr_index],))
+    return Ins(mnemonic, tuple(args), imm=imm, base=base)
+
+
+_cache: Dict[int, Ins] = {}
+
+
+def decode(word: int) -> Ins:
+    ins = _cache.get(word)
+    if ins is None:
+        ins = _cache[word] = _decode(word)
+    return ins
+
+
+# Decodes big-endian code into instructions
+def decode_code(code: Sequence[int]) -> List[Ins]:
+    words = array("I")
+    words.frombytes(bytes(code[: len(code) & ~3]))
+    if sys.byteorder == "little":
+        words.byteswap()
+    cache = _cache
+    return [cache.get(word) or decode(word) for word in words]
+
+
+def format_ins(ins: Ins) -> str:
+    if not ins.args:
+        return ins.mnemonic
+    return f"{ins.mnemonic} {', '.join(ins.args)}"
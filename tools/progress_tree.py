@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+###
+# Directory-tree progress rollups from report.json.
+#
+# Unit measures are summed into every directory above the unit in a single
+# pass, so that low-progress subsystems (e.g. dolphin/card or
+# game/pxdvs/app/pokemon) can be found at a glance.
+#
+# Usage:
+#   python3 tools/progress_tree.py
+#   python3 tools/progress_tree.py game/pxdvs --depth 2 --sort code
+###
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+# Summed measures, in display order
+MEASURES = (
+    "total_code",
+    "matched_code",
+    "total_data",
+    "matched_data",
+    "total_functions",
+    "matched_functions",
+    "total_units",
+    "complete_units",
+)
+
+
+class Node:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.children: Dict[str, "Node"] = {}
+        self.totals = dict.fromkeys(MEASURES, 0)
+        # Sum of fuzzy_match_percent weighted by total_code
+        self.fuzzy = 0.0
+
+    def child(self, name: str) -> "Node":
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = Node(name)
+        return node
+
+    def add(self, measures: Dict[str, Any]) -> None:
+        for key in MEASURES:
+            # objdiff omits zero values, and writes u64 values as strings
+            self.totals[key] += int(measures.get(key, 0))
+        self.fuzzy += float(measures.get("fuzzy_match_percent", 0.0)) * int(
+            measures.get("total_code", 0)
+        )
+
+    def percent(self, matched: str, total: str) -> float:
+        total_value = self.totals[total]
+        if total_value == 0:
+            return 100.0
+        return self.totals[matched] / total_value * 100.0
+
+    def fuzzy_percent(self) -> float:
+        total_code = self.totals["total_code"]
+        return self.fuzzy / total_code if total_code else 100.0
+
+
+# Splits a unit name into tree nodes, with the unit itself as the leaf
+def unit_path(name: str, strip_module: bool) -> List[str]:
+    parts = name.split("/")
+    return parts[1:] if strip_module and len(parts) > 1 else parts
+
+
+# Builds the tree in one pass over the units
+def build_tree(units: List[Dict[str, Any]]) -> Node:
+    root = Node("All")
+    # Units are named <module>/<path>, drop the module if there's only one
+    modules = {unit["name"].split("/", 1)[0] for unit in units}
+    strip_module = len(modules) == 1
+    for unit in units:
+        measures = unit.get("measures", {})
+        node = root
+        node.add(measures)
+        for part in unit_path(unit["name"], strip_module):
+            node = node.child(part)
+            node.add(measures)
+    return root
+
+
+def find_node(root: Node, path: str) -> Optional[Node]:
+    node = root
+    for part in path.strip("/").split("/"):
+        if not part:
+            continue
+        found = node.children.get(part)
+        if found is None:
+            return None
+        node = found
+    return node
+
+
+SORT_KEYS = {
+    "name": lambda node: node.name,
+    "code": lambda node: node.percent("matched_code", "total_code"),
+    "size": lambda node: -node.totals["total_code"],
+    "remaining": lambda node: node.totals["matched_code"] - node.totals["total_code"],
+}
+
+
+def render(
+    node: Node,
+    label: str,
+    max_depth: Optional[int],
+    min_code: int,
+    sort: str,
+    show_units: bool,
+) -> None:
+    rows: List[List[str]] = []
+
+    def visit(node: Node, depth: int, label: str) -> None:
+        rows.append(
+            [
+                label,
+                f"{node.percent('matched_code', 'total_code'):6.2f}%",
+                f"{node.fuzzy_percent():6.2f}%",
+                f"{node.totals['matched_code']} / {node.totals['total_code']}",
+                f"{node.percent('matched_data', 'total_data'):6.2f}%",
+                f"{node.totals['matched_functions']} / {node.totals['total_functions']}",
+                f"{node.totals['complete_units']} / {node.totals['total_units']}",
+            ]
+        )
+        if max_depth is not None and depth >= max_depth:
+            return
+        children = [
+            child
+            for child in node.children.values()
+            if child.totals["total_code"] >= min_code
+            and (show_units or child.children)
+        ]
+        children.sort(key=SORT_KEYS[sort])
+        for child in children:
+            visit(child, depth + 1, "  " * (depth + 1) + child.name)
+
+    visit(node, 0, label)
+    headers = ["path", "code", "fuzzy", "code bytes", "data", "functions", "units"]
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+    for row in [headers, *rows]:
+        cells = [row[0].ljust(widths[0])]
+        cells += [cell.rjust(width) for cell, width in zip(row[1:], widths[1:])]
+        print("  ".join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Show progress rolled up by source directory"""
+    )
+    parser.add_argument(
+        "path",
+        nargs="?",
+        default="",
+        help="""Directory to show, e.g. dolphin or game/pxdvs/app""",
+    )
+    parser.add_argument(
+        "-r",
+        "--report",
+        help="""Report to read (default: build/<version>/report.json)""",
+    )
+    parser.add_argument(
+        "-v",
+        "--version",
+        default="GXXE01",
+        help="""Version of the default report""",
+    )
+    parser.add_argument(
+        "-d",
+        "--depth",
+        type=int,
+        help="""Maximum depth to show below the path""",
+    )
+    parser.add_argument(
+        "--min-code",
+        metavar="BYTES",
+        type=int,
+        default=0,
+        help="""Hide directories with less code than this""",
+    )
+    parser.add_argument(
+        "-s",
+        "--sort",
+        choices=sorted(SORT_KEYS),
+        default="name",
+        help="""Sort order of each directory's children""",
+    )
+    parser.add_argument(
+        "-u",
+        "--units",
+        action="store_true",
+        help="""Show individual units, not just directories""",
+    )
+    args = parser.parse_args()
+
+    report_path = args.report or os.path.join("build", args.version.upper(), "report.json")
+    if not os.path.isfile(report_path):
+        sys.exit(f"Report file {report_path} does not exist")
+    with open(report_path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+
+    root = build_tree(report.get("units", []))
+    node = find_node(root, args.path)
+    if node is None:
+        sys.exit(f"No units found below {args.path}")
+    render(node, args.path.strip("/") or node.name, args.depth, args.min_code, args.sort, args.units)
+
+
+if __name__ == "__main__":
+    main()
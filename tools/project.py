@@ -33,6 +33,7 @@ from typing import (
 )
 
 from . import ninja_syntax
+from .jsonstream import read_object_keys
 from .ninja_syntax import serialize_path
 
 if sys.platform == "cygwin":
@@ -179,6 +180,9 @@ class ProjectConfig:
         self.shift_jis = (
             True  # Convert source files from UTF-8 to Shift JIS automatically
         )
+        self.shift_jis_mirror: bool = (
+            False  # Convert into a build-side Shift JIS mirror once, instead of running sjiswrap per compile
+        )
         self.reconfig_deps: Optional[List[Path]] = (
             None  # Additional re-configuration dependency files
         )
@@ -198,6 +202,9 @@ class ProjectConfig:
         self.link_order_callback: Optional[Callable[[int, List[str]], List[str]]] = (
             None  # Callback to add/remove/reorder units within a module
         )
+        self.generate_ctx: bool = (
+            True  # Generate on-demand context file rules for decomp.me scratches
+        )
         self.context_exclude_globs: List[str] = (
             []  # Globs to exclude from context files
         )
@@ -218,6 +225,9 @@ class ProjectConfig:
         self.progress_report_args: Optional[List[str]] = (
             None  # Flags to `objdiff-cli report generate`
         )
+        self.progress_report_shards: int = (
+            8  # Number of report shards diffed in parallel (fixed, so build.ninja is host-independent)
+        )
 
         # Progress fancy printing
         self.progress_use_fancy: bool = False
@@ -268,6 +278,15 @@ class ProjectConfig:
         else:
             sys.exit("ProjectConfig.compilers_tag missing")
 
+    # Gets the path to objdiff-cli, as used by build.ninja.
+    def objdiff_cli(self) -> Path:
+        build_tools_path = self.build_dir / "tools"
+        if self.objdiff_path is not None and self.objdiff_path.is_file():
+            return self.objdiff_path
+        elif self.objdiff_path is not None:
+            return build_tools_path / "release" / f"objdiff-cli{EXE}"
+        return build_tools_path / f"objdiff-cli{EXE}"
+
     # Gets the wrapper to use for compiler commands, if set.
     def compiler_wrapper(self) -> Optional[Path]:
         wrapper = self.wrapper
@@ -354,6 +373,40 @@ def make_flags_str(flags: Optional[List[str]]) -> str:
     return " ".join(flags)
 
 
+# Splits an include directory flag into its prefix and directory
+def split_include_flag(flag: str) -> Optional[Tuple[str, Path]]:
+    for prefix in ("-i ", "-I ", "-I+", "-ir "):
+        if flag.startswith(prefix):
+            return prefix, Path(flag[len(prefix) :].strip())
+    return None
+
+
+# Gets the top-level source and include directories used by the given objects,
+# excluding generated directories under the build directory
+def get_source_roots(
+    config: ProjectConfig, objects: Iterable[Object], extra: Iterable[Path] = ()
+) -> List[Path]:
+    candidates: Set[Path] = set(extra)
+    for obj in objects:
+        candidates.add(Path(obj.options["src_dir"]))
+        for flag in (obj.options["cflags"] or []) + obj.options["extra_cflags"]:
+            include_flag = split_include_flag(flag)
+            if include_flag is not None:
+                candidates.add(include_flag[1])
+
+    roots: List[Path] = []
+    for candidate in sorted(candidates, key=lambda p: (len(p.parts), p)):
+        if (
+            candidate.is_absolute()
+            or not candidate.is_dir()
+            or candidate.is_relative_to(config.build_dir)
+            or any(candidate.is_relative_to(root) for root in roots)
+        ):
+            continue
+        roots.append(candidate)
+    return roots
+
+
 def get_pch_out_name(config: ProjectConfig, pch: PrecompiledHeader) -> str:
     pch_rel_path = Path(pch["source"])
     pch_out_name = pch_rel_path.with_suffix(".mch")
@@ -578,7 +631,11 @@ def generate_build_ninja(
     else:
         sys.exit("ProjectConfig.objdiff_tag missing")
 
-    if config.sjiswrap_path:
+    sjiswrap: Optional[Path] = None
+    if config.shift_jis_mirror:
+        # Not needed, sources are converted by sjis_mirror.py
+        pass
+    elif config.sjiswrap_path:
         sjiswrap = config.sjiswrap_path
     elif config.sjiswrap_tag:
         sjiswrap = build_tools_path / "sjiswrap.exe"
@@ -668,7 +725,14 @@ def generate_build_ninja(
     mwcc_implicit: List[Optional[Path]] = [compilers_implicit or mwcc, wrapper_implicit]
 
     # MWCC with UTF-8 to Shift JIS wrapper
-    mwcc_sjis_cmd = f"{wrapper_cmd}{sjiswrap} {mwcc} $cflags -MMD -c $in -o $basedir"
+    # With shift_jis_mirror, the source is read from the Shift JIS mirror instead
+    sjis_mirror = config.tools_dir / "sjis_mirror.py"
+    sjis_mirror_dir = build_path / "sjis"
+    sjis_mirror_stamp = build_path / "sjis.stamp"
+    if config.shift_jis_mirror:
+        mwcc_sjis_cmd = f"{wrapper_cmd}{mwcc} $cflags -MMD -c $sjis_in -o $basedir"
+    else:
+        mwcc_sjis_cmd = f"{wrapper_cmd}{sjiswrap} {mwcc} $cflags -MMD -c $in -o $basedir"
     mwcc_sjis_implicit: List[Optional[Path]] = [*mwcc_implicit, sjiswrap]
 
     # MWCC for precompiled headers
@@ -676,7 +740,10 @@ def generate_build_ninja(
     mwcc_pch_implicit: List[Optional[Path]] = [*mwcc_implicit]
 
     # MWCC for precompiled headers with UTF-8 to Shift JIS wrapper
-    mwcc_pch_sjis_cmd = f"{wrapper_cmd}{sjiswrap} {mwcc} $cflags -MMD -c $in -o $basedir -precompile $basefilestem.mch"
+    if config.shift_jis_mirror:
+        mwcc_pch_sjis_cmd = f"{wrapper_cmd}{mwcc} $cflags -MMD -c $sjis_in -o $basedir -precompile $basefilestem.mch"
+    else:
+        mwcc_pch_sjis_cmd = f"{wrapper_cmd}{sjiswrap} {mwcc} $cflags -MMD -c $in -o $basedir -precompile $basefilestem.mch"
     mwcc_pch_sjis_implicit: List[Optional[Path]] = [*mwcc_implicit, sjiswrap]
 
     # MWCC with extab post-processing
@@ -700,20 +767,29 @@ def generate_build_ninja(
     # include macros.inc directly as an implicit dependency
     gnu_as_implicit.append(build_path / "include" / "macros.inc")
 
+    transform_dep = config.tools_dir / "transform_dep.py"
+    # Map Shift JIS mirror paths in depfiles back to the original sources
+    mirror_args = f"--mirror {sjis_mirror_dir} " if config.shift_jis_mirror else ""
     if os.name != "nt":
-        transform_dep = config.tools_dir / "transform_dep.py"
         mwcc_cmd += f" && $python {transform_dep} $basefile.d $basefile.d"
-        mwcc_sjis_cmd += f" && $python {transform_dep} $basefile.d $basefile.d"
+        mwcc_sjis_cmd += f" && $python {transform_dep} {mirror_args}$basefile.d $basefile.d"
         mwcc_pch_cmd += f" && $python {transform_dep} $basefile.d $basefile.d"
-        mwcc_pch_sjis_cmd += f" && $python {transform_dep} $basefile.d $basefile.d"
+        mwcc_pch_sjis_cmd += f" && $python {transform_dep} {mirror_args}$basefile.d $basefile.d"
         mwcc_extab_cmd += f" && $python {transform_dep} $basefile.d $basefile.d"
-        mwcc_sjis_extab_cmd += f" && $python {transform_dep} $basefile.d $basefile.d"
+        mwcc_sjis_extab_cmd += f" && $python {transform_dep} {mirror_args}$basefile.d $basefile.d"
         mwcc_implicit.append(transform_dep)
         mwcc_sjis_implicit.append(transform_dep)
         mwcc_pch_implicit.append(transform_dep)
         mwcc_pch_sjis_implicit.append(transform_dep)
         mwcc_extab_implicit.append(transform_dep)
         mwcc_sjis_extab_implicit.append(transform_dep)
+    elif config.shift_jis_mirror:
+        mwcc_sjis_cmd = f"{CHAIN}{mwcc_sjis_cmd} && $python {transform_dep} {mirror_args}$basefile.d $basefile.d"
+        mwcc_pch_sjis_cmd = f"{CHAIN}{mwcc_pch_sjis_cmd} && $python {transform_dep} {mirror_args}$basefile.d $basefile.d"
+        mwcc_sjis_extab_cmd += f" && $python {transform_dep} {mirror_args}$basefile.d $basefile.d"
+        mwcc_sjis_implicit.append(transform_dep)
+        mwcc_pch_sjis_implicit.append(transform_dep)
+        mwcc_sjis_extab_implicit.append(transform_dep)
 
     n.comment("Link ELF file")
     n.rule(
@@ -803,6 +879,50 @@ def generate_build_ninja(
     )
     n.newline()
 
+    # Directories mirrored as Shift JIS: source directories of Shift JIS objects,
+    # and any include directories they reference outside of the build directory
+    sjis_mirror_roots: List[Path] = []
+    if config.shift_jis_mirror:
+        pch_dirs: List[Path] = []
+        if any(pch.get("shift_jis", config.shift_jis) for pch in config.precompiled_headers or []):
+            pch_dirs.append(Path("include"))
+        sjis_mirror_roots = get_source_roots(
+            config,
+            [obj for obj in objects.values() if obj.options["shift_jis"]],
+            pch_dirs,
+        )
+
+        n.comment("Convert sources to a Shift JIS mirror (replaces sjiswrap)")
+        n.rule(
+            name="sjis_mirror",
+            command=f"$python {sjis_mirror} $roots -o $mirror_dir --stamp $out -d $out.d",
+            description="SJIS $mirror_dir",
+            depfile="$out.d",
+            deps="gcc",
+        )
+        n.build(
+            outputs=sjis_mirror_stamp,
+            rule="sjis_mirror",
+            implicit=sjis_mirror,
+            variables={
+                "roots": sjis_mirror_roots,
+                "mirror_dir": sjis_mirror_dir,
+            },
+        )
+        n.newline()
+
+    # Rewrites include directories to point into the Shift JIS mirror
+    def sjis_mirror_flags(flags: List[str]) -> List[str]:
+        out = []
+        for flag in flags:
+            include_flag = split_include_flag(flag)
+            if include_flag is not None:
+                prefix, include_dir = include_flag
+                if any(include_dir.is_relative_to(root) for root in sjis_mirror_roots):
+                    flag = prefix + (sjis_mirror_dir / include_dir).as_posix()
+            out.append(flag)
+        return out
+
     if len(config.custom_build_rules or {}) > 0:
         n.comment("Custom project build rules (pre/post-processing)")
     for rule in config.custom_build_rules or {}:
@@ -855,6 +975,8 @@ def generate_build_ninja(
 
     # Add all build steps needed before we compile (e.g. processing assets)
     pch_out_names = [get_pch_out_name(config, pch) for pch in config.precompiled_headers or []]
+    if config.shift_jis_mirror:
+        pch_out_names.append(str(sjis_mirror_stamp))
     write_custom_step("pre-compile", extra_inputs=pch_out_names)
 
     ###
@@ -954,6 +1076,7 @@ def generate_build_ninja(
         used_compiler_versions: Set[str] = set()
         source_inputs: List[Path] = []
         source_added: Set[Path] = set()
+        ctx_builds: List[Tuple[Object, Path, Dict[str, str]]] = []
 
         if config.precompiled_headers:
             for pch in config.precompiled_headers:
@@ -969,21 +1092,27 @@ def generate_build_ninja(
                     else:
                         cflags.insert(0, "-lang=c")
 
-                cflags_str = make_flags_str(cflags)
+                pch_shift_jis = pch.get("shift_jis", config.shift_jis)
+                pch_src_path = Path("include") / src_path_rel
+                pch_variables: Dict[str, Any] = {
+                    "mw_version": Path(pch["mw_version"]),
+                    "cflags": make_flags_str(cflags),
+                    "basedir": os.path.dirname(pch_out_abs_path),
+                    "basefile": pch_out_abs_path.with_suffix(""),
+                    "basefilestem": pch_out_abs_path.stem,
+                }
+                if pch_shift_jis and config.shift_jis_mirror:
+                    pch_variables["cflags"] = make_flags_str(sjis_mirror_flags(cflags))
+                    pch_variables["sjis_in"] = sjis_mirror_dir / pch_src_path
 
                 n.comment(f"Precompiled header {pch_out_name}")
                 n.build(
                     outputs=pch_out_abs_path,
-                    rule="mwcc_pch_sjis" if pch.get("shift_jis", config.shift_jis) else "mwcc_pch",
-                    inputs=f"include/{src_path_rel_str}",
-                    variables={
-                        "mw_version": Path(pch["mw_version"]),
-                        "cflags": cflags_str,
-                        "basedir": os.path.dirname(pch_out_abs_path),
-                        "basefile": pch_out_abs_path.with_suffix(""),
-                        "basefilestem": pch_out_abs_path.stem,
-                    },
+                    rule="mwcc_pch_sjis" if pch_shift_jis else "mwcc_pch",
+                    inputs=pch_src_path,
+                    variables=pch_variables,
                     implicit=[*mwcc_implicit],
+                    order_only=sjis_mirror_stamp if pch_shift_jis and config.shift_jis_mirror else None,
                 )
                 n.newline()
 
@@ -1035,6 +1164,10 @@ def generate_build_ninja(
                 build_rule = "mwcc_extab"
                 build_implcit = mwcc_extab_implicit
                 variables["extab_padding"] = "".join(f"{i:02x}" for i in obj.options["extab_padding"])
+            if obj.options["shift_jis"] and config.shift_jis_mirror:
+                # Compile from the Shift JIS mirror
+                variables["cflags"] = make_flags_str(sjis_mirror_flags(all_cflags))
+                variables["sjis_in"] = sjis_mirror_dir / src_path
             n.comment(f"{obj.name}: {lib_name} (linked {obj.completed})")
             n.build(
                 outputs=obj.src_obj_path,
@@ -1045,8 +1178,8 @@ def generate_build_ninja(
                 order_only="pre-compile",
             )
 
-            # Add ctx build rule
-            if obj.ctx_path is not None:
+            # Context files are only built on request (see "ctx" below)
+            if obj.ctx_path is not None and config.generate_ctx:
                 include_dirs = []
                 for flag in all_cflags:
                     if (
@@ -1059,16 +1192,16 @@ def generate_build_ninja(
                 excludes = " ".join([f"-x {d}" for d in config.context_exclude_globs])
                 defines = " ".join([f"-D {d}" for d in config.context_defines])
 
-                n.build(
-                    outputs=obj.ctx_path,
-                    rule="decompctx",
-                    inputs=src_path,
-                    implicit=decompctx,
-                    variables={
-                        "includes": includes,
-                        "excludes": excludes,
-                        "defines": defines,
-                    },
+                ctx_builds.append(
+                    (
+                        obj,
+                        src_path,
+                        {
+                            "includes": includes,
+                            "excludes": excludes,
+                            "defines": defines,
+                        },
+                    )
                 )
             n.newline()
 
@@ -1283,6 +1416,35 @@ def generate_build_ninja(
         # Add all build steps needed post-build (re-building archives and such)
         write_custom_step("post-build", "post-link")
 
+        ###
+        # Context files for decomp.me scratches
+        ###
+        # Not part of any default target. objdiff builds them on demand
+        # (build_ctx), or build with `ninja ctx` or `ninja ctx/<unit>`.
+        n.comment("Context files (built on demand)")
+        ctx_outputs: List[Path] = []
+        for obj, src_path, ctx_variables in ctx_builds:
+            assert obj.ctx_path is not None
+            n.build(
+                outputs=obj.ctx_path,
+                rule="decompctx",
+                inputs=src_path,
+                implicit=decompctx,
+                variables=ctx_variables,
+            )
+            n.build(
+                outputs=f"ctx/{Path(obj.name).with_suffix('').as_posix()}",
+                rule="phony",
+                inputs=obj.ctx_path,
+            )
+            ctx_outputs.append(obj.ctx_path)
+        n.build(
+            outputs="ctx",
+            rule="phony",
+            inputs=ctx_outputs,
+        )
+        n.newline()
+
         ###
         # Helper rule for building all source files
         ###
@@ -1339,17 +1501,63 @@ def generate_build_ninja(
         # Generate progress report
         ###
         n.comment("Generate progress report")
-        n.rule(
-            name="report",
-            command=f"{objdiff} report generate $objdiff_report_args -o $out",
-            description="REPORT",
-        )
-        n.build(
-            outputs=report_path,
-            rule="report",
-            implicit=[objdiff, "objdiff.json", "all_source"],
-            order_only="post-build",
-        )
+        n.comment("Only units whose objects changed are re-diffed")
+        n.comment("Units still identical to their target reuse their last report")
+        report_script = config.tools_dir / "report.py"
+        report_shards = max(1, config.progress_report_shards)
+        report_inputs = [
+            objdiff,
+            report_script,
+            config.tools_dir / "objcompare.py",
+            config.tools_dir / "binfile.py",
+            "objdiff.json",
+            "all_source",
+        ]
+        report_shard_paths: List[Path] = []
+        if report_shards > 1:
+            # Units are split into shards reported in parallel, then merged
+            n.rule(
+                name="report_shard",
+                command=f"$python {report_script} generate --objdiff {objdiff} --shard $shard --cache $cache -o $out $objdiff_report_args",
+                description="REPORT $shard",
+            )
+            n.rule(
+                name="report",
+                command=f"$python {report_script} merge -o $out $in",
+                description="REPORT",
+            )
+            for i in range(report_shards):
+                shard_path = build_path / "report" / f"shard{i}.json"
+                n.build(
+                    outputs=shard_path,
+                    rule="report_shard",
+                    implicit=report_inputs,
+                    order_only="post-build",
+                    variables={
+                        "shard": f"{i}/{report_shards}",
+                        "cache": build_path / "report" / f"cache{i}.json",
+                    },
+                )
+                report_shard_paths.append(shard_path)
+            n.build(
+                outputs=report_path,
+                rule="report",
+                inputs=report_shard_paths,
+                implicit=[report_script, "objdiff.json"],
+            )
+        else:
+            report_cache_path = build_path / "report_cache.json"
+            n.rule(
+                name="report",
+                command=f"$python {report_script} generate --objdiff {objdiff} --cache {report_cache_path} -o $out $objdiff_report_args",
+                description="REPORT",
+            )
+            n.build(
+                outputs=report_path,
+                rule="report",
+                implicit=report_inputs,
+                order_only="post-build",
+            )
 
         n.comment("Phony edge that will always be considered dirty by ninja.")
         n.comment(
@@ -1374,7 +1582,8 @@ def generate_build_ninja(
         n.build(
             outputs=report_baseline_path,
             rule="report",
-            implicit=[objdiff, "all_source", "always"],
+            inputs=report_shard_paths,
+            implicit=[*report_inputs, "always"],
             order_only="post-build",
         )
         n.build(
@@ -1384,16 +1593,17 @@ def generate_build_ninja(
         )
         n.comment("Check for any match regressions against the baseline")
         n.comment("Will fail if no baseline has been created")
+        report_changes = config.tools_dir / "report_changes.py"
         n.rule(
             name="report_changes",
-            command=f"{objdiff} report changes --format json-pretty {report_baseline_path} $in -o $out",
+            command=f"$python {report_changes} {report_baseline_path} $in -o $out",
             description="CHANGES",
         )
         n.build(
             outputs=report_changes_path,
             rule="report_changes",
             inputs=report_path,
-            implicit=[objdiff, "always"],
+            implicit=[report_changes, "always"],
         )
         n.rule(
             name="changes_fmt",
@@ -1554,31 +1764,49 @@ def generate_objdiff_config(
     else:
         ninja = "ninja"
 
+    # Only watch actual build inputs, so that writes to report.json,
+    # compile_commands.json and other build outputs don't trigger rebuilds
+    source_extensions = [
+        "c",
+        "cc",
+        "cp",
+        "cpp",
+        "cxx",
+        "c++",
+        "h",
+        "hh",
+        "hp",
+        "hpp",
+        "hxx",
+        "h++",
+        "pch",
+        "pch++",
+        "inc",
+    ]
+    watch_patterns: List[str] = []
+    asm_dirs = {
+        Path(obj.options["asm_dir"])
+        for obj in objects.values()
+        if obj.options["asm_dir"] is not None
+    }
+    for root in get_source_roots(config, objects.values(), asm_dirs):
+        root_str = root.as_posix()
+        extensions = ["s", "inc"] if root in asm_dirs else source_extensions
+        watch_patterns.append(f"{root_str}/**/*.{{{','.join(extensions)}}}")
+    if config.config_path is not None:
+        config_dir = config.config_path.parent.as_posix()
+        watch_patterns.append(f"{config_dir}/**/*.{{txt,yml}}")
+    configure_script = Path(os.path.relpath(os.path.abspath(sys.argv[0])))
+    watch_patterns.append(configure_script.as_posix())
+    watch_patterns.append(f"{config.tools_dir.as_posix()}/*.py")
+    watch_patterns.extend(path.as_posix() for path in config.reconfig_deps or [])
+
     objdiff_config: Dict[str, Any] = {
         "min_version": "2.0.0-beta.5",
         "custom_make": ninja,
         "build_target": False,
-        "watch_patterns": [
-            "*.c",
-            "*.cc",
-            "*.cp",
-            "*.cpp",
-            "*.cxx",
-            "*.c++",
-            "*.h",
-            "*.hh",
-            "*.hp",
-            "*.hpp",
-            "*.hxx",
-            "*.h++",
-            "*.pch",
-            "*.pch++",
-            "*.inc",
-            "*.py",
-            "*.yml",
-            "*.txt",
-            "*.json",
-        ],
+        "watch_patterns": watch_patterns,
+        "ignore_patterns": [f"{config.build_dir.as_posix()}/**/*"],
         "units": [],
         "progress_categories": [],
     }
@@ -1687,7 +1915,7 @@ def generate_objdiff_config(
                 "c_flags": cflags_str,
                 "preset_id": obj.options["scratch_preset_id"],
             }
-            if src_exists:
+            if src_exists and config.generate_ctx:
                 unit_config["scratch"].update(
                     {
                         "ctx_path": obj.ctx_path,
@@ -1984,9 +2212,12 @@ def calculate_progress(config: ProjectConfig) -> None:
     if not report_path.is_file():
         sys.exit(f"Report file {report_path} does not exist")
 
+    # Only the measures are needed, so skip over the (large) units array
     report_data: Dict[str, Any] = {}
     with open(report_path, "r", encoding="utf-8") as f:
-        report_data = json.load(f)
+        report_data = read_object_keys(f, ("measures", "categories"))
+    if "measures" not in report_data:
+        sys.exit(f"Report file {report_path} has no measures")
 
     # Convert string numbers (u64) to int
     def convert_numbers(data: Dict[str, Any]) -> None:
@@ -0,0 +1,123 @@
+###
+# Regression check for the units affected by a git diff.
+#
+# Files changed in the working tree since a base commit, including new
+# untracked files, are mapped to objects through the reverse index built
+# from .ninja_deps, only those objects are rebuilt, and objdiff-cli
+# reports on only the matching units. The results are compared against
+# the same units' entries in the baseline index.
+#
+# The working tree is always what's built and compared. A range only
+# selects the base commit: its start for A..B, or the merge base of its
+# ends for A...B.
+###
+
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+from .changes_fmt import collect_changes, generate_changes_plaintext
+from .depgraph import ReverseIndex, normalize_path
+from .project import ProjectConfig
+from .report import ReportCache, generate_cached_report, load_objdiff_config, units_by_base_path
+from .report_changes import diff_reports, load_baseline_index
+from .watch import is_config_change, run_ninja
+
+
+def _git(args: List[str]) -> str:
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        stderr = getattr(e, "stderr", None) or str(e)
+        sys.exit(f"git {args[0]} failed: {stderr.strip()}")
+    return result.stdout
+
+
+# Base commit of a revision or range: A for A..B, the merge base for A...B
+def range_base(git_range: str) -> str:
+    if "..." in git_range:
+        start, end = git_range.split("...", 1)
+        return _git(["merge-base", start or "HEAD", end or "HEAD"]).strip()
+    if ".." in git_range:
+        return git_range.split("..", 1)[0] or "HEAD"
+    return git_range
+
+
+# Lists files changed in the working tree since a commit, including
+# untracked files, relative to the repository root
+def git_changed_files(base: str) -> List[str]:
+    changed = _git(["diff", "--name-only", "--no-renames", base, "--"]).splitlines()
+    changed += _git(["ls-files", "--others", "--exclude-standard"]).splitlines()
+    return sorted(set(normalize_path(line) for line in changed if line))
+
+
+def check_regressions(config: ProjectConfig, git_range: Optional[str]) -> None:
+    config.validate()
+    build_path = config.out_path()
+    baseline_path = build_path / "baseline.json"
+    if not baseline_path.is_file():
+        sys.exit(f"{baseline_path} not found, run `ninja baseline` on the base commit first")
+    if not os.path.isfile("build.ninja"):
+        sys.exit("build.ninja not found, run configure.py first")
+
+    base = range_base(git_range or "HEAD")
+    changed = git_changed_files(base)
+    if not changed:
+        print(f"No files changed since {base}")
+        return
+    if any(is_config_change(path, config) for path in changed):
+        sys.exit(
+            "Configuration or build scripts changed, "
+            "run `ninja changes` for a full regression check"
+        )
+
+    index = ReverseIndex.load("build.ninja", ".ninja_deps", str(config.build_dir / "depindex.json"))
+    objects = index.affected_objects(changed)
+    if not objects:
+        print(f"{len(changed)} files changed since {base}, no objects affected")
+        return
+    print(f"{len(changed)} files changed since {base}, rebuilding {len(objects)} object(s)")
+    if not run_ninja(config, objects):
+        sys.exit("Build failed")
+
+    objdiff_config = load_objdiff_config()
+    units_map = units_by_base_path(objdiff_config)
+    units = [units_map[o] for o in objects if o in units_map]
+    if not units:
+        print("No affected objects have objdiff units")
+        return
+    objdiff = config.objdiff_cli()
+    if not objdiff.is_file():
+        sys.exit(f"{objdiff} not found, run `ninja` once to download it")
+
+    cache = ReportCache(str(build_path / "report_cache.json"))
+    try:
+        report, _ = generate_cached_report(
+            objdiff, objdiff_config, units, config.progress_report_args or [], cache
+        )
+    except subprocess.CalledProcessError as e:
+        sys.exit(f"objdiff-cli failed: {e}")
+    cache.save()
+
+    # Compare only against the affected units of the baseline
+    baseline = load_baseline_index(str(baseline_path), str(build_path / "baseline.index.json"))
+    names = set(unit["name"] for unit in units)
+    base_units: Dict[str, Any] = {
+        name: entry for name, entry in baseline["units"].items() if name in names
+    }
+    changes = diff_reports({"measures": {}, "units": base_units}, {**report, "measures": {}})
+    regressions, progressions = collect_changes(changes)
+
+    print(f"Checked {len(units)} unit(s) against {baseline_path}")
+    if progressions:
+        print(f"{len(progressions)} progression(s)")
+    if regressions:
+        print(generate_changes_plaintext(regressions))
+        sys.exit(f"{len(regressions)} regression(s) found")
+    print("No regressions")
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+
+###
+# objdiff-cli report generation over subsets of units, with a per-unit cache.
+#
+# objdiff-cli only reports on a whole project, so a temporary project
+# containing just the requested units is written, with object paths made
+# absolute so that they resolve from the temporary directory.
+#
+# `generate` keeps each unit's report keyed by a hash of its target and
+# base objects, its objdiff.json entry and the report flags. Only units
+# whose key changed are passed to objdiff-cli; the rest are reused, and
+# the top-level and category measures are recomputed from the merged units.
+# The cache records a hash of the objdiff-cli executable, and its reports
+# are discarded when objdiff-cli changes.
+#
+# Before running objdiff-cli, each unit's built object is compared to its
+# target at the section level with relocations masked (tools/objcompare.py),
+# and the comparison is cached by the objects' hashes. When a unit's object
+# changed but is identical to its target, as was the object its cached
+# report came from, the cached report is reused, so rebuilds that don't
+# change code or data (line numbers, debug info) aren't diffed again.
+#
+# With `--shard I/N`, only the units hashed to shard I are reported, so that
+# N shards can run as parallel ninja edges. `merge` combines the shard
+# reports into a single report in objdiff.json unit order.
+#
+# Usage:
+#   python3 tools/report.py generate --objdiff objdiff-cli -o build/GXXE01/report.json \
+#       --cache build/GXXE01/report_cache.json [objdiff-cli report flags]
+#   python3 tools/report.py generate --objdiff objdiff-cli --shard 0/4 \
+#       -o build/GXXE01/report/shard0.json --cache build/GXXE01/report/cache0.json
+#   python3 tools/report.py merge -o build/GXXE01/report.json build/GXXE01/report/shard*.json
+###
+
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .objcompare import objects_identical
+except ImportError:
+    from objcompare import objects_identical
+
+Unit = Dict[str, Any]
+
+# Measures stored as u64, serialized as strings by objdiff
+U64_MEASURES = (
+    "total_code",
+    "matched_code",
+    "total_data",
+    "matched_data",
+    "complete_code",
+    "complete_data",
+)
+U32_MEASURES = (
+    "total_functions",
+    "matched_functions",
+    "total_units",
+    "complete_units",
+)
+# Percentages derived from (numerator, denominator) totals
+PERCENT_MEASURES = (
+    ("matched_code_percent", "matched_code", "total_code"),
+    ("matched_data_percent", "matched_data", "total_data"),
+    ("matched_functions_percent", "matched_functions", "total_functions"),
+    ("complete_code_percent", "complete_code", "total_code"),
+    ("complete_data_percent", "complete_data", "total_data"),
+)
+
+# Bump when the cache layout or key changes
+CACHE_VERSION = 5
+
+
+def load_objdiff_config(path: str = "objdiff.json") -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Maps base (source-built) object paths to objdiff units
+def units_by_base_path(objdiff_config: Dict[str, Any]) -> Dict[str, Unit]:
+    out: Dict[str, Unit] = {}
+    for unit in objdiff_config.get("units", []):
+        base_path = unit.get("base_path")
+        if base_path:
+            out[os.path.normpath(base_path).replace(os.sep, "/")] = unit
+    return out
+
+
+def _absolute_unit(unit: Unit) -> Unit:
+    unit = dict(unit)
+    for key in ("target_path", "base_path"):
+        if unit.get(key):
+            unit[key] = os.path.abspath(unit[key])
+    # Not needed for reports, and relative to the project directory
+    unit.pop("scratch", None)
+    return unit
+
+
+# Runs `objdiff-cli report generate` over the given units,
+# returning the full report for just those units
+def generate_report(
+    objdiff: Path,
+    objdiff_config: Dict[str, Any],
+    units: List[Unit],
+    report_args: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    project = {
+        key: value
+        for key, value in objdiff_config.items()
+        if key not in ("units", "custom_make", "watch_patterns")
+    }
+    project["units"] = [_absolute_unit(unit) for unit in units]
+
+    with tempfile.TemporaryDirectory(prefix="objdiff-") as tmp_dir:
+        with open(os.path.join(tmp_dir, "objdiff.json"), "w", encoding="utf-8") as f:
+            json.dump(project, f)
+        out_path = os.path.join(tmp_dir, "report.json")
+        subprocess.run(
+            [
+                str(objdiff),
+                "report",
+                "generate",
+                "-p",
+                tmp_dir,
+                "-o",
+                out_path,
+                # Flags are stored as strings like "--config key=value"
+                *shlex.split(" ".join(report_args or [])),
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        with open(out_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def _measure(measures: Dict[str, Any], key: str) -> int:
+    # objdiff omits zero values, and writes u64 values as strings
+    return int(measures.get(key, 0))
+
+
+# Sums unit measures the way objdiff does: fuzzy_match_percent is
+# weighted by code size, and percentages of an empty total are 100
+def sum_measures(units: List[Unit]) -> Dict[str, Any]:
+    totals = {key: 0 for key in U64_MEASURES + U32_MEASURES}
+    fuzzy = 0.0
+    for unit in units:
+        measures = unit.get("measures", {})
+        for key in totals:
+            totals[key] += _measure(measures, key)
+        fuzzy += float(measures.get("fuzzy_match_percent", 0.0)) * _measure(
+            measures, "total_code"
+        )
+
+    out: Dict[str, Any] = {}
+    total_code = totals["total_code"]
+    out["fuzzy_match_percent"] = fuzzy / total_code if total_code else 100.0
+    for key in U64_MEASURES:
+        out[key] = str(totals[key])
+    for key in U32_MEASURES:
+        out[key] = totals[key]
+    for key, numerator, denominator in PERCENT_MEASURES:
+        total = totals[denominator]
+        out[key] = totals[numerator] / total * 100.0 if total else 100.0
+    return out
+
+
+# Assembles a report from unit reports, in the given order.
+# Measures and categories are written first, so that readers
+# interested only in totals can stop before the units.
+def merge_report(
+    objdiff_config: Dict[str, Any],
+    units: List[Unit],
+    version: Optional[int] = None,
+) -> Dict[str, Any]:
+    categories: List[Dict[str, Any]] = []
+    for category in objdiff_config.get("progress_categories", []):
+        members = [
+            unit
+            for unit in units
+            if category["id"]
+            in unit.get("metadata", {}).get("progress_categories", [])
+        ]
+        categories.append(
+            {
+                "id": category["id"],
+                "name": category["name"],
+                "measures": sum_measures(members),
+            }
+        )
+    report: Dict[str, Any] = {
+        "measures": sum_measures(units),
+        "categories": categories,
+        "units": units,
+    }
+    if version is not None:
+        report["version"] = version
+    return report
+
+
+class ReportCache:
+    def __init__(self, path: Optional[str], objdiff: Optional[Path] = None) -> None:
+        self.path = path
+        # path -> [mtime_ns, size, sha1], to avoid rehashing unchanged objects
+        self.files: Dict[str, List[Any]] = {}
+        # unit name -> {"key": str, "identical_key": str or None, "unit": report unit or None}
+        self.units: Dict[str, Dict[str, Any]] = {}
+        # "target sha1:base sha1" -> whether the objects are identical
+        self.identical: Dict[str, bool] = {}
+        self.version: Optional[int] = None
+        # sha1 of the objdiff-cli executable the cached reports came from
+        self.objdiff = ""
+        if path is not None:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("cache_version") == CACHE_VERSION:
+                    self.files = data["files"]
+                    self.units = data["units"]
+                    self.identical = data["identical"]
+                    self.version = data.get("version")
+                    self.objdiff = data["objdiff"]
+            except (OSError, ValueError, KeyError):
+                pass
+        if objdiff is not None:
+            objdiff_path = str(objdiff)
+            # Bare names are looked up in PATH, as subprocess does
+            if not os.path.dirname(objdiff_path):
+                objdiff_path = shutil.which(objdiff_path) or objdiff_path
+            objdiff_hash = self.file_hash(objdiff_path)
+            # Reports from another objdiff-cli can't be merged with new ones
+            if objdiff_hash != self.objdiff:
+                self.units = {}
+                self.version = None
+                self.objdiff = objdiff_hash
+
+    def file_hash(self, path: Optional[str]) -> str:
+        if not path:
+            return ""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return ""
+        cached = self.files.get(path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        self.files[path] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+    # Key of a unit's report. When the built object is identical to the
+    # target, its hash is left out, so the key holds across such rebuilds.
+    def unit_key(self, unit: Unit, report_args: List[str], identical: bool = False) -> str:
+        h = hashlib.sha1()
+        h.update(self.file_hash(unit.get("target_path")).encode())
+        h.update(b"identical" if identical else self.file_hash(unit.get("base_path")).encode())
+        # Flags may be stored as strings like "--config key=value"
+        h.update(json.dumps(shlex.split(" ".join(report_args))).encode())
+        # Metadata (completion, categories) and symbol mappings affect the report
+        h.update(json.dumps(_absolute_unit(unit), sort_keys=True).encode())
+        return h.hexdigest()
+
+    # Whether a unit's built object matches its target, ignoring relocated fields
+    def is_identical(self, unit: Unit) -> bool:
+        target_path, base_path = unit.get("target_path"), unit.get("base_path")
+        target_hash, base_hash = self.file_hash(target_path), self.file_hash(base_path)
+        if not target_hash or not base_hash:
+            return False
+        key = f"{target_hash}:{base_hash}"
+        identical = self.identical.get(key)
+        if identical is None:
+            identical = self.identical[key] = objects_identical(target_path, base_path)
+        return identical
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "cache_version": CACHE_VERSION,
+                    "version": self.version,
+                    "objdiff": self.objdiff,
+                    "files": self.files,
+                    "units": self.units,
+                    "identical": self.identical,
+                },
+                f,
+            )
+        os.replace(self.path + ".tmp", self.path)
+
+
+# Generates a report for the given units, running objdiff-cli only on
+# units whose inputs changed since the cached result, unless the result was
+# for an object identical to the target and the new object is too (when
+# precheck is enabled). Returns the merged report and the number of units
+# diffed.
+def generate_cached_report(
+    objdiff: Path,
+    objdiff_config: Dict[str, Any],
+    units: List[Unit],
+    report_args: List[str],
+    cache: ReportCache,
+    precheck: bool = True,
+) -> Tuple[Dict[str, Any], int]:
+    keys = {unit["name"]: cache.unit_key(unit, report_args) for unit in units}
+    stale = [
+        unit
+        for unit in units
+        if cache.units.get(unit["name"], {}).get("key") != keys[unit["name"]]
+    ]
+
+    diff: List[Unit] = []
+    identical_keys: Dict[str, Optional[str]] = {}
+    for unit in stale:
+        name = unit["name"]
+        identical_key = None
+        if precheck and cache.is_identical(unit):
+            identical_key = cache.unit_key(unit, report_args, identical=True)
+        cached = cache.units.get(name)
+        if identical_key is not None and cached and cached.get("identical_key") == identical_key:
+            cached["key"] = keys[name]
+        else:
+            diff.append(unit)
+            identical_keys[name] = identical_key
+
+    if diff:
+        fresh = generate_report(objdiff, objdiff_config, diff, report_args)
+        cache.version = fresh.get("version", cache.version)
+        results = {unit["name"]: unit for unit in fresh.get("units", [])}
+        for unit in diff:
+            name = unit["name"]
+            # Units that objdiff skips are cached as absent
+            cache.units[name] = {
+                "key": keys[name],
+                "identical_key": identical_keys[name],
+                "unit": results.get(name),
+            }
+
+    merged = []
+    for unit in units:
+        result = cache.units[unit["name"]]["unit"]
+        if result is not None:
+            merged.append(result)
+    return merge_report(objdiff_config, merged, cache.version), len(diff)
+
+
+# Selects the units of a shard. Units are assigned by name rather than
+# position, so that adding a unit doesn't invalidate the other shards' caches.
+def shard_units(units: List[Unit], index: int, count: int) -> List[Unit]:
+    return [
+        unit
+        for unit in units
+        if zlib.crc32(unit["name"].encode("utf-8")) % count == index
+    ]
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected I/N")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected 0 <= I < N")
+    return index, count
+
+
+def write_report(report: Dict[str, Any], out_path: str, indent: Optional[int] = 2) -> None:
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=indent)
+    os.replace(out_path + ".tmp", out_path)
+
+
+def generate(args: argparse.Namespace, report_args: List[str]) -> None:
+    if not os.path.isfile(args.project):
+        sys.exit(f"{args.project} not found, run configure.py first")
+    objdiff_config = load_objdiff_config(args.project)
+    units = objdiff_config.get("units", [])
+    if args.shard is not None:
+        units = shard_units(units, *args.shard)
+    cache = ReportCache(args.cache, args.objdiff)
+    try:
+        report, diffed = generate_cached_report(
+            args.objdiff, objdiff_config, units, report_args, cache, not args.no_precheck
+        )
+    except subprocess.CalledProcessError as e:
+        sys.exit(f"objdiff-cli failed: {e}")
+    # Shard reports are only read by `merge`
+    write_report(report, args.output, None if args.shard is not None else 2)
+    cache.save()
+    if args.verbose:
+        print(f"Diffed {diffed} of {len(units)} units")
+
+
+def merge(args: argparse.Namespace) -> None:
+    objdiff_config = load_objdiff_config(args.project)
+    results: Dict[str, Unit] = {}
+    version: Optional[int] = None
+    for path in args.shards:
+        with open(path, "r", encoding="utf-8") as f:
+            shard = json.load(f)
+        version = shard.get("version", version)
+        for unit in shard.get("units", []):
+            results[unit["name"]] = unit
+    units = [
+        results[unit["name"]]
+        for unit in objdiff_config.get("units", [])
+        if unit["name"] in results
+    ]
+    write_report(merge_report(objdiff_config, units, version), args.output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Generate objdiff progress reports"""
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    generate_parser = subparsers.add_parser(
+        "generate",
+        help="""Generate report.json, reusing cached results for unchanged units.
+        Unrecognized arguments are passed to `objdiff-cli report generate`.""",
+    )
+    generate_parser.add_argument(
+        "--objdiff",
+        type=Path,
+        required=True,
+        help="""Path to objdiff-cli""",
+    )
+    generate_parser.add_argument(
+        "-p",
+        "--project",
+        default="objdiff.json",
+        help="""objdiff project configuration""",
+    )
+    generate_parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="""Output report path""",
+    )
+    generate_parser.add_argument(
+        "--cache",
+        help="""Per-unit report cache (disabled if not given)""",
+    )
+    generate_parser.add_argument(
+        "--shard",
+        metavar="I/N",
+        type=parse_shard,
+        help="""Only report on shard I of N""",
+    )
+    generate_parser.add_argument(
+        "--no-precheck",
+        action="store_true",
+        help="""Diff all changed units with objdiff-cli, including ones still identical to their target""",
+    )
+    generate_parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="""Print the number of units diffed""",
+    )
+    merge_parser = subparsers.add_parser(
+        "merge",
+        help="""Merge shard reports into a single report""",
+    )
+    merge_parser.add_argument(
+        "shards",
+        nargs="+",
+        help="""Shard reports to merge""",
+    )
+    merge_parser.add_argument(
+        "-p",
+        "--project",
+        default="objdiff.json",
+        help="""objdiff project configuration, for unit order and categories""",
+    )
+    merge_parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="""Output report path""",
+    )
+    args, report_args = parser.parse_known_args()
+
+    if args.command == "generate":
+        generate(args, report_args)
+    elif args.command == "merge":
+        if report_args:
+            parser.error(f"unrecognized arguments: {' '.join(report_args)}")
+        merge(args)
+
+
+if __name__ == "__main__":
+    main()
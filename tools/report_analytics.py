@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+###
+# Per-function analytics over report.json.
+#
+# Function sizes, fuzzy match percentages and library groups are loaded into
+# flat columns: NumPy arrays when NumPy is installed, otherwise compact
+# `array` module columns with equivalent loops. Queries are expressed as
+# column operations rather than walks over the nested report.
+#
+# Usage:
+#   python3 tools/report_analytics.py histogram
+#   python3 tools/report_analytics.py remaining --depth 2
+#   python3 tools/report_analytics.py near --min 90 --top 30
+###
+
+import argparse
+import heapq
+import json
+import os
+import sys
+from array import array
+from typing import Any, Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+try:
+    from .progress_tree import unit_path
+except ImportError:
+    from progress_tree import unit_path
+
+# Fuzzy match histogram: ten 10% bins, plus one for fully matched functions
+HISTOGRAM_BINS = 11
+HISTOGRAM_LABELS = [f"{i * 10}-{i * 10 + 10}%" for i in range(10)] + ["100%"]
+
+
+class FunctionTable:
+    def __init__(self, groups: List[str]) -> None:
+        # Group (library) names, indexed by the group column
+        self.groups = groups
+        self.names: List[str] = []
+        self.units: List[str] = []
+        self.group = array("I")
+        self.size = array("Q")
+        self.fuzzy = array("d")
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # Converts the columns to NumPy arrays, if available
+    def freeze(self) -> None:
+        if np is not None:
+            self.group = np.frombuffer(self.group, dtype=np.uint32)
+            self.size = np.frombuffer(self.size, dtype=np.uint64).astype(np.int64)
+            self.fuzzy = np.frombuffer(self.fuzzy, dtype=np.float64)
+
+
+def load_table(report: Dict[str, Any], depth: int) -> FunctionTable:
+    units = report.get("units", [])
+    modules = {unit["name"].split("/", 1)[0] for unit in units}
+    strip_module = len(modules) == 1
+    group_ids: Dict[str, int] = {}
+    table = FunctionTable([])
+    for unit in units:
+        # Group by directory, keeping at least one component above the unit
+        parts = unit_path(unit["name"], strip_module)
+        group_name = "/".join(parts[: max(min(depth, len(parts) - 1), 1)])
+        group_id = group_ids.get(group_name)
+        if group_id is None:
+            group_id = group_ids[group_name] = len(table.groups)
+            table.groups.append(group_name)
+        for function in unit.get("functions", []):
+            table.names.append(function["name"])
+            table.units.append(unit["name"])
+            table.group.append(group_id)
+            # objdiff omits zero values, and writes u64 values as strings
+            table.size.append(int(function.get("size", 0)))
+            table.fuzzy.append(float(function.get("fuzzy_match_percent", 0.0)))
+    table.freeze()
+    return table
+
+
+# Counts functions per group in each fuzzy match bin
+def histogram(table: FunctionTable) -> List[List[int]]:
+    group_count = len(table.groups)
+    if np is not None:
+        bins = np.minimum((table.fuzzy // 10).astype(np.int64), HISTOGRAM_BINS - 2)
+        bins[table.fuzzy >= 100.0] = HISTOGRAM_BINS - 1
+        counts = np.bincount(
+            table.group.astype(np.int64) * HISTOGRAM_BINS + bins,
+            minlength=group_count * HISTOGRAM_BINS,
+        )
+        return counts.reshape(group_count, HISTOGRAM_BINS).tolist()
+    out = [[0] * HISTOGRAM_BINS for _ in range(group_count)]
+    for group, fuzzy in zip(table.group, table.fuzzy):
+        b = HISTOGRAM_BINS - 1 if fuzzy >= 100.0 else min(int(fuzzy // 10), HISTOGRAM_BINS - 2)
+        out[group][b] += 1
+    return out
+
+
+# Sums (total bytes, unmatched bytes, unmatched functions) per group
+def remaining(table: FunctionTable) -> List[Tuple[int, int, int]]:
+    group_count = len(table.groups)
+    if np is not None:
+        unmatched = table.fuzzy < 100.0
+        total = np.bincount(table.group, weights=table.size, minlength=group_count)
+        left = np.bincount(
+            table.group[unmatched], weights=table.size[unmatched], minlength=group_count
+        )
+        count = np.bincount(table.group[unmatched], minlength=group_count)
+        return [
+            (int(t), int(r), int(c))
+            for t, r, c in zip(total.tolist(), left.tolist(), count.tolist())
+        ]
+    totals = [0] * group_count
+    left_bytes = [0] * group_count
+    counts = [0] * group_count
+    for group, size, fuzzy in zip(table.group, table.size, table.fuzzy):
+        totals[group] += size
+        if fuzzy < 100.0:
+            left_bytes[group] += size
+            counts[group] += 1
+    return list(zip(totals, left_bytes, counts))
+
+
+# Returns the indices of the largest unmatched functions at or above min_fuzzy
+def near_matches(table: FunctionTable, min_fuzzy: float, top: int) -> Sequence[int]:
+    if top <= 0:
+        return []
+    if np is not None:
+        (indices,) = np.nonzero((table.fuzzy >= min_fuzzy) & (table.fuzzy < 100.0))
+        if len(indices) > top:
+            sizes = table.size[indices]
+            indices = indices[np.argpartition(-sizes, top - 1)[:top]]
+        order = np.lexsort((-table.fuzzy[indices], -table.size[indices]))
+        return indices[order].tolist()
+    candidates = (
+        i
+        for i, fuzzy in enumerate(table.fuzzy)
+        if min_fuzzy <= fuzzy < 100.0
+    )
+    return heapq.nsmallest(top, candidates, key=lambda i: (-table.size[i], -table.fuzzy[i]))
+
+
+def print_table(headers: List[str], rows: List[List[str]]) -> None:
+    widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+    for row in [headers, *rows]:
+        cells = [row[0].ljust(widths[0])]
+        cells += [cell.rjust(width) for cell, width in zip(row[1:], widths[1:])]
+        print("  ".join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Per-function match analytics over report.json"""
+    )
+    parser.add_argument(
+        "-r",
+        "--report",
+        help="""Report to read (default: build/<version>/report.json)""",
+    )
+    parser.add_argument(
+        "-v",
+        "--version",
+        default="GXXE01",
+        help="""Version of the default report""",
+    )
+    parser.add_argument(
+        "-d",
+        "--depth",
+        type=int,
+        default=1,
+        help="""Directory depth to group units by (default: 1, e.g. dolphin)""",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser(
+        "histogram", help="""Fuzzy match distribution of functions per library"""
+    )
+    subparsers.add_parser(
+        "remaining", help="""Unmatched bytes and functions per library"""
+    )
+    near_parser = subparsers.add_parser(
+        "near", help="""Largest functions that are close to matching"""
+    )
+    near_parser.add_argument(
+        "--min",
+        type=float,
+        default=90.0,
+        help="""Minimum fuzzy match percent (default: 90)""",
+    )
+    near_parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="""Number of functions to show (default: 20)""",
+    )
+    args = parser.parse_args()
+
+    report_path = args.report or os.path.join("build", args.version.upper(), "report.json")
+    if not os.path.isfile(report_path):
+        sys.exit(f"Report file {report_path} does not exist")
+    with open(report_path, "r", encoding="utf-8") as f:
+        table = load_table(json.load(f), args.depth)
+    if len(table) == 0:
+        sys.exit(f"No functions in {report_path}")
+
+    if args.command == "histogram":
+        counts = histogram(table)
+        order = sorted(range(len(table.groups)), key=lambda g: table.groups[g])
+        print_table(
+            ["library", *HISTOGRAM_LABELS],
+            [[table.groups[g], *(str(c) for c in counts[g])] for g in order],
+        )
+    elif args.command == "remaining":
+        totals = remaining(table)
+        order = sorted(range(len(table.groups)), key=lambda g: -totals[g][1])
+        rows = []
+        for g in order:
+            total, left, count = totals[g]
+            done = (total - left) / total * 100.0 if total else 100.0
+            rows.append([table.groups[g], str(left), str(total), f"{done:.2f}%", str(count)])
+        print_table(["library", "remaining", "total", "matched", "functions left"], rows)
+    elif args.command == "near":
+        rows = [
+            [
+                table.names[i],
+                table.units[i],
+                str(int(table.size[i])),
+                f"{float(table.fuzzy[i]):.2f}%",
+            ]
+            for i in near_matches(table, args.min, args.top)
+        ]
+        if not rows:
+            print(f"No unmatched functions at or above {args.min:.2f}%")
+            return
+        print_table(["function", "unit", "size", "fuzzy"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+###
+# Compares a progress report against baseline.json.
+#
+# Produces the same JSON as `objdiff-cli report changes`, for changes_fmt.py.
+# The baseline is indexed by unit and by function and section name, and the
+# index is cached next to baseline.json, keyed by its size and mtime. Units
+# are compared by a hash of their report entry first, so only units that
+# actually differ are walked.
+#
+# Usage:
+#   python3 tools/report_changes.py build/GXXE01/baseline.json \
+#       build/GXXE01/report.json -o build/GXXE01/report_changes.json
+###
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+# Bump when the index layout changes
+INDEX_VERSION = 1
+
+Measures = Dict[str, Any]
+# Per-unit index: entry hash, measures, and function/section name -> item info
+UnitIndex = Dict[str, Any]
+
+
+def unit_hash(unit: Dict[str, Any]) -> str:
+    return hashlib.sha1(
+        json.dumps(unit, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+
+
+def item_info(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "fuzzy_match_percent": float(item.get("fuzzy_match_percent", 0.0)),
+        "size": str(item.get("size", "0")),
+    }
+
+
+def index_unit(unit: Dict[str, Any]) -> UnitIndex:
+    functions: Dict[str, Any] = {}
+    for function in unit.get("functions", []):
+        functions.setdefault(function["name"], item_info(function))
+    sections: Dict[str, Any] = {}
+    for section in unit.get("sections", []):
+        sections.setdefault(section["name"], item_info(section))
+    return {
+        "hash": unit_hash(unit),
+        "measures": unit.get("measures", {}),
+        "functions": functions,
+        "sections": sections,
+    }
+
+
+def index_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "measures": report.get("measures", {}),
+        "units": {unit["name"]: index_unit(unit) for unit in report.get("units", [])},
+    }
+
+
+# Loads the baseline index, rebuilding it if baseline.json changed
+def load_baseline_index(baseline_path: str, cache_path: Optional[str]) -> Dict[str, Any]:
+    st = os.stat(baseline_path)
+    key = [st.st_mtime_ns, st.st_size]
+    if cache_path is not None:
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("index_version") == INDEX_VERSION and cached.get("key") == key:
+                return cached["index"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        index = index_report(json.load(f))
+    if cache_path is not None:
+        with open(cache_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"index_version": INDEX_VERSION, "key": key, "index": index}, f)
+        os.replace(cache_path + ".tmp", cache_path)
+    return index
+
+
+def normalize_measures(measures: Measures) -> Dict[str, float]:
+    # objdiff omits zero values, and writes u64 values as strings
+    return {key: float(value) for key, value in measures.items() if float(value) != 0.0}
+
+
+def diff_items(
+    before: Dict[str, Any], after: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for name, info in after.items():
+        previous = before.get(name)
+        if previous != info:
+            change: Dict[str, Any] = {"name": name, "to": info}
+            if previous is not None:
+                change["from"] = previous
+            out.append(change)
+    for name, previous in before.items():
+        if name not in after:
+            out.append({"name": name, "from": previous})
+    return out
+
+
+# Computes the changes between an indexed baseline and a report.
+# Units missing from either side are reported with only "from" or "to".
+def diff_reports(
+    baseline: Dict[str, Any], report: Dict[str, Any]
+) -> Dict[str, Any]:
+    units: List[Dict[str, Any]] = []
+    base_units: Dict[str, UnitIndex] = baseline.get("units", {})
+    seen = set()
+    for unit in report.get("units", []):
+        name = unit["name"]
+        seen.add(name)
+        before = base_units.get(name)
+        if before is not None and before["hash"] == unit_hash(unit):
+            continue
+        after = index_unit(unit)
+        if before is None:
+            before = {"measures": None, "functions": {}, "sections": {}}
+        sections = diff_items(before["sections"], after["sections"])
+        functions = diff_items(before["functions"], after["functions"])
+        measures_changed = before["measures"] is None or normalize_measures(
+            before["measures"]
+        ) != normalize_measures(after["measures"])
+        if not (measures_changed or sections or functions):
+            continue
+        change: Dict[str, Any] = {"name": name, "to": after["measures"]}
+        if before["measures"] is not None:
+            change["from"] = before["measures"]
+        change["sections"] = sections
+        change["functions"] = functions
+        units.append(change)
+
+    for name, before in base_units.items():
+        if name in seen:
+            continue
+        units.append(
+            {
+                "name": name,
+                "from": before["measures"],
+                "sections": diff_items(before["sections"], {}),
+                "functions": diff_items(before["functions"], {}),
+            }
+        )
+
+    return {
+        "from": baseline.get("measures", {}),
+        "to": report.get("measures", {}),
+        "units": units,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Compare a progress report against a baseline report"""
+    )
+    parser.add_argument(
+        "baseline",
+        help="""Baseline report (baseline.json)""",
+    )
+    parser.add_argument(
+        "report",
+        help="""Current report (report.json)""",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="""Output changes file""",
+    )
+    parser.add_argument(
+        "--index",
+        help="""Baseline index cache (default: <baseline>.index.json)""",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.baseline):
+        sys.exit(f"Baseline {args.baseline} not found, run `ninja baseline` first")
+    index_path = args.index or os.path.splitext(args.baseline)[0] + ".index.json"
+    baseline = load_baseline_index(args.baseline, index_path)
+    with open(args.report, "r", encoding="utf-8") as f:
+        report = json.load(f)
+
+    changes = diff_reports(baseline, report)
+    with open(args.output + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(changes, f, indent=2)
+    os.replace(args.output + ".tmp", args.output)
+
+
+if __name__ == "__main__":
+    main()
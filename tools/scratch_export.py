@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+
+###
+# Exports offline decomp.me scratch bundles for every non-matching function.
+#
+# Every unit that isn't complete gets a directory with a shared, minimized
+# context (ctx.c), and each of its non-matching functions a directory with
+# the target assembly (asm.s, through tools/asmcache.py) and scratch.json,
+# holding the compiler and flags objdiff.json maps the unit's mw_version
+# to (COMPILER_MAP in tools/project.py). Functions are taken as
+# non-matching from report.json when it exists, or by diffing the unit's
+# objects otherwise.
+#
+# Context files are built in one ninja invocation (with the ninja
+# configure.py was given, unless --ninja is passed), so they're shared with
+# objdiff and only rebuilt when their headers change. The context is
+# minimized by dropping comments and blank lines, and by removing the
+# definitions of the unit's non-matching functions (free functions keep a
+# prototype), so any of them can be pasted into a scratch. Units are
+# exported in a process pool and skipped when their inputs are unchanged.
+#
+# Usage:
+#   python3 tools/scratch_export.py
+#   python3 tools/scratch_export.py -u main/game/pxdvs/app/pokemon/pokemon -j 8
+#
+# Bundles are written to build/<version>/scratch/<unit>/<function>/.
+###
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+try:
+    from .asmcache import AsmCache
+    from .funcdiff import diff_function, read_functions
+    from .permute import (
+        default_ninja,
+        find_function_definitions,
+        literal_pattern,
+        mask_source,
+        source_name,
+    )
+except ImportError:
+    from asmcache import AsmCache
+    from funcdiff import diff_function, read_functions
+    from permute import (
+        default_ninja,
+        find_function_definitions,
+        literal_pattern,
+        mask_source,
+        source_name,
+    )
+
+Unit = Dict[str, Any]
+
+# Bump when the bundle layout changes
+BUNDLE_VERSION = 2
+
+target_path_pattern = re.compile(r"^build/(?P<version>[^/]+)/")
+# Characters not allowed in file names on Windows
+unsafe_name_pattern = re.compile(r'[<>:"/\\|?*]')
+
+
+# Drops comments and blank lines
+def minimize_context(text: str) -> str:
+    def strip_comment(match: re.Match) -> str:
+        literal = match[0]
+        if literal.startswith("//"):
+            return ""
+        if literal.startswith("/*"):
+            return " " if "\n" not in literal else "\n"
+        return literal
+
+    text = literal_pattern.sub(strip_comment, text)
+    return "\n".join(line.rstrip() for line in text.splitlines() if line.strip()) + "\n"
+
+
+# Start of the declaration a name belongs to: after the previous
+# statement, block or preprocessor line
+def _declaration_start(masked: str, name_start: int) -> int:
+    start = max(masked.rfind(c, 0, name_start) for c in ";{}") + 1
+    directive = masked.rfind("\n#", start, name_start)
+    if directive >= 0:
+        start = masked.find("\n", directive + 1) + 1
+    return start
+
+
+# Removes the given functions' definitions. Free functions are left as
+# prototypes; member functions are already declared by their class, and
+# can't be redeclared outside it.
+def stub_definitions(text: str, names: Set[str]) -> str:
+    masked = mask_source(text)
+    definitions = []
+    for name in names:
+        definitions.extend(find_function_definitions(text, name, masked))
+    out = []
+    end = 0
+    for name_start, head_end, body_start, body_end in sorted(set(definitions)):
+        # Nested in an already stubbed definition
+        if body_start < end:
+            continue
+        if masked[:name_start].rstrip().endswith("::"):
+            out.append(text[end : max(end, _declaration_start(masked, name_start))].rstrip())
+        else:
+            out.append(text[end:head_end].rstrip())
+            out.append(";")
+        end = body_end + 1
+    out.append(text[end:])
+    return "".join(out)
+
+
+# Source names of the definitions to stub. Constructors, destructors and
+# operators map to Class, ~Class and operator<op>; names that are still
+# mangled (conversion operators, compiler-generated functions) have no
+# definition to find and are skipped.
+def definition_names(symbols: Iterable[str]) -> Set[str]:
+    names = {source_name(symbol) for symbol in symbols}
+    return {name for name in names if not name.startswith("__")}
+
+
+# Functions of a unit that don't match, from report.json or by diffing
+def non_matching_functions(
+    unit: Unit, names: Set[str], report_unit: Optional[Unit]
+) -> Dict[str, float]:
+    if report_unit is not None:
+        return {
+            function["name"]: function.get("fuzzy_match_percent", 0.0)
+            for function in report_unit.get("functions", [])
+            if function.get("fuzzy_match_percent", 0.0) < 100.0 and function["name"] in names
+        }
+    target = read_functions(unit["target_path"])
+    base_path = unit.get("base_path")
+    base = read_functions(base_path) if base_path and os.path.isfile(base_path) else {}
+    out = {}
+    for name in names:
+        percent = diff_function(name, target.get(name), base.get(name)).percent
+        if percent < 100.0:
+            out[name] = percent
+    return out
+
+
+def unit_stamp(unit: Unit, report_unit: Optional[Unit]) -> str:
+    h = hashlib.sha1()
+    h.update(str(BUNDLE_VERSION).encode())
+    h.update(json.dumps([unit, report_unit], sort_keys=True).encode("utf-8"))
+    for path in (unit["target_path"], unit.get("base_path"), unit["scratch"].get("ctx_path")):
+        if path and os.path.isfile(path):
+            with open(path, "rb") as f:
+                h.update(hashlib.sha1(f.read()).digest())
+        else:
+            h.update(b"\0")
+    return h.hexdigest()
+
+
+# Writes the bundles of a unit. Returns the number of functions exported,
+# or None if the unit was up to date.
+def export_unit(
+    unit: Unit, report_unit: Optional[Unit], out_dir: str, asm_cache_dir: str
+) -> Optional[int]:
+    unit_dir = os.path.join(out_dir, unit["name"])
+    stamp_path = os.path.join(unit_dir, ".stamp")
+    stamp = unit_stamp(unit, report_unit)
+    try:
+        with open(stamp_path, "r", encoding="utf-8") as f:
+            if f.read() == stamp:
+                return None
+    except OSError:
+        pass
+
+    asm = AsmCache(asm_cache_dir).function_asm(unit["target_path"])
+    percents = non_matching_functions(unit, set(asm), report_unit)
+    # Functions that now match leave stale bundles behind
+    shutil.rmtree(unit_dir, ignore_errors=True)
+    os.makedirs(unit_dir)
+
+    scratch = unit["scratch"]
+    ctx_path = scratch.get("ctx_path")
+    context_path = None
+    if ctx_path and os.path.isfile(ctx_path):
+        with open(ctx_path, "r", encoding="utf-8") as f:
+            context = minimize_context(f.read())
+        context = stub_definitions(context, definition_names(percents))
+        context_path = os.path.join(unit_dir, "ctx.c")
+        with open(context_path, "w", encoding="utf-8") as f:
+            f.write(context)
+
+    for name, percent in percents.items():
+        function_dir = os.path.join(unit_dir, unsafe_name_pattern.sub("_", name))
+        os.makedirs(function_dir, exist_ok=True)
+        with open(os.path.join(function_dir, "asm.s"), "w", encoding="utf-8") as f:
+            f.write(asm[name])
+        bundle = {
+            "name": name,
+            "unit": unit["name"],
+            "source_path": unit.get("metadata", {}).get("source_path"),
+            "fuzzy_match_percent": percent,
+            "platform": scratch["platform"],
+            "compiler": scratch["compiler"],
+            "compiler_flags": scratch["c_flags"],
+            "preset": scratch.get("preset_id"),
+            "diff_label": name,
+            "context_path": context_path.replace(os.sep, "/") if context_path else None,
+        }
+        with open(os.path.join(function_dir, "scratch.json"), "w", encoding="utf-8") as f:
+            json.dump(bundle, f, indent=2)
+
+    with open(stamp_path, "w", encoding="utf-8") as f:
+        f.write(stamp)
+    return len(percents)
+
+
+# Builds the context files of the given units
+def build_contexts(units: List[Unit], ninja: str = "ninja") -> None:
+    outputs = [
+        unit["scratch"]["ctx_path"]
+        for unit in units
+        if unit["scratch"].get("ctx_path") and unit["scratch"].get("build_ctx")
+    ]
+    if not outputs:
+        return
+    try:
+        subprocess.run([ninja, *outputs], check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        sys.exit(f"Building context files failed: {e}")
+
+
+def load_report_units(path: str) -> Dict[str, Unit]:
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    return {unit["name"]: unit for unit in report.get("units", [])}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Export decomp.me scratch bundles for non-matching functions"""
+    )
+    parser.add_argument(
+        "-u",
+        "--unit",
+        action="append",
+        help="""Only export units with this name prefix (repeatable)""",
+    )
+    parser.add_argument(
+        "-r",
+        "--report",
+        help="""report.json to take match percentages from (default: build/<version>/report.json if it exists)""",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="""Output directory (default: build/<version>/scratch)""",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="""Parallel jobs (default: CPU count)""",
+    )
+    parser.add_argument(
+        "--no-ctx",
+        action="store_true",
+        help="""Don't build missing context files""",
+    )
+    parser.add_argument(
+        "--ninja",
+        metavar="BINARY",
+        help="""Path to ninja (default: the one configure.py was given)""",
+    )
+    args = parser.parse_args()
+
+    if not os.path.isfile("objdiff.json"):
+        sys.exit("objdiff.json not found, run configure.py first")
+    with open("objdiff.json", "r", encoding="utf-8") as f:
+        objdiff_config = json.load(f)
+    units = [
+        unit
+        for unit in objdiff_config.get("units", [])
+        if not unit.get("metadata", {}).get("complete")
+        and unit.get("scratch")
+        and (not args.unit or any(unit["name"].startswith(prefix) for prefix in args.unit))
+    ]
+    if not units:
+        sys.exit("No incomplete units to export")
+
+    match = target_path_pattern.match(units[0]["target_path"])
+    version = match["version"] if match else ""
+    out_dir = args.output or os.path.join("build", version, "scratch")
+    asm_cache = AsmCache.for_version(version)
+    report_path = args.report or os.path.join("build", version, "report.json")
+    report_units: Dict[str, Unit] = {}
+    if args.report or os.path.isfile(report_path):
+        report_units = load_report_units(report_path)
+
+    missing = [unit["name"] for unit in units if not os.path.isfile(unit["target_path"])]
+    if missing:
+        sys.exit(f"{len(missing)} target objects not found (e.g. {missing[0]}), run ninja first")
+    if not args.no_ctx:
+        build_contexts(units, args.ninja or default_ninja())
+
+    exported = skipped = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {
+            pool.submit(
+                export_unit, unit, report_units.get(unit["name"]), out_dir, asm_cache.cache_dir
+            ): unit["name"]
+            for unit in units
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                count = future.result()
+            except (OSError, ValueError) as e:
+                sys.exit(f"{futures[future]}: {e}")
+            if count is None:
+                skipped += 1
+            else:
+                exported += count
+    print(
+        f"Exported {exported} functions from {len(units) - skipped} units to {out_dir}"
+        + (f" ({skipped} units up to date)" if skipped else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+###
+# Mirrors UTF-8 source trees into a Shift JIS copy under the build directory.
+# Replaces running sjiswrap.exe around every mwcc invocation: sources and
+# headers are transcoded once, and only files whose contents changed since
+# the last run are converted again.
+#
+# Usage:
+#   python3 tools/sjis_mirror.py src include -o build/GXXE01/sjis --stamp build/GXXE01/sjis.stamp
+###
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from typing import Dict, List, Tuple
+
+# File extensions that mwcc may read as source text
+SOURCE_EXTENSIONS = {
+    ".c",
+    ".cc",
+    ".cp",
+    ".cpp",
+    ".cxx",
+    ".c++",
+    ".h",
+    ".hh",
+    ".hp",
+    ".hpp",
+    ".hxx",
+    ".h++",
+    ".inc",
+    ".pch",
+    ".pch++",
+}
+
+MANIFEST_NAME = ".manifest.json"
+
+# Manifest entry: (mtime_ns, size, sha1 of the original contents)
+ManifestEntry = Tuple[int, int, str]
+
+
+def to_shift_jis(data: bytes, path: str) -> bytes:
+    # Plain ASCII is identical in both encodings
+    if data.isascii():
+        return data
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Not UTF-8, assume the file is already Shift JIS
+        return data
+    try:
+        # encoding_rs (used by sjiswrap) implements Shift JIS as Windows-31J
+        return text.encode("cp932")
+    except UnicodeEncodeError as e:
+        line = text.count("\n", 0, e.start) + 1
+        sys.exit(f"{path}:{line}: cannot encode {text[e.start:e.end]!r} as Shift JIS")
+
+
+def load_manifest(path: str) -> Dict[str, ManifestEntry]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {k: tuple(v) for k, v in json.load(f).items()}  # type: ignore
+    except (OSError, ValueError):
+        return {}
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def scan_roots(roots: List[str]) -> Tuple[List[str], List[str]]:
+    files: List[str] = []
+    dirs: List[str] = []
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            dirs.append(dirpath)
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1].lower() in SOURCE_EXTENSIONS:
+                    files.append(os.path.join(dirpath, filename))
+    return files, dirs
+
+
+def mirror(roots: List[str], out_dir: str) -> Tuple[List[str], List[str], int]:
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    new_manifest: Dict[str, ManifestEntry] = {}
+    files, dirs = scan_roots(roots)
+    converted = 0
+
+    for path in files:
+        key = path.replace(os.sep, "/")
+        out_path = os.path.join(out_dir, path)
+        st = os.stat(path)
+        entry = manifest.get(key)
+        if (
+            entry is not None
+            and entry[0] == st.st_mtime_ns
+            and entry[1] == st.st_size
+            and os.path.exists(out_path)
+        ):
+            new_manifest[key] = entry
+            continue
+
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        if entry is None or entry[2] != digest or not os.path.exists(out_path):
+            write_atomic(out_path, to_shift_jis(data, path))
+            converted += 1
+        new_manifest[key] = (st.st_mtime_ns, st.st_size, digest)
+
+    # Remove mirrored files whose originals no longer exist,
+    # so that stale headers can't shadow include paths
+    for key in manifest.keys() - new_manifest.keys():
+        try:
+            os.remove(os.path.join(out_dir, key))
+        except FileNotFoundError:
+            pass
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(new_manifest, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return files, dirs, converted
+
+
+def sanitize_path(path: str) -> str:
+    return path.replace("\\", "/").replace(" ", "\\ ")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Mirror UTF-8 source directories as Shift JIS"""
+    )
+    parser.add_argument(
+        "roots",
+        nargs="+",
+        help="""Source directories to mirror""",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="""Mirror output directory""",
+    )
+    parser.add_argument(
+        "--stamp",
+        help="""Stamp file to write on completion""",
+    )
+    parser.add_argument(
+        "-d",
+        "--depfile",
+        help="""Dependency file""",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="""Print the number of converted files""",
+    )
+    args = parser.parse_args()
+
+    files, dirs, converted = mirror(args.roots, args.output)
+    if args.verbose:
+        print(f"Converted {converted} of {len(files)} files")
+
+    if args.stamp:
+        with open(args.stamp, "w", encoding="utf-8") as f:
+            f.write(f"{len(files)}\n")
+
+    if args.depfile:
+        target = args.stamp or args.output
+        with open(args.depfile, "w", encoding="utf-8") as f:
+            f.write(sanitize_path(target) + ":")
+            # Directories are listed so that added files retrigger the mirror
+            for path in dirs + files:
+                f.write(f" \\\n\t{sanitize_path(path)}")
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+###
+# Interval index over decomp-toolkit splits.txt files.
+#
+# Each unit's section ranges are collected into per-section lists sorted
+# by start address, answering which unit owns an address or which units
+# cover a range by bisection. Ranges can be joined with the symbols.txt
+# entries they contain, and overlaps, gaps and inverted ranges are checked
+# in one pass over the sorted ranges. Zero-length ranges are valid (dtk
+# writes them for units with an empty section) and only reported.
+#
+# Usage:
+#   python3 tools/splits.py 0x8021ABCD
+#   python3 tools/splits.py --range 0x80200000 0x80210000
+#   python3 tools/splits.py --unit dolphin/gx/GXInit.c --symbols
+#   python3 tools/splits.py --check
+###
+
+import argparse
+import os
+import re
+import sys
+from bisect import bisect_right
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    from .symbols import SymbolTable
+except ImportError:
+    from symbols import SymbolTable
+
+unit_pattern = re.compile(r"^(?P<name>\S.*?):(?P<attrs>(?:\s+\S+)*)\s*$")
+range_pattern = re.compile(
+    r"^\s+(?P<section>\S+)\s+start:0x(?P<start>[0-9A-Fa-f]+)\s+end:0x(?P<end>[0-9A-Fa-f]+)(?P<attrs>.*)$"
+)
+
+
+class SplitRange(NamedTuple):
+    unit: str
+    section: str
+    start: int
+    end: int
+    line: int
+
+
+class Issue(NamedTuple):
+    kind: str  # "overlap", "inverted", "gap" or "empty"
+    section: str
+    start: int
+    end: int
+    units: Tuple[str, ...]
+
+
+class SplitIndex:
+    def __init__(self, ranges: List[SplitRange]) -> None:
+        self.ranges = ranges
+        self.units: Dict[str, List[SplitRange]] = {}
+        # section -> ranges sorted by (start, end), and their starts
+        self.sections: Dict[str, List[SplitRange]] = {}
+        self.starts: Dict[str, List[int]] = {}
+        for split in ranges:
+            self.units.setdefault(split.unit, []).append(split)
+            self.sections.setdefault(split.section, []).append(split)
+        for section, section_ranges in self.sections.items():
+            section_ranges.sort(key=lambda r: (r.start, r.end))
+            self.starts[section] = [r.start for r in section_ranges]
+
+    @staticmethod
+    def parse(path: str) -> "SplitIndex":
+        ranges: List[SplitRange] = []
+        unit: Optional[str] = None
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                if not line[0].isspace():
+                    match = unit_pattern.match(line)
+                    # The "Sections:" block defines sections, not a unit
+                    unit = match["name"] if match and match["name"] != "Sections" else None
+                    continue
+                if unit is None:
+                    continue
+                match = range_pattern.match(line)
+                if match is None:
+                    continue
+                ranges.append(
+                    SplitRange(
+                        unit=unit,
+                        section=match["section"],
+                        start=int(match["start"], 16),
+                        end=int(match["end"], 16),
+                        line=line_number,
+                    )
+                )
+        return SplitIndex(ranges)
+
+    # Returns the ranges containing an address, in all sections or just one
+    def at(self, address: int, section: Optional[str] = None) -> List[SplitRange]:
+        sections = [section] if section is not None else list(self.sections)
+        found: List[SplitRange] = []
+        for name in sections:
+            section_ranges = self.sections.get(name, [])
+            pos = bisect_right(self.starts.get(name, []), address)
+            # More than one only if ranges overlap
+            while pos > 0 and address < section_ranges[pos - 1].end:
+                pos -= 1
+                found.append(section_ranges[pos])
+        return found
+
+    # Returns the ranges overlapping [start, end), by section and address
+    def overlapping(self, start: int, end: int, section: Optional[str] = None) -> List[SplitRange]:
+        sections = [section] if section is not None else list(self.sections)
+        found: List[SplitRange] = []
+        for name in sections:
+            section_ranges = self.sections.get(name, [])
+            starts = self.starts.get(name, [])
+            pos = bisect_right(starts, start)
+            # The range before the first start may extend into [start, end)
+            if pos > 0 and section_ranges[pos - 1].end > start:
+                pos -= 1
+            while pos < len(section_ranges) and section_ranges[pos].start < end:
+                if section_ranges[pos].end > start:
+                    found.append(section_ranges[pos])
+                pos += 1
+        return found
+
+    # Finds overlapping, inverted and zero-length ranges, and gaps between
+    # ranges, per section
+    def check(self) -> Iterator[Issue]:
+        for section, section_ranges in self.sections.items():
+            previous: Optional[SplitRange] = None
+            for split in section_ranges:
+                if split.end <= split.start:
+                    kind = "empty" if split.end == split.start else "inverted"
+                    yield Issue(kind, section, split.start, split.end, (split.unit,))
+                    continue
+                if previous is not None:
+                    if split.start < previous.end:
+                        yield Issue(
+                            "overlap",
+                            section,
+                            split.start,
+                            min(split.end, previous.end),
+                            (previous.unit, split.unit),
+                        )
+                    elif split.start > previous.end:
+                        yield Issue(
+                            "gap",
+                            section,
+                            previous.end,
+                            split.start,
+                            (previous.unit, split.unit),
+                        )
+                if previous is None or split.end > previous.end:
+                    previous = split
+
+
+# Joins a range with the indices of the symbols it contains
+def range_symbols(split: SplitRange, symbols: SymbolTable) -> List[int]:
+    return symbols.in_range(split.section, split.start, split.end)
+
+
+def format_range(split: SplitRange) -> str:
+    return f"{split.unit}: {split.section} 0x{split.start:08X}-0x{split.end:08X} (line {split.line})"
+
+
+def print_symbols(split: SplitRange, symbols: Optional[SymbolTable]) -> None:
+    if symbols is None:
+        return
+    for i in range_symbols(split, symbols):
+        symbol = symbols.symbol(i)
+        size = f" size:0x{symbol.size:X}" if symbol.size else ""
+        print(f"    0x{symbol.address:08X} {symbol.name} ({symbol.type}{size})")
+
+
+def parse_address(value: str) -> int:
+    return int(value, 16)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Query and check the unit ranges in splits.txt"""
+    )
+    parser.add_argument(
+        "addresses",
+        nargs="*",
+        type=parse_address,
+        help="""Addresses to find the owning unit of""",
+    )
+    parser.add_argument(
+        "-v",
+        "--version",
+        default="GXXE01",
+        help="""Version whose config to read (default: GXXE01)""",
+    )
+    parser.add_argument(
+        "--splits",
+        help="""Path to splits.txt (default: config/<version>/splits.txt)""",
+    )
+    parser.add_argument(
+        "--section",
+        help="""Only query this section""",
+    )
+    parser.add_argument(
+        "--range",
+        nargs=2,
+        metavar=("START", "END"),
+        type=parse_address,
+        help="""List the units overlapping [START, END)""",
+    )
+    parser.add_argument(
+        "--unit",
+        help="""List the ranges of a unit""",
+    )
+    parser.add_argument(
+        "-s",
+        "--symbols",
+        action="store_true",
+        help="""Also list the symbols in each range (from symbols.txt)""",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="""Report overlapping and inverted ranges (errors), and gaps and empty ranges""",
+    )
+    args = parser.parse_args()
+
+    config_dir = os.path.join("config", args.version.upper())
+    splits_path = args.splits or os.path.join(config_dir, "splits.txt")
+    if not os.path.isfile(splits_path):
+        sys.exit(f"{splits_path} not found")
+    index = SplitIndex.parse(splits_path)
+    symbols: Optional[SymbolTable] = None
+    if args.symbols:
+        symbols = SymbolTable.load(os.path.join(os.path.dirname(splits_path), "symbols.txt"))
+
+    status = 0
+    for address in args.addresses:
+        found = index.at(address, args.section)
+        if not found:
+            print(f"0x{address:08X}: not in any split")
+            status = 1
+        for split in found:
+            print(f"0x{address:08X}: {format_range(split)}")
+            if symbols is not None:
+                i = symbols.at(address, split.section)
+                if i is not None:
+                    symbol = symbols.symbol(i)
+                    offset = address - symbol.address
+                    print(f"    {symbol.name}" + (f"+0x{offset:X}" if offset else ""))
+
+    if args.range:
+        start, end = args.range
+        for split in index.overlapping(start, end, args.section):
+            print(format_range(split))
+            print_symbols(split, symbols)
+
+    if args.unit:
+        unit_ranges = index.units.get(args.unit)
+        if unit_ranges is None:
+            print(f"{args.unit}: no such unit")
+            status = 1
+        for split in unit_ranges or []:
+            print(format_range(split))
+            print_symbols(split, symbols)
+
+    if args.check:
+        counts = {"overlap": 0, "inverted": 0, "gap": 0, "empty": 0}
+        for issue in index.check():
+            counts[issue.kind] += 1
+            size = issue.end - issue.start
+            print(
+                f"{issue.kind}: {issue.section} 0x{issue.start:08X}-0x{issue.end:08X} "
+                f"({'-' if size < 0 else ''}0x{abs(size):X} bytes) {' / '.join(issue.units)}"
+            )
+            if symbols is not None and issue.kind == "gap":
+                count = len(symbols.in_range(issue.section, issue.start, issue.end))
+                print(f"    {count} symbols")
+        print(
+            f"{len(index.units)} units, {len(index.ranges)} ranges: "
+            f"{counts['overlap']} overlaps, {counts['inverted']} inverted, "
+            f"{counts['gap']} gaps, {counts['empty']} empty"
+        )
+        if counts["overlap"] or counts["inverted"]:
+            status = 1
+
+    if symbols is not None:
+        symbols.close()
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+
+###
+# Indexed reader for decomp-toolkit symbols.txt files.
+#
+# Entries (`name = section:0xADDR; // type:function size:0x40 scope:local`)
+# are parsed into column arrays with an interned name table, and saved to a
+# binary cache that is memory-mapped on later loads. The cache is rebuilt
+# when the symbols file's mtime or size changes.
+#
+# Lookups by address bisect a (section, address) sorted column, and lookups
+# by name probe an on-disk hash table, so neither requires a full parse.
+#
+# Usage:
+#   python3 tools/symbols.py config/GXXE01/symbols.txt GXInit
+#   python3 tools/symbols.py config/GXXE01/symbols.txt 0x8021ABCD
+###
+
+import argparse
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_CACHE_DIR = os.path.join("build", "symcache")
+
+SYMBOL_TYPES = ("unknown", "function", "object", "label")
+SYMBOL_SCOPES = ("", "global", "local", "weak")
+DATA_KINDS = (
+    "",
+    "byte",
+    "2byte",
+    "4byte",
+    "8byte",
+    "float",
+    "double",
+    "string",
+    "wstring",
+    "string_table",
+    "wstring_table",
+)
+# Flag attributes, as bits
+SYMBOL_FLAGS = ("noreloc", "hidden", "force_active", "stripped", "noexport")
+
+symbol_pattern = re.compile(
+    r"^\s*(?P<name>\S+)\s*=\s*(?:(?P<section>[^:\s]+):)?0x(?P<address>[0-9A-Fa-f]+);"
+    r"\s*(?://\s*(?P<attrs>.*))?$"
+)
+
+CACHE_MAGIC = b"SYMC"
+# Bump when the cache layout changes
+CACHE_VERSION = 1
+# magic, version, byte order, source mtime_ns, source size,
+# symbol count, section names size, names size, hash table size
+CACHE_HEADER = struct.Struct("<4sIIqqIIII")
+
+
+class Symbol:
+    __slots__ = ("name", "section", "address", "size", "type", "scope", "align", "data", "flags", "line")
+
+    def __init__(
+        self,
+        name: str,
+        section: str,
+        address: int,
+        size: int,
+        type: str,
+        scope: str,
+        align: int,
+        data: str,
+        flags: Tuple[str, ...],
+        line: int,
+    ) -> None:
+        self.name = name
+        self.section = section
+        self.address = address
+        self.size = size
+        self.type = type
+        self.scope = scope
+        self.align = align
+        self.data = data
+        self.flags = flags
+        self.line = line
+
+    def __repr__(self) -> str:
+        return f"Symbol({self.name} = {self.section}:0x{self.address:08X}, size 0x{self.size:X}, {self.type})"
+
+
+def _hash(name: bytes) -> int:
+    return zlib.crc32(name)
+
+
+def _align4(n: int) -> int:
+    return (n + 3) & ~3
+
+
+class SymbolTable:
+    # Columns are indexed by symbol, in file order:
+    #   address, size, align, line: u32
+    #   section: u16 (index into section_names)
+    #   type, scope, data, flags: u8
+    #   name_offsets: u32 (count + 1 entries into names)
+    # Derived indexes:
+    #   by_address: u32 symbol indices sorted by (section, address)
+    #   sorted_keys: u64 (section << 32 | address), in by_address order
+    #   name_slots: u32 open-addressing hash table of symbol index + 1
+    def __init__(self, columns: Dict[str, Sequence[int]], section_names: List[str], names: bytes) -> None:
+        self.address = columns["address"]
+        self.size = columns["size"]
+        self.align = columns["align"]
+        self.line = columns["line"]
+        self.section = columns["section"]
+        self.type = columns["type"]
+        self.scope = columns["scope"]
+        self.data = columns["data"]
+        self.flags = columns["flags"]
+        self.name_offsets = columns["name_offsets"]
+        self.by_address = columns["by_address"]
+        self.sorted_keys = columns["sorted_keys"]
+        self.name_slots = columns["name_slots"]
+        self.section_names = section_names
+        self.names = names
+        self._mmap: Optional[mmap.mmap] = None
+
+    def __len__(self) -> int:
+        return len(self.address)
+
+    def __iter__(self) -> Iterator[Symbol]:
+        return (self.symbol(i) for i in range(len(self)))
+
+    def name_bytes(self, i: int) -> bytes:
+        return bytes(self.names[self.name_offsets[i] : self.name_offsets[i + 1]])
+
+    def name(self, i: int) -> str:
+        return self.name_bytes(i).decode("utf-8")
+
+    def section_name(self, i: int) -> str:
+        return self.section_names[self.section[i]]
+
+    def symbol(self, i: int) -> Symbol:
+        flags = self.flags[i]
+        return Symbol(
+            name=self.name(i),
+            section=self.section_name(i),
+            address=self.address[i],
+            size=self.size[i],
+            type=SYMBOL_TYPES[self.type[i]],
+            scope=SYMBOL_SCOPES[self.scope[i]],
+            align=self.align[i],
+            data=DATA_KINDS[self.data[i]],
+            flags=tuple(f for bit, f in enumerate(SYMBOL_FLAGS) if flags & (1 << bit)),
+            line=self.line[i],
+        )
+
+    # Returns the indices of all symbols with the given name, in file order
+    def find_all(self, name: str) -> List[int]:
+        key = name.encode("utf-8")
+        slots = self.name_slots
+        mask = len(slots) - 1
+        slot = _hash(key) & mask
+        found: List[int] = []
+        while True:
+            entry = slots[slot]
+            if entry == 0:
+                return found
+            if self.name_bytes(entry - 1) == key:
+                found.append(entry - 1)
+            slot = (slot + 1) & mask
+
+    # Returns the index of the first symbol with the given name
+    def find(self, name: str) -> Optional[int]:
+        found = self.find_all(name)
+        return min(found) if found else None
+
+    def section_id(self, section: str) -> Optional[int]:
+        try:
+            return self.section_names.index(section)
+        except ValueError:
+            return None
+
+    # Returns the indices of symbols starting in [start, end) of a section, by address
+    def in_range(self, section: str, start: int, end: int) -> List[int]:
+        section_id = self.section_id(section)
+        if section_id is None:
+            return []
+        lo = bisect_left(self.sorted_keys, (section_id << 32) | start)
+        hi = bisect_left(self.sorted_keys, (section_id << 32) | end)
+        return [self.by_address[i] for i in range(lo, hi)]
+
+    # Returns the symbol containing an address: the sized symbol starting at
+    # or before it and covering it, else a label or zero-sized symbol at
+    # exactly that address. Without a section, all sections are searched
+    # (addresses are unique in the DOL).
+    def at(self, address: int, section: Optional[str] = None) -> Optional[int]:
+        if section is not None:
+            section_id = self.section_id(section)
+            section_ids = [] if section_id is None else [section_id]
+        else:
+            section_ids = list(range(len(self.section_names)))
+        exact: Optional[int] = None
+        for section_id in section_ids:
+            pos = bisect_right(self.sorted_keys, (section_id << 32) | address)
+            while pos > 0 and self.sorted_keys[pos - 1] >> 32 == section_id:
+                pos -= 1
+                i = self.by_address[pos]
+                start = self.address[i]
+                if self.size[i] == 0:
+                    # Labels may be inside a sized symbol, keep looking
+                    if start == address and exact is None:
+                        exact = i
+                    continue
+                if address < start + self.size[i]:
+                    return i
+                break
+        return exact
+
+    def close(self) -> None:
+        if self._mmap is None:
+            return
+        # Views into the mapping must be released before closing it
+        for value in list(vars(self).values()):
+            if isinstance(value, memoryview):
+                value.release()
+        self._mmap.close()
+        self._mmap = None
+
+    @staticmethod
+    def parse(path: str) -> "SymbolTable":
+        address = array("I")
+        size = array("I")
+        align = array("I")
+        line_numbers = array("I")
+        section = array("H")
+        types = array("B")
+        scopes = array("B")
+        data = array("B")
+        flags = array("B")
+        name_offsets = array("I", [0])
+        names = bytearray()
+        section_names: List[str] = []
+        section_ids: Dict[str, int] = {}
+
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                match = symbol_pattern.match(line)
+                if match is None:
+                    continue
+                section_name = match["section"] or ""
+                section_id = section_ids.get(section_name)
+                if section_id is None:
+                    section_id = section_ids[section_name] = len(section_names)
+                    section_names.append(section_name)
+
+                sym_type = sym_scope = sym_data = sym_flags = 0
+                sym_size = sym_align = 0
+                for attr in (match["attrs"] or "").split():
+                    key, _, value = attr.partition(":")
+                    if key == "type":
+                        sym_type = SYMBOL_TYPES.index(value) if value in SYMBOL_TYPES else 0
+                    elif key == "size":
+                        sym_size = int(value, 0)
+                    elif key == "scope":
+                        sym_scope = SYMBOL_SCOPES.index(value) if value in SYMBOL_SCOPES else 0
+                    elif key == "align":
+                        sym_align = int(value, 0)
+                    elif key == "data":
+                        sym_data = DATA_KINDS.index(value) if value in DATA_KINDS else 0
+                    elif key in SYMBOL_FLAGS:
+                        sym_flags |= 1 << SYMBOL_FLAGS.index(key)
+
+                address.append(int(match["address"], 16))
+                size.append(sym_size)
+                align.append(sym_align)
+                line_numbers.append(line_number)
+                section.append(section_id)
+                types.append(sym_type)
+                scopes.append(sym_scope)
+                data.append(sym_data)
+                flags.append(sym_flags)
+                names += match["name"].encode("utf-8")
+                name_offsets.append(len(names))
+
+        count = len(address)
+        by_address = array("I", sorted(range(count), key=lambda i: (section[i], address[i], i)))
+        sorted_keys = array("Q", ((section[i] << 32) | address[i] for i in by_address))
+
+        # Power of two with a load factor of at most 0.5
+        table_size = 1
+        while table_size < count * 2:
+            table_size <<= 1
+        name_slots = array("I", bytes(4 * table_size))
+        mask = table_size - 1
+        for i in range(count):
+            slot = _hash(bytes(names[name_offsets[i] : name_offsets[i + 1]])) & mask
+            while name_slots[slot] != 0:
+                slot = (slot + 1) & mask
+            name_slots[slot] = i + 1
+
+        return SymbolTable(
+            {
+                "address": address,
+                "size": size,
+                "align": align,
+                "line": line_numbers,
+                "section": section,
+                "type": types,
+                "scope": scopes,
+                "data": data,
+                "flags": flags,
+                "name_offsets": name_offsets,
+                "by_address": by_address,
+                "sorted_keys": sorted_keys,
+                "name_slots": name_slots,
+            },
+            section_names,
+            bytes(names),
+        )
+
+    # Column layout of the cache, after the header and section names
+    CACHE_COLUMNS = (
+        ("address", "I", 0),
+        ("size", "I", 0),
+        ("align", "I", 0),
+        ("line", "I", 0),
+        ("name_offsets", "I", 1),
+        ("by_address", "I", 0),
+        ("sorted_keys", "Q", 0),
+        ("section", "H", 0),
+        ("type", "B", 0),
+        ("scope", "B", 0),
+        ("data", "B", 0),
+        ("flags", "B", 0),
+    )
+
+    def write_cache(self, cache_path: str, mtime_ns: int, source_size: int) -> None:
+        section_blob = "\0".join(self.section_names).encode("utf-8")
+        out = bytearray(
+            CACHE_HEADER.pack(
+                CACHE_MAGIC,
+                CACHE_VERSION,
+                sys.byteorder == "little",
+                mtime_ns,
+                source_size,
+                len(self),
+                len(section_blob),
+                len(self.names),
+                len(self.name_slots),
+            )
+        )
+
+        def append(data: bytes) -> None:
+            out.extend(data)
+            out.extend(bytes(_align4(len(out)) - len(out)))
+
+        # Keep 8-byte columns aligned
+        out.extend(bytes(-len(out) % 8))
+        append(section_blob)
+        for name, _, _ in SymbolTable.CACHE_COLUMNS:
+            if name == "sorted_keys":
+                out.extend(bytes(-len(out) % 8))
+            append(getattr(self, name).tobytes())
+        append(self.name_slots.tobytes())
+        append(self.names)
+
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        with open(cache_path + ".tmp", "wb") as f:
+            f.write(out)
+        try:
+            os.replace(cache_path + ".tmp", cache_path)
+        except OSError:
+            # The old cache may still be mapped (Windows)
+            os.remove(cache_path + ".tmp")
+
+    @staticmethod
+    def read_cache(cache_path: str, mtime_ns: int, source_size: int) -> Optional["SymbolTable"]:
+        try:
+            with open(cache_path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        view = memoryview(mapped)
+        try:
+            (
+                magic,
+                version,
+                little_endian,
+                cached_mtime,
+                cached_size,
+                count,
+                sections_size,
+                names_size,
+                slots_size,
+            ) = CACHE_HEADER.unpack_from(view)
+        except struct.error:
+            view.release()
+            mapped.close()
+            return None
+        if (
+            magic != CACHE_MAGIC
+            or version != CACHE_VERSION
+            or bool(little_endian) != (sys.byteorder == "little")
+            or cached_mtime != mtime_ns
+            or cached_size != source_size
+        ):
+            view.release()
+            mapped.close()
+            return None
+
+        offset = CACHE_HEADER.size
+        offset += -offset % 8
+
+        def take(length: int) -> memoryview:
+            nonlocal offset
+            data = view[offset : offset + length]
+            offset = _align4(offset + length)
+            return data
+
+        section_names = bytes(take(sections_size)).decode("utf-8").split("\0")
+        columns: Dict[str, Sequence[int]] = {}
+        for name, fmt, extra in SymbolTable.CACHE_COLUMNS:
+            if fmt == "Q":
+                offset += -offset % 8
+            item_size = struct.calcsize(fmt)
+            columns[name] = take((count + extra) * item_size).cast(fmt)
+        columns["name_slots"] = take(slots_size * 4).cast("I")
+        names = take(names_size)
+
+        table = SymbolTable(columns, section_names, names)  # type: ignore
+        table._mmap = mapped
+        return table
+
+    # Loads a symbols file through the binary cache
+    @staticmethod
+    def load(path: str, cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> "SymbolTable":
+        st = os.stat(path)
+        if cache_dir is None:
+            return SymbolTable.parse(path)
+        rel = os.path.normpath(os.path.relpath(os.path.abspath(path)))
+        cache_name = rel.replace("\\", "_").replace("/", "_").replace(":", "_") + ".bin"
+        cache_path = os.path.join(cache_dir, cache_name)
+        table = SymbolTable.read_cache(cache_path, st.st_mtime_ns, st.st_size)
+        if table is not None:
+            return table
+        table = SymbolTable.parse(path)
+        table.write_cache(cache_path, st.st_mtime_ns, st.st_size)
+        return table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="""Look up symbols by name or address"""
+    )
+    parser.add_argument(
+        "symbols",
+        help="""Path to symbols.txt""",
+    )
+    parser.add_argument(
+        "queries",
+        nargs="+",
+        help="""Symbol names, or addresses (0x...)""",
+    )
+    parser.add_argument(
+        "-s",
+        "--section",
+        help="""Section to search for addresses (default: all)""",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="""Parse without reading or writing the binary cache""",
+    )
+    args = parser.parse_args()
+
+    table = SymbolTable.load(args.symbols, None if args.no_cache else DEFAULT_CACHE_DIR)
+    status = 0
+    for query in args.queries:
+        if query.lower().startswith("0x"):
+            address = int(query, 16)
+            i = table.at(address, args.section)
+            if i is None:
+                print(f"{query}: no symbol")
+                status = 1
+                continue
+            symbol = table.symbol(i)
+            offset = address - symbol.address
+            suffix = f"+0x{offset:X}" if offset else ""
+            print(f"{query}: {symbol.name}{suffix} ({symbol.section}, line {symbol.line})")
+        else:
+            found = table.find_all(query)
+            if not found:
+                print(f"{query}: not found")
+                status = 1
+            for i in sorted(found):
+                symbol = table.symbol(i)
+                print(
+                    f"{symbol.name}: {symbol.section}:0x{symbol.address:08X} size:0x{symbol.size:X} "
+                    f"{symbol.type} {symbol.scope} (line {symbol.line})".rstrip()
+                )
+    table.close()
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,12 @@
 ###
 # Transforms .d files, converting Windows paths to Unix paths.
 # Allows usage of the mwcc -MMD flag on platforms other than Windows.
+# Optionally maps paths inside a Shift JIS mirror (see sjis_mirror.py)
+# back to the original source files.
 #
 # Usage:
 #   python3 tools/transform_dep.py build/src/file.d build/src/file.d
+#   python3 tools/transform_dep.py --mirror build/GXXE01/sjis build/src/file.d build/src/file.d
 #
 # If changes are made, please submit a PR to
 # https://github.com/encounter/dtk-template
@@ -14,8 +17,9 @@
 import argparse
 import os
 from platform import uname
+from typing import Optional
 
-wineprefix = os.path.join(os.environ["HOME"], ".wine")
+wineprefix = os.path.join(os.path.expanduser("~"), ".wine")
 if "WINEPREFIX" in os.environ:
     wineprefix = os.environ["WINEPREFIX"]
 winedevices = os.path.join(wineprefix, "dosdevices")
@@ -25,7 +29,19 @@ def in_wsl() -> bool:
     return "microsoft-standard" in uname().release
 
 
-def import_d_file(in_file: str) -> str:
+def unmirror_path(path: str, mirror_dir: str) -> str:
+    mirror_prefix = os.path.abspath(mirror_dir).replace("\\", "/") + "/"
+    # lowercase drive letter, matching import_d_file
+    mirror_prefix = mirror_prefix[0].lower() + mirror_prefix[1:]
+    if path.startswith(mirror_prefix):
+        return os.path.join(os.getcwd(), path[len(mirror_prefix):]).replace("\\", "/")
+    mirror_prefix = mirror_dir.replace("\\", "/").rstrip("/") + "/"
+    if path.startswith(mirror_prefix):
+        return path[len(mirror_prefix):]
+    return path
+
+
+def import_d_file(in_file: str, mirror_dir: Optional[str] = None) -> str:
     out_text = ""
 
     with open(in_file) as file:
@@ -44,7 +60,10 @@ def import_d_file(in_file: str) -> str:
                     path = line.strip()
                 # lowercase drive letter
                 path = path[0].lower() + path[1:]
-                if path[0] == "z":
+                if os.name == "nt":
+                    # native paths, only normalize separators
+                    path = path.replace("\\", "/")
+                elif path[0] == "z":
                     # shortcut for z:
                     path = path[2:].replace("\\", "/")
                 elif in_wsl():
@@ -55,6 +74,8 @@ def import_d_file(in_file: str) -> str:
                     path = os.path.realpath(
                         os.path.join(winedevices, path.replace("\\", "/"))
                     )
+                if mirror_dir is not None:
+                    path = unmirror_path(path, mirror_dir)
                 out_text += "\t" + path + suffix + "\n"
 
     return out_text
@@ -72,9 +93,14 @@ def main() -> None:
         "d_file_out",
         help="""Dependency file out""",
     )
+    parser.add_argument(
+        "--mirror",
+        metavar="DIR",
+        help="""Shift JIS mirror directory to map back to original paths""",
+    )
     args = parser.parse_args()
 
-    output = import_d_file(args.d_file)
+    output = import_d_file(args.d_file, args.mirror)
 
     with open(args.d_file_out, "w", encoding="UTF-8") as f:
         f.write(output)
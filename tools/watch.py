@@ -0,0 +1,286 @@
+###
+# Watch mode: rebuilds and re-diffs only the units affected by a change.
+#
+# File changes are received through inotify (via ctypes) on Linux, with a
+# polling fallback elsewhere. Changed files are mapped to objects through
+# the reverse index built from .ninja_deps, only those objects are rebuilt,
+# and objdiff-cli reports on only the matching units.
+###
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set, Union
+
+from .depgraph import ReverseIndex, normalize_path
+from .project import ProjectConfig, get_source_roots
+from .report import generate_report, load_objdiff_config, units_by_base_path
+
+# File extensions that trigger a rebuild
+WATCH_EXTENSIONS = {
+    ".c",
+    ".cc",
+    ".cp",
+    ".cpp",
+    ".cxx",
+    ".c++",
+    ".h",
+    ".hh",
+    ".hp",
+    ".hpp",
+    ".hxx",
+    ".h++",
+    ".inc",
+    ".pch",
+    ".pch++",
+    ".s",
+}
+# Configuration changes require a reconfigure and full build
+CONFIG_EXTENSIONS = {".txt", ".yml", ".py"}
+
+# Time to wait for further changes after the first one (seconds)
+DEBOUNCE = 0.05
+
+
+class PollWatcher:
+    def __init__(self, roots: List[Path], interval: float = 0.5) -> None:
+        self.roots = roots
+        self.interval = interval
+        self.mtimes = self.scan()
+
+    def scan(self) -> Dict[str, int]:
+        mtimes: Dict[str, int] = {}
+        for root in self.roots:
+            if root.is_file():
+                mtimes[str(root)] = root.stat().st_mtime_ns
+                continue
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        mtimes[path] = os.stat(path).st_mtime_ns
+                    except OSError:
+                        pass
+        return mtimes
+
+    def wait(self) -> Set[str]:
+        while True:
+            time.sleep(self.interval)
+            mtimes = self.scan()
+            changed = {
+                path
+                for path in mtimes.keys() | self.mtimes.keys()
+                if mtimes.get(path) != self.mtimes.get(path)
+            }
+            self.mtimes = mtimes
+            if changed:
+                return changed
+
+
+class InotifyWatcher:
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    # Linux values; os.O_NONBLOCK and os.O_CLOEXEC don't exist on Windows
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    # IN_ATTRIB catches `touch`, which ninja also treats as a change
+    MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, roots: List[Path]) -> None:
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.libc.inotify_init1.argtypes = [ctypes.c_int]
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: Dict[int, str] = {}
+        self.tree_dirs: Set[str] = set()
+        self.files: Set[str] = set()
+        for root in roots:
+            if root.is_file():
+                # Watch the parent directory, filtering by name
+                self.files.add(os.path.normpath(root))
+                self.add_watch(os.path.dirname(root) or ".")
+            else:
+                self.add_tree(str(root))
+
+    def add_watch(self, path: str) -> None:
+        if path in self.watches.values():
+            return
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self.watches[wd] = path
+
+    def add_tree(self, root: str) -> None:
+        for dirpath, _, _ in os.walk(root):
+            self.tree_dirs.add(dirpath)
+            self.add_watch(dirpath)
+
+    def read_events(self) -> Set[str]:
+        changed: Set[str] = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, _, length = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16 : offset + 16 + length].rstrip(b"\0")
+            offset += 16 + length
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were lost, report every watched directory
+                changed.update(self.watches.values())
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO) and directory in self.tree_dirs:
+                    self.add_tree(path)
+                continue
+            if directory in self.tree_dirs or os.path.normpath(path) in self.files:
+                changed.add(path)
+        return changed
+
+    def wait(self) -> Set[str]:
+        while True:
+            select.select([self.fd], [], [])
+            changed = self.read_events()
+            # Collect the rest of a burst of events (e.g. save + rename)
+            while select.select([self.fd], [], [], DEBOUNCE)[0]:
+                changed |= self.read_events()
+            if changed:
+                return changed
+
+
+# Directories and files whose changes affect the build
+def watch_roots(config: ProjectConfig) -> List[Path]:
+    objects = config.objects().values()
+    extra = [
+        Path(obj.options["asm_dir"])
+        for obj in objects
+        if obj.options["asm_dir"] is not None
+    ]
+    if config.config_path is not None:
+        extra.append(config.config_path.parent)
+    roots = get_source_roots(config, objects, extra)
+    roots.append(Path(os.path.relpath(os.path.abspath(sys.argv[0]))))
+    return roots
+
+
+def create_watcher(roots: List[Path]) -> Union[InotifyWatcher, PollWatcher]:
+    if sys.platform == "linux":
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), falling back to polling")
+    return PollWatcher(roots)
+
+
+def is_config_change(path: str, config: ProjectConfig) -> bool:
+    path = normalize_path(path)
+    if config.config_path is not None and path.startswith(
+        normalize_path(str(config.config_path.parent)) + "/"
+    ):
+        return True
+    return os.path.splitext(path)[1].lower() == ".py"
+
+
+def ninja_command(config: ProjectConfig) -> str:
+    return str(config.ninja_path) if config.ninja_path else "ninja"
+
+
+def run_ninja(config: ProjectConfig, targets: Iterable[str]) -> bool:
+    result = subprocess.run([ninja_command(config), *targets])
+    return result.returncode == 0
+
+
+def print_unit_results(report: Dict[str, Any], previous: Dict[str, float]) -> None:
+    for unit in report.get("units", []):
+        name = unit["name"]
+        measures = unit.get("measures", {})
+        fuzzy = float(measures.get("fuzzy_match_percent", 0.0))
+        matched_functions = int(measures.get("matched_functions", 0))
+        total_functions = int(measures.get("total_functions", 0))
+        line = f"  {name}: {fuzzy:.2f}% ({matched_functions} / {total_functions} functions)"
+        before = previous.get(name)
+        if before is not None and abs(before - fuzzy) >= 0.005:
+            line += f" [{fuzzy - before:+.2f}%]"
+        previous[name] = fuzzy
+        print(line)
+
+
+def watch(config: ProjectConfig) -> None:
+    config.validate()
+    if not Path("build.ninja").is_file():
+        sys.exit("build.ninja not found, run configure.py first")
+
+    roots = watch_roots(config)
+    watcher = create_watcher(roots)
+    objdiff = config.objdiff_cli()
+    index_cache = str(config.build_dir / "depindex.json")
+    previous: Dict[str, float] = {}
+
+    kind = "inotify" if isinstance(watcher, InotifyWatcher) else "polling"
+    print(f"Watching {', '.join(str(r) for r in roots)} ({kind}), press Ctrl+C to stop")
+    try:
+        while True:
+            changed = watcher.wait()
+            relevant = sorted(
+                normalize_path(p)
+                for p in changed
+                if os.path.splitext(p)[1].lower() in WATCH_EXTENSIONS | CONFIG_EXTENSIONS
+                and not os.path.basename(p).startswith(".")
+            )
+            if not relevant:
+                continue
+            start = time.monotonic()
+            print(f"Changed: {', '.join(relevant)}")
+
+            if any(is_config_change(p, config) for p in relevant):
+                print("Configuration changed, running a full build")
+                run_ninja(config, [])
+                continue
+
+            index = ReverseIndex.load("build.ninja", ".ninja_deps", index_cache)
+            objects = index.affected_objects(relevant)
+            if not objects:
+                print("No objects affected")
+                continue
+
+            print(f"Rebuilding {len(objects)} object(s)")
+            if not run_ninja(config, objects):
+                continue
+
+            units_map = units_by_base_path(load_objdiff_config())
+            units = [units_map[o] for o in objects if o in units_map]
+            if units and objdiff.is_file():
+                try:
+                    report = generate_report(
+                        objdiff,
+                        load_objdiff_config(),
+                        units,
+                        config.progress_report_args,
+                    )
+                    print_unit_results(report, previous)
+                except subprocess.CalledProcessError as e:
+                    print(f"objdiff-cli failed: {e}")
+            print(f"Done in {time.monotonic() - start:.2f}s")
+    except KeyboardInterrupt:
+        pass